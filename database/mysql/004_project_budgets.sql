@@ -0,0 +1,20 @@
+USE `plataformaIa`;
+
+-- Monthly (UTC calendar month) USD budgets per project. NULL limit = not enforced.
+CREATE TABLE IF NOT EXISTS project_budgets (
+  project_id            BIGINT UNSIGNED NOT NULL,
+  soft_limit_usd        DECIMAL(14,6) NULL,
+  hard_limit_usd        DECIMAL(14,6) NULL,
+  updated_by_user_id    BIGINT UNSIGNED NULL,
+  created_at            TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_at            TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (project_id),
+  CONSTRAINT fk_project_budgets_project
+    FOREIGN KEY (project_id) REFERENCES projects(project_id),
+  CONSTRAINT fk_project_budgets_user
+    FOREIGN KEY (updated_by_user_id) REFERENCES users(user_id)
+) ENGINE=InnoDB;
+
+-- Month-to-date spend per project (seed and reconciliation of the in-memory counter).
+ALTER TABLE agent_runs
+  ADD KEY idx_agent_runs_project_created (project_id, created_at);
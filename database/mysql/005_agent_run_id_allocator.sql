@@ -0,0 +1,12 @@
+USE `plataformaIa`;
+
+-- Blocks of agent_run ids reserved by API workers, so write-behind runs can return
+-- run_id before their row is inserted (AI_RUN_WRITE_BEHIND_ENABLED).
+CREATE TABLE IF NOT EXISTS agent_run_id_allocator (
+  allocator_id  TINYINT UNSIGNED NOT NULL,
+  next_id       BIGINT UNSIGNED NOT NULL,
+  PRIMARY KEY (allocator_id)
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO agent_run_id_allocator (allocator_id, next_id)
+SELECT 1, COALESCE(MAX(agent_run_id), 0) + 1 FROM agent_runs;
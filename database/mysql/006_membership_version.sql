@@ -0,0 +1,11 @@
+USE `plataformaIa`;
+
+-- Bumped by every project_members write so API workers can tell their in-process
+-- membership cache is stale with one cheap read (MEMBERSHIP_VERSION_CHECK_MS).
+CREATE TABLE IF NOT EXISTS membership_version (
+  version_id    TINYINT UNSIGNED NOT NULL,
+  version       BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  PRIMARY KEY (version_id)
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO membership_version (version_id, version) VALUES (1, 0);
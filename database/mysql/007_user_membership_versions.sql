@@ -0,0 +1,14 @@
+USE `plataformaIa`;
+
+-- Per-user counterpart of membership_version. Login tokens that embed project roles
+-- carry the user's version; API workers poll the rows changed since their last check
+-- and ignore project-role claims older than the stored version.
+CREATE TABLE IF NOT EXISTS user_membership_versions (
+  user_id             BIGINT UNSIGNED NOT NULL,
+  membership_version  BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  changed_at          TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (user_id),
+  KEY idx_user_membership_versions_changed (changed_at),
+  CONSTRAINT fk_user_membership_versions_user
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+) ENGINE=InnoDB;
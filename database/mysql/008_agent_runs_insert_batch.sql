@@ -0,0 +1,7 @@
+USE `plataformaIa`;
+
+-- Token shared by the rows of one multi-row INSERT (batch text generation), so their
+-- AUTO_INCREMENT ids can be read back instead of assumed consecutive.
+ALTER TABLE agent_runs
+  ADD COLUMN insert_batch CHAR(32) NULL AFTER created_by_user_id,
+  ADD KEY idx_agent_runs_insert_batch (insert_batch);
@@ -0,0 +1,13 @@
+USE `plataformaIa`;
+
+-- Projects that produced each blob; GET /ai/blobs/{sha256} only serves a blob to
+-- members of a project listed here. The bytes live in the blob store (BLOB_STORE_DIR).
+CREATE TABLE IF NOT EXISTS ai_blob_projects (
+  sha256      CHAR(64) NOT NULL,
+  project_id  BIGINT UNSIGNED NOT NULL,
+  created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (sha256, project_id),
+  KEY idx_ai_blob_projects_project (project_id),
+  CONSTRAINT fk_ai_blob_projects_project
+    FOREIGN KEY (project_id) REFERENCES projects(project_id)
+) ENGINE=InnoDB;
@@ -1595,7 +1595,11 @@ function App() {
                     <strong>Model:</strong> {imgResult.model_name} | <strong>Costo:</strong> {formatCurrency(imgResult.cost_usd ?? 0)}
                   </p>
                   {imgResult.image_url ? (
-                    <img className="generated-image" src={imgResult.image_url} alt="Generated output" />
+                    <img
+                      className="generated-image"
+                      src={imgResult.image_url.startsWith("/") ? apiUrl(imgResult.image_url) : imgResult.image_url}
+                      alt="Generated output"
+                    />
                   ) : null}
                   {!imgResult.image_url && imgResult.image_base64 ? (
                     <img
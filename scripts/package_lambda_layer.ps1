@@ -31,7 +31,7 @@ Write-Host "Installing manylinux dependencies for Lambda layer (python3.12)..."
   --python-version 3.12 `
   --only-binary=:all: `
   --upgrade `
-  fastapi pydantic pyyaml sqlalchemy pymysql pyjwt httpx mangum
+  fastapi pydantic pyyaml sqlalchemy pymysql pyjwt httpx h2 mangum
 
 Write-Host "Creating layer ZIP..."
 if (Test-Path $OutputZip) {
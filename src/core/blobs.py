@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+SHA256_PATTERN = "^[0-9a-f]{64}$"
+_SHA256_RE = re.compile(SHA256_PATTERN)
+
+_MAGIC_MIME_TYPES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def sniff_mime_type(head: bytes) -> str:
+    """Best-effort MIME type from the first bytes of a blob."""
+    for magic, mime_type in _MAGIC_MIME_TYPES:
+        if head.startswith(magic):
+            return mime_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+@dataclass(frozen=True)
+class StoredBlob:
+    sha256: str
+    size: int
+    created: bool
+
+
+class BlobStore(ABC):
+    """Content-addressed storage: blobs are immutable and keyed by their sha256."""
+
+    @abstractmethod
+    def put(self, data: bytes) -> StoredBlob: ...
+
+    @abstractmethod
+    def path(self, sha256: str) -> Path | None:
+        """Local file holding the blob, or None when it is unknown."""
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs on the local filesystem under `<root>/<aa>/<bb>/<sha256>`.
+
+    Writes go to a temporary file in the target directory and are renamed into
+    place, so readers never see partial files and identical content is stored once.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def put(self, data: bytes) -> StoredBlob:
+        sha256 = hashlib.sha256(data).hexdigest()
+        target = self._blob_path(sha256)
+        if target.exists():
+            return StoredBlob(sha256=sha256, size=len(data), created=False)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp_name, target)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        logger.info("blob_stored sha256=%s size=%s", sha256, len(data))
+        return StoredBlob(sha256=sha256, size=len(data), created=True)
+
+    def path(self, sha256: str) -> Path | None:
+        if not _SHA256_RE.match(sha256):
+            return None
+        target = self._blob_path(sha256)
+        return target if target.is_file() else None
+
+
+def build_blob_store() -> BlobStore:
+    backend = settings.blob_store_backend.strip().lower()
+    if backend == "local":
+        return LocalBlobStore(settings.blob_store_dir)
+    raise RuntimeError(f"Unsupported BLOB_STORE_BACKEND: {settings.blob_store_backend}")
+
+
+blob_store: BlobStore = build_blob_store()
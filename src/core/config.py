@@ -1,4 +1,5 @@
 import os
+import tempfile
 from urllib.parse import quote_plus
 
 from pydantic import BaseModel
@@ -25,6 +26,26 @@ class Settings(BaseModel):
         "CORS_ALLOW_ORIGINS",
         "https://app.mktautomations.com,http://localhost:5173,http://127.0.0.1:5173",
     )
+    membership_cache_ttl_seconds: float = float(os.getenv("MEMBERSHIP_CACHE_TTL_SECONDS", "60"))
+    membership_cache_max_entries: int = int(os.getenv("MEMBERSHIP_CACHE_MAX_ENTRIES", "10000"))
+    membership_version_check_ms: int = int(os.getenv("MEMBERSHIP_VERSION_CHECK_MS", "500"))
+    auth_project_claims_enabled: bool = (
+        os.getenv("AUTH_PROJECT_CLAIMS_ENABLED", "false").strip().lower() == "true"
+    )
+    auth_project_claims_max_projects: int = int(
+        os.getenv("AUTH_PROJECT_CLAIMS_MAX_PROJECTS", "50")
+    )
+    auth_token_cache_max_entries: int = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    me_dashboard_cache_ttl_seconds: float = float(
+        os.getenv("ME_DASHBOARD_CACHE_TTL_SECONDS", "15")
+    )
+    me_dashboard_stale_seconds: float = float(os.getenv("ME_DASHBOARD_STALE_SECONDS", "120"))
+    me_dashboard_cache_max_entries: int = int(
+        os.getenv("ME_DASHBOARD_CACHE_MAX_ENTRIES", "5000")
+    )
+    me_dashboard_refresh_timeout_ms: int = int(
+        os.getenv("ME_DASHBOARD_REFRESH_TIMEOUT_MS", "2000")
+    )
 
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     openai_model_text: str = os.getenv("OPENAI_MODEL_TEXT", "gpt-5.2")
@@ -35,6 +56,101 @@ class Settings(BaseModel):
     ai_system_prompt_char_limit: int = int(os.getenv("AI_SYSTEM_PROMPT_CHAR_LIMIT", "4000"))
     ai_text_default_max_output_tokens: int = int(os.getenv("AI_TEXT_DEFAULT_MAX_OUTPUT_TOKENS", "700"))
     ai_text_hard_max_output_tokens: int = int(os.getenv("AI_TEXT_HARD_MAX_OUTPUT_TOKENS", "1200"))
+    ai_default_context_window_tokens: int = int(
+        os.getenv("AI_DEFAULT_CONTEXT_WINDOW_TOKENS", "128000")
+    )
+    ai_context_window_overrides: str = os.getenv("AI_CONTEXT_WINDOW_OVERRIDES", "")
+    ai_token_estimate_margin: float = float(os.getenv("AI_TOKEN_ESTIMATE_MARGIN", "1.1"))
+    ai_http2_enabled: bool = os.getenv("AI_HTTP2_ENABLED", "true").strip().lower() == "true"
+    ai_http_max_connections: int = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "50"))
+    ai_http_max_keepalive_connections: int = int(
+        os.getenv("AI_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+    )
+    ai_http_keepalive_expiry_seconds: float = float(
+        os.getenv("AI_HTTP_KEEPALIVE_EXPIRY_SECONDS", "60")
+    )
+    ai_metrics_window_size: int = int(os.getenv("AI_METRICS_WINDOW_SIZE", "200"))
+    ai_hedge_enabled: bool = os.getenv("AI_HEDGE_ENABLED", "false").strip().lower() == "true"
+    ai_hedge_delay_ms: int = int(os.getenv("AI_HEDGE_DELAY_MS", "2500"))
+    ai_hedge_use_p95: bool = os.getenv("AI_HEDGE_USE_P95", "true").strip().lower() == "true"
+    ai_hedge_min_samples: int = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+    ai_text_cache_enabled: bool = (
+        os.getenv("AI_TEXT_CACHE_ENABLED", "true").strip().lower() == "true"
+    )
+    ai_text_cache_max_entries: int = int(os.getenv("AI_TEXT_CACHE_MAX_ENTRIES", "512"))
+    ai_text_cache_ttl_seconds: float = float(os.getenv("AI_TEXT_CACHE_TTL_SECONDS", "600"))
+    ai_single_flight_enabled: bool = (
+        os.getenv("AI_SINGLE_FLIGHT_ENABLED", "true").strip().lower() == "true"
+    )
+    ai_batch_max_concurrency: int = int(os.getenv("AI_BATCH_MAX_CONCURRENCY", "4"))
+    ai_batch_max_items: int = int(os.getenv("AI_BATCH_MAX_ITEMS", "100"))
+    ai_image_job_workers: int = int(os.getenv("AI_IMAGE_JOB_WORKERS", "2"))
+    ai_image_job_queue_size: int = int(os.getenv("AI_IMAGE_JOB_QUEUE_SIZE", "100"))
+    ai_image_job_max_wait_seconds: float = float(
+        os.getenv("AI_IMAGE_JOB_MAX_WAIT_SECONDS", "30")
+    )
+    blob_store_backend: str = os.getenv("BLOB_STORE_BACKEND", "local")
+    blob_store_dir: str = os.getenv(
+        "BLOB_STORE_DIR", os.path.join(tempfile.gettempdir(), "plataforma-ia-blobs")
+    )
+    blob_url_ttl_seconds: int = int(os.getenv("BLOB_URL_TTL_SECONDS", "3600"))
+    public_api_base_url: str = os.getenv("PUBLIC_API_BASE_URL", "").rstrip("/")
+    ai_circuit_enabled: bool = os.getenv("AI_CIRCUIT_ENABLED", "true").strip().lower() == "true"
+    ai_circuit_failure_threshold: int = int(os.getenv("AI_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    ai_circuit_open_seconds: float = float(os.getenv("AI_CIRCUIT_OPEN_SECONDS", "30"))
+    ai_circuit_probe_interval_seconds: float = float(
+        os.getenv("AI_CIRCUIT_PROBE_INTERVAL_SECONDS", "10")
+    )
+    ai_circuit_probe_timeout_seconds: float = float(
+        os.getenv("AI_CIRCUIT_PROBE_TIMEOUT_SECONDS", "5")
+    )
+    ai_routing_adaptive: bool = (
+        os.getenv("AI_ROUTING_ADAPTIVE", "true").strip().lower() == "true"
+    )
+    ai_routing_ewma_alpha: float = float(os.getenv("AI_ROUTING_EWMA_ALPHA", "0.2"))
+    ai_routing_min_samples: int = int(os.getenv("AI_ROUTING_MIN_SAMPLES", "10"))
+    ai_routing_max_text_cost_per_1k: float = float(
+        os.getenv("AI_ROUTING_MAX_TEXT_COST_PER_1K", "0")
+    )
+    ai_routing_max_image_cost: float = float(os.getenv("AI_ROUTING_MAX_IMAGE_COST", "0"))
+    ai_rate_limit_enabled: bool = (
+        os.getenv("AI_RATE_LIMIT_ENABLED", "true").strip().lower() == "true"
+    )
+    ai_rate_limit_max_wait_ms: int = int(os.getenv("AI_RATE_LIMIT_MAX_WAIT_MS", "1500"))
+    ai_rate_limit_max_queue: int = int(os.getenv("AI_RATE_LIMIT_MAX_QUEUE", "32"))
+    ai_rate_limit_overrides: str = os.getenv("AI_RATE_LIMIT_OVERRIDES", "")
+    openai_rpm: int = int(os.getenv("OPENAI_RPM", "0"))
+    openai_tpm: int = int(os.getenv("OPENAI_TPM", "0"))
+    gemini_rpm: int = int(os.getenv("GEMINI_RPM", "0"))
+    gemini_tpm: int = int(os.getenv("GEMINI_TPM", "0"))
+    ai_request_deadline_ms: int = int(os.getenv("AI_REQUEST_DEADLINE_MS", "25000"))
+    ai_deadline_min_attempt_ms: int = int(os.getenv("AI_DEADLINE_MIN_ATTEMPT_MS", "1000"))
+    ai_budgets_enabled: bool = os.getenv("AI_BUDGETS_ENABLED", "true").strip().lower() == "true"
+    ai_budget_reconcile_seconds: float = float(os.getenv("AI_BUDGET_RECONCILE_SECONDS", "60"))
+    ai_agent_routing_ttl_seconds: float = float(os.getenv("AI_AGENT_ROUTING_TTL_SECONDS", "30"))
+    ai_agent_routing_cache_max_entries: int = int(
+        os.getenv("AI_AGENT_ROUTING_CACHE_MAX_ENTRIES", "4096")
+    )
+    ai_run_write_behind_enabled: bool = (
+        os.getenv("AI_RUN_WRITE_BEHIND_ENABLED", "false").strip().lower() == "true"
+    )
+    ai_run_write_behind_queue_size: int = int(os.getenv("AI_RUN_WRITE_BEHIND_QUEUE_SIZE", "1000"))
+    ai_run_write_behind_batch_size: int = int(os.getenv("AI_RUN_WRITE_BEHIND_BATCH_SIZE", "100"))
+    ai_run_write_behind_flush_ms: int = int(os.getenv("AI_RUN_WRITE_BEHIND_FLUSH_MS", "200"))
+    ai_run_id_block_size: int = int(os.getenv("AI_RUN_ID_BLOCK_SIZE", "100"))
+    ai_run_journal_path: str = os.getenv(
+        "AI_RUN_JOURNAL_PATH", os.path.join(tempfile.gettempdir(), "plataforma-ia-agent-runs.jsonl")
+    )
+    ai_conversation_history_tokens: int = int(os.getenv("AI_CONVERSATION_HISTORY_TOKENS", "6000"))
+    ai_conversation_summary_max_tokens: int = int(
+        os.getenv("AI_CONVERSATION_SUMMARY_MAX_TOKENS", "600")
+    )
+    ai_conversation_summary_cache_max_entries: int = int(
+        os.getenv("AI_CONVERSATION_SUMMARY_CACHE_MAX_ENTRIES", "1024")
+    )
+    ai_conversation_summary_cache_ttl_seconds: float = float(
+        os.getenv("AI_CONVERSATION_SUMMARY_CACHE_TTL_SECONDS", "86400")
+    )
 
     gemini_api_key: str = os.getenv("GEMINI_API_KEY", "")
     gemini_model_text: str = os.getenv("GEMINI_MODEL_TEXT", "gemini-3-pro-preview")
@@ -1,9 +1,11 @@
 from collections.abc import Generator
+from typing import Any
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, sessionmaker
 
 from src.core.config import settings
+from src.core.writes import set_db_utc_offset
 
 engine = create_engine(
     settings.database_url,
@@ -11,6 +13,17 @@ engine = create_engine(
     future=True,
 )
 
+
+@event.listens_for(engine, "connect")
+def _read_session_time_zone(dbapi_connection: Any, connection_record: Any) -> None:
+    # `db_now` must match the server's session time zone, which the app leaves alone.
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT TIMESTAMPDIFF(SECOND, UTC_TIMESTAMP(), NOW())")
+        set_db_utc_offset(int(cursor.fetchone()[0]))
+    finally:
+        cursor.close()
+
 SessionLocal = sessionmaker(
     bind=engine,
     autocommit=False,
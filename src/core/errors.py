@@ -23,3 +23,11 @@ def forbidden(detail: str = "Forbidden") -> HTTPException:
 
 def service_unavailable(detail: str = "Service unavailable") -> HTTPException:
     return HTTPException(status_code=503, detail=detail)
+
+
+def gateway_timeout(detail: str = "Gateway timeout") -> HTTPException:
+    return HTTPException(status_code=504, detail=detail)
+
+
+def payment_required(detail: str = "Payment required") -> HTTPException:
+    return HTTPException(status_code=402, detail=detail)
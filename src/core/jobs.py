@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any, Generic, TypeVar
+
+from src.core.logging import get_logger
+
+T = TypeVar("T")
+logger = get_logger(__name__)
+
+
+class JobQueue(Generic[T]):
+    """Bounded in-process asyncio queue drained by a fixed pool of worker tasks.
+
+    Workers are started lazily on the running event loop by the first `submit`.
+    `stop()` cancels the workers and hands every job still waiting to `on_drop`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[T], Awaitable[None]],
+        workers: int,
+        max_size: int,
+        on_drop: Callable[[T], Awaitable[None]] | None = None,
+    ) -> None:
+        self.name = name
+        self._handler = handler
+        self._on_drop = on_drop
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[T] | None = None
+        self._tasks: list[asyncio.Task[None]] = []
+        self.running = 0
+        self.processed = 0
+        self.errors = 0
+
+    def _ensure_started(self) -> asyncio.Queue[T]:
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._tasks = [
+                loop.create_task(self._worker(), name=f"{self.name}-worker-{i}")
+                for i in range(self.workers)
+            ]
+            logger.info("job_queue_started name=%s workers=%s", self.name, self.workers)
+        return self._queue
+
+    def has_capacity(self) -> bool:
+        return self._queue is None or not self._queue.full()
+
+    def submit(self, job: T) -> bool:
+        queue = self._ensure_started()
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            job = await queue.get()
+            self.running += 1
+            try:
+                await self._handler(job)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+                logger.exception("job_queue_handler_error name=%s", self.name)
+            finally:
+                self.running -= 1
+                queue.task_done()
+
+    async def stop(self) -> None:
+        if self._loop is not asyncio.get_running_loop():
+            return
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        queue, self._queue = self._queue, None
+        dropped: list[T] = []
+        while queue is not None and not queue.empty():
+            dropped.append(queue.get_nowait())
+        if dropped:
+            logger.warning("job_queue_dropped name=%s jobs=%s", self.name, len(dropped))
+        if self._on_drop is not None:
+            for job in dropped:
+                try:
+                    await self._on_drop(job)
+                except Exception:
+                    logger.exception("job_queue_drop_error name=%s", self.name)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "workers": self.workers,
+            "max_size": self.max_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+            "processed": self.processed,
+            "errors": self.errors,
+        }
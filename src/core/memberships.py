@@ -0,0 +1,188 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.core.cache import TTLCache
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Re-read per-user changes this far behind the previous check, so a write whose
+# transaction committed after that check is still picked up.
+_CHANGE_OVERLAP = timedelta(seconds=5)
+
+
+def bump_membership_version(db: Session, user_id: int) -> None:
+    """Advance the global and the user's membership version in the caller's transaction.
+
+    Every project_members write calls this before committing, so other workers drop
+    their cached memberships and reject older project-role token claims for the user
+    on their next version check.
+    """
+    db.execute(
+        text(
+            "UPDATE membership_version SET version = version + 1 WHERE version_id = 1"
+        )
+    )
+    db.execute(
+        text(
+            """
+            INSERT INTO user_membership_versions (user_id, membership_version, changed_at)
+            VALUES (:user_id, 1, CURRENT_TIMESTAMP)
+            ON DUPLICATE KEY UPDATE
+              membership_version = membership_version + 1,
+              changed_at = CURRENT_TIMESTAMP
+            """
+        ),
+        {"user_id": user_id},
+    )
+
+
+def get_user_membership_version(db: Session, user_id: int) -> int:
+    version = db.execute(
+        text(
+            "SELECT membership_version FROM user_membership_versions WHERE user_id = :user_id"
+        ),
+        {"user_id": user_id},
+    ).scalar_one_or_none()
+    return int(version or 0)
+
+
+class MembershipCache:
+    """In-process map of user_id -> {project_id: member_role}.
+
+    One entry answers both role checks for (user_id, project_id) and the per-user
+    project id set used by `*_for_user` list queries. Writes in this worker invalidate
+    the affected users directly. Writes in other workers are caught by comparing
+    `membership_version` at most once every `version_check_seconds`; when it moved, the
+    users changed since the previous check are read from `user_membership_versions`
+    and dropped, so a stale role outlives a change by less than that interval.
+
+    The same per-user versions validate project-role token claims: a token issued
+    within `token_window` is current unless its user changed after it was issued.
+    `generation` guards against a load that read the database before an invalidation
+    and stores its result after it.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        version_check_seconds: float,
+        token_window: timedelta,
+    ) -> None:
+        self._cache: TTLCache[int, dict[int, str]] = TTLCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds
+        )
+        self.version_check_seconds = version_check_seconds
+        self.token_window = token_window
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._version: int | None = None
+        self._next_check = 0.0
+        self._checked_at: datetime | None = None
+        # user_id -> (membership_version, changed_at) for users changed within token_window.
+        self._recent: dict[int, tuple[int, datetime]] = {}
+
+    def _check_version(self, db: Session) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_check:
+                return
+            self._next_check = now + self.version_check_seconds
+        row = db.execute(
+            text(
+                # changed_at is written in the session time zone, so compare against NOW().
+                "SELECT version, NOW() FROM membership_version WHERE version_id = 1"
+            )
+        ).first()
+        if row is None:
+            return
+        version, db_time = int(row[0]), row[1]
+        with self._lock:
+            if version == self._version:
+                return
+            checked_at = self._checked_at
+        since = (
+            db_time - self.token_window if checked_at is None else checked_at - _CHANGE_OVERLAP
+        )
+        changes = db.execute(
+            text(
+                """
+                SELECT user_id, membership_version, changed_at
+                FROM user_membership_versions
+                WHERE changed_at >= :since
+                """
+            ),
+            {"since": since},
+        ).all()
+        with self._lock:
+            self._version = version
+            self._checked_at = db_time
+            self._generation += 1
+            for user_id, user_version, changed_at in changes:
+                known = self._recent.get(int(user_id))
+                if known is None or int(user_version) > known[0]:
+                    self._recent[int(user_id)] = (int(user_version), changed_at)
+                self._cache.pop(int(user_id))
+            horizon = db_time - self.token_window
+            for user_id in [u for u, (_, at) in self._recent.items() if at < horizon]:
+                del self._recent[user_id]
+        logger.info(
+            "membership_version_changed version=%s changed_users=%s", version, len(changes)
+        )
+
+    def projects_for_user(self, db: Session, user_id: int) -> dict[int, str]:
+        """Return {project_id: member_role} for every project the user belongs to."""
+        self._check_version(db)
+        memberships = self._cache.get(user_id)
+        if memberships is not None:
+            return memberships
+        with self._lock:
+            generation = self._generation
+        rows = db.execute(
+            text("SELECT project_id, member_role FROM project_members WHERE user_id = :user_id"),
+            {"user_id": user_id},
+        ).all()
+        memberships = {int(project_id): str(role) for project_id, role in rows}
+        with self._lock:
+            if generation == self._generation:
+                self._cache.set(user_id, memberships)
+        return memberships
+
+    def role(self, db: Session, user_id: int, project_id: int) -> str | None:
+        return self.projects_for_user(db, user_id).get(project_id)
+
+    def token_is_current(self, db: Session, user_id: int, token_version: int) -> bool:
+        """Whether project-role claims issued at `token_version` still hold for the user."""
+        self._check_version(db)
+        with self._lock:
+            known = self._recent.get(user_id)
+        return known is None or token_version >= known[0]
+
+    def invalidate(self, user_id: int | None = None) -> None:
+        """Drop one user's entry, or every entry when `user_id` is None."""
+        with self._lock:
+            self._generation += 1
+            # The write bumped the user's version too: learn it on the next lookup.
+            self._next_check = 0.0
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id)
+        logger.info("membership_cache_invalidated user_id=%s", user_id)
+
+    def stats(self) -> dict[str, int]:
+        return {**self._cache.stats(), "recent_changes": len(self._recent)}
+
+
+memberships = MembershipCache(
+    max_entries=settings.membership_cache_max_entries,
+    ttl_seconds=settings.membership_cache_ttl_seconds,
+    version_check_seconds=settings.membership_version_check_ms / 1000,
+    token_window=timedelta(minutes=settings.jwt_exp_minutes),
+)
@@ -1,30 +1,101 @@
+from dataclasses import dataclass
+
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from src.core.errors import forbidden, not_found
+from src.core.memberships import memberships
 from src.core.security import User
 
 PROJECT_RW_ROLES = {"admin", "operator"}
 PROJECT_ALL_ROLES = {"admin", "operator", "viewer"}
 
+# Session.info key for the per-request memo of (project_id, user_id) -> ProjectAccess.
+_ACCESS_MEMO_KEY = "project_access"
+
+
+@dataclass(frozen=True)
+class ProjectAccess:
+    project_exists: bool
+    member_role: str | None
+
+
+def get_project_access(db: Session, project_id: int, user_id: int) -> ProjectAccess:
+    """Project existence and the user's member role, looked up once per request.
+
+    Members are answered from the process-wide membership cache. The result is
+    memoized in `db.info`, which lives as long as the request's session, so every
+    dependency and service in the request shares the lookup.
+    """
+    memo: dict[tuple[int, int], ProjectAccess] = db.info.setdefault(_ACCESS_MEMO_KEY, {})
+    access = memo.get((project_id, user_id))
+    if access is not None:
+        return access
+
+    role = memberships.role(db, user_id, project_id)
+    if role is not None:
+        access = ProjectAccess(project_exists=True, member_role=role)
+        memo[(project_id, user_id)] = access
+        return access
+
+    # Not a member as far as the cache knows: one query tells a missing project from a
+    # non-member, and sees a membership added in another worker since the last check.
+    row = (
+        db.execute(
+            text(
+                """
+                SELECT p.project_id, pm.member_role
+                FROM projects p
+                LEFT JOIN project_members pm
+                  ON pm.project_id = p.project_id
+                 AND pm.user_id = :user_id
+                WHERE p.project_id = :project_id
+                """
+            ),
+            {"project_id": project_id, "user_id": user_id},
+        )
+        .mappings()
+        .first()
+    )
+    role = row["member_role"] if row else None
+    access = ProjectAccess(
+        project_exists=row is not None,
+        member_role=str(role) if role is not None else None,
+    )
+    memo[(project_id, user_id)] = access
+    return access
+
+
+def forget_project_access(db: Session, project_id: int) -> None:
+    """Drop memoized lookups for a project after its membership changed in this session."""
+    memo = db.info.get(_ACCESS_MEMO_KEY)
+    if memo:
+        for key in [key for key in memo if key[0] == project_id]:
+            del memo[key]
+
 
 def get_project_member_role(
     db: Session,
     project_id: int,
     user_id: int,
 ) -> str | None:
-    role = db.execute(
-        text(
-            """
-            SELECT member_role
-            FROM project_members
-            WHERE project_id = :project_id
-              AND user_id = :user_id
-            """
-        ),
-        {"project_id": project_id, "user_id": user_id},
-    ).scalar_one_or_none()
-    return str(role) if role is not None else None
+    return get_project_access(db, project_id, user_id).member_role
+
+
+def _access_from_token(db: Session, project_id: int, user: User) -> ProjectAccess | None:
+    """Access from the token's project-role claims, or None when they cannot answer.
+
+    Claims only grant: a project missing from them, or claims older than the user's
+    latest membership change, fall back to the regular lookup.
+    """
+    if user.project_roles is None or user.membership_version is None:
+        return None
+    role = user.project_roles.get(project_id)
+    if role is None:
+        return None
+    if not memberships.token_is_current(db, int(user.id), user.membership_version):
+        return None
+    return ProjectAccess(project_exists=True, member_role=role)
 
 
 def require_project_role(
@@ -33,14 +104,13 @@ def require_project_role(
     user: User,
     allowed_roles: set[str],
 ) -> str:
-    project_exists = db.execute(
-        text("SELECT 1 FROM projects WHERE project_id = :project_id"),
-        {"project_id": project_id},
-    ).first()
-    if not project_exists:
+    access = _access_from_token(db, project_id, user) or get_project_access(
+        db, project_id, int(user.id)
+    )
+    if not access.project_exists:
         raise not_found("Project not found")
 
-    member_role = get_project_member_role(db, project_id, int(user.id))
+    member_role = access.member_role
     if member_role is None:
         raise forbidden("User is not a member of this project")
     if member_role not in allowed_roles:
@@ -1,4 +1,6 @@
-from dataclasses import dataclass
+import hashlib
+import time
+from dataclasses import dataclass, field
 from datetime import UTC, datetime, timedelta
 from typing import Iterable
 
@@ -6,20 +8,36 @@ import jwt
 from fastapi import Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from src.core.cache import TTLCache
 from src.core.config import settings
 from src.core.errors import unauthorized
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
+# Compact member_role codes for the `prj` claim.
+_PROJECT_ROLE_CODES = {"admin": "a", "operator": "o", "viewer": "v"}
+_PROJECT_ROLES_BY_CODE = {code: role for role, code in _PROJECT_ROLE_CODES.items()}
+
+
 @dataclass(frozen=True)
 class User:
     id: int
     email: str | None
     roles: set[str]
-
-
-def create_access_token(user_id: int, email: str | None, roles: list[str]) -> str:
+    # From `prj`/`mv` claims: project_id -> member_role and the user's membership
+    # version when the token was issued. None for tokens without project claims.
+    project_roles: dict[int, str] | None = field(default=None, compare=False)
+    membership_version: int | None = None
+
+
+def create_access_token(
+    user_id: int,
+    email: str | None,
+    roles: list[str],
+    project_roles: dict[int, str] | None = None,
+    membership_version: int | None = None,
+) -> str:
     now = datetime.now(UTC)
     payload = {
         "sub": str(user_id),
@@ -30,10 +48,39 @@ def create_access_token(user_id: int, email: str | None, roles: list[str]) -> st
         "iat": int(now.timestamp()),
         "exp": int((now + timedelta(minutes=settings.jwt_exp_minutes)).timestamp()),
     }
+    if project_roles is not None and membership_version is not None:
+        payload["prj"] = {
+            str(project_id): _PROJECT_ROLE_CODES[role]
+            for project_id, role in project_roles.items()
+        }
+        payload["mv"] = membership_version
     return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
 
-def decode_access_token(token: str) -> User:
+def _decode_project_roles(payload: dict) -> tuple[dict[int, str] | None, int | None]:
+    claims = payload.get("prj")
+    if claims is None:
+        return None, None
+    version = payload.get("mv")
+    if not isinstance(claims, dict) or not isinstance(version, int):
+        raise unauthorized("Token project claims are malformed")
+    try:
+        project_roles = {
+            int(project_id): _PROJECT_ROLES_BY_CODE[code] for project_id, code in claims.items()
+        }
+    except (KeyError, ValueError) as exc:
+        raise unauthorized("Token project claims are malformed") from exc
+    return project_roles, version
+
+
+# sha256(token) -> User, each entry kept until its token's `exp`. Keyed by digest so
+# raw tokens are not held in memory; failed verifications are never cached.
+_verified_tokens: TTLCache[bytes, User] = TTLCache(
+    max_entries=settings.auth_token_cache_max_entries, ttl_seconds=0
+)
+
+
+def _verify_access_token(token: str) -> tuple[User, float | None]:
     try:
         payload = jwt.decode(
             token,
@@ -57,11 +104,39 @@ def decode_access_token(token: str) -> User:
     except ValueError as exc:
         raise unauthorized("Token sub claim must be numeric") from exc
 
-    return User(
+    project_roles, membership_version = _decode_project_roles(payload)
+    user = User(
         id=user_id,
         email=payload.get("email"),
         roles={str(role) for role in roles},
+        project_roles=project_roles,
+        membership_version=membership_version,
     )
+    exp = payload.get("exp")
+    return user, float(exp) if isinstance(exp, (int, float)) else None
+
+
+def decode_access_token(token: str) -> User:
+    """Verify a bearer token, answering repeats of a verified token from the cache."""
+    if settings.auth_token_cache_max_entries <= 0:
+        return _verify_access_token(token)[0]
+
+    key = hashlib.sha256(token.encode()).digest()
+    user = _verified_tokens.get(key)
+    if user is not None:
+        return user
+    user, exp = _verify_access_token(token)
+    if exp is not None:
+        _verified_tokens.set(key, user, ttl_seconds=exp - time.time())
+    return user
+
+
+def token_cache_stats() -> dict[str, int]:
+    return _verified_tokens.stats()
+
+
+def clear_token_cache() -> None:
+    _verified_tokens.clear()
 
 
 def get_current_user(
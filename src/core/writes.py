@@ -0,0 +1,81 @@
+import json
+from collections.abc import Collection
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Offset of the MySQL session time zone from UTC, read on every new connection.
+_db_utc_offset = timedelta(0)
+
+
+def set_db_utc_offset(seconds: int) -> None:
+    global _db_utc_offset
+    _db_utc_offset = timedelta(seconds=seconds)
+
+
+def db_now() -> datetime:
+    """Current time as a TIMESTAMP column stores and returns it.
+
+    That is the session's NOW() with whole seconds: TIMESTAMP values are converted from
+    and to the session time zone, so a value written from here reads back unchanged and
+    matches what CURRENT_TIMESTAMP would have stored. Writes pass it explicitly so the
+    response can be built without selecting the row again.
+    """
+    return (datetime.now(UTC) + _db_utc_offset).replace(tzinfo=None, microsecond=0)
+
+
+def _placeholder(column: str, json_columns: Collection[str]) -> str:
+    return f"CAST(:{column} AS JSON)" if column in json_columns else f":{column}"
+
+
+def _params(values: dict[str, Any], json_columns: Collection[str]) -> dict[str, Any]:
+    return {
+        column: json.dumps(value) if column in json_columns and value is not None else value
+        for column, value in values.items()
+    }
+
+
+def insert_row(
+    db: Session,
+    table: str,
+    values: dict[str, Any],
+    id_column: str,
+    json_columns: Collection[str] = (),
+) -> dict[str, Any]:
+    """INSERT one row and return it as stored: `values` plus the generated `id_column`.
+
+    Columns with server defaults the response needs (timestamps, statuses) must be in
+    `values`. Does not commit; IntegrityError propagates to the caller.
+    """
+    columns = list(values)
+    placeholders = [_placeholder(column, json_columns) for column in columns]
+    result = db.execute(
+        text(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"),
+        _params(values, json_columns),
+    )
+    return {**values, id_column: int(result.lastrowid)}
+
+
+def update_row(
+    db: Session,
+    table: str,
+    key: dict[str, Any],
+    values: dict[str, Any],
+    json_columns: Collection[str] = (),
+) -> int:
+    """UPDATE the row(s) matching `key` with `values`; returns the matched row count.
+
+    Does not commit; IntegrityError propagates to the caller.
+    """
+    assignments = [f"{column} = {_placeholder(column, json_columns)}" for column in values]
+    conditions = [f"{column} = :key_{column}" for column in key]
+    result = db.execute(
+        text(f"UPDATE {table} SET {', '.join(assignments)} WHERE {' AND '.join(conditions)}"),
+        {
+            **_params(values, json_columns),
+            **{f"key_{column}": value for column, value in key.items()},
+        },
+    )
+    return int(result.rowcount)
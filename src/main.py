@@ -1,8 +1,17 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.core.config import settings
 from src.core.logging import configure_logging
+from src.modules.agent_runs.writer import run_writer
+from src.modules.ai_providers.circuit_breaker import run_health_probes
+from src.modules.ai_providers.clients import provider_clients
+from src.modules.ai_providers.service import PROVIDERS, image_jobs
+from src.modules.project_budgets.service import run_spend_reconciler
 
 # [agentops:routers-imports:start]
 from src.modules.agent_catalog.router import router as agent_catalog_router
@@ -17,6 +26,7 @@ from src.modules.me_dashboard.router import router as me_dashboard_router
 from src.modules.project_agent_assignments.router import (
     router as project_agent_assignments_router,
 )
+from src.modules.project_budgets.router import router as project_budgets_router
 from src.modules.project_members.router import router as project_members_router
 from src.modules.project_permissions.router import router as project_permissions_router
 from src.modules.project_stage_status.router import router as project_stage_status_router
@@ -27,8 +37,28 @@ from src.modules.users.router import router as users_router
 configure_logging(settings.log_level)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    _ = app
+    background: list[asyncio.Task[None]] = []
+    if settings.ai_circuit_enabled:
+        background.append(asyncio.create_task(run_health_probes(sorted(PROVIDERS))))
+    if settings.ai_budgets_enabled:
+        background.append(asyncio.create_task(run_spend_reconciler()))
+    if settings.ai_run_write_behind_enabled:
+        run_writer.start()
+    yield
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await image_jobs.stop()
+    await run_writer.stop()
+    await provider_clients.aclose()
+
+
 def create_app() -> FastAPI:
-    app = FastAPI(title=settings.app_name, version="0.1.0")
+    app = FastAPI(title=settings.app_name, version="0.1.0", lifespan=lifespan)
 
     @app.middleware("http")
     async def preflight_middleware(request: Request, call_next):
@@ -59,6 +89,7 @@ def create_app() -> FastAPI:
         prefix="/project-agent-assignments",
         tags=["project-agent-assignments"],
     )
+    app.include_router(project_budgets_router, tags=["project-budgets"])
     app.include_router(project_members_router, tags=["project-members"])
     app.include_router(project_permissions_router, tags=["project-permissions"])
     app.include_router(project_stage_status_router, tags=["project-stage-status"])
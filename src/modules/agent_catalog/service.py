@@ -5,7 +5,11 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from src.core.errors import bad_request, conflict, not_found
+from src.core.writes import db_now, insert_row, update_row
 from src.modules.agent_catalog.schemas import AgentCreate, AgentOut, AgentUpdate
+from src.modules.project_agent_assignments.routing import default_agents
+
+_JSON_COLUMNS = {"metadata_json"}
 
 
 def _json_load(value: object) -> dict | None:
@@ -83,33 +87,21 @@ def get_agent(db: Session, agent_id: int) -> AgentOut:
 
 
 def create_agent(db: Session, payload: AgentCreate) -> AgentOut:
+    now = db_now()
     try:
-        result = db.execute(
-            text(
-                """
-                INSERT INTO agent_catalog (
-                  agent_code, agent_name, module_name, owner_team,
-                  default_model, skill_ref, is_active, metadata_json
-                ) VALUES (
-                  :agent_code, :agent_name, :module_name, :owner_team,
-                  :default_model, :skill_ref, :is_active,
-                  CAST(:metadata_json AS JSON)
-                )
-                """
-            ),
-            {
-                **payload.model_dump(),
-                "metadata_json": json.dumps(payload.metadata_json)
-                if payload.metadata_json is not None
-                else None,
-            },
+        agent = insert_row(
+            db,
+            "agent_catalog",
+            {**payload.model_dump(), "created_at": now, "updated_at": now},
+            id_column="agent_id",
+            json_columns=_JSON_COLUMNS,
         )
         db.commit()
     except IntegrityError as exc:
         db.rollback()
         raise conflict("Duplicated agent_code or invalid payload") from exc
 
-    return get_agent(db, int(result.lastrowid))
+    return _map_row(agent)
 
 
 def update_agent(db: Session, agent_id: int, payload: AgentUpdate) -> AgentOut:
@@ -118,23 +110,20 @@ def update_agent(db: Session, agent_id: int, payload: AgentUpdate) -> AgentOut:
     if not update_values:
         return current
 
-    fields: list[str] = []
-    params: dict[str, object] = {"agent_id": agent_id}
-    for key, value in update_values.items():
-        if key == "metadata_json":
-            fields.append("metadata_json = CAST(:metadata_json AS JSON)")
-            params[key] = json.dumps(value) if value is not None else None
-            continue
-        fields.append(f"{key} = :{key}")
-        params[key] = value
-
+    update_values["updated_at"] = db_now()
     try:
-        db.execute(
-            text(f"UPDATE agent_catalog SET {', '.join(fields)} WHERE agent_id = :agent_id"),
-            params,
+        update_row(
+            db,
+            "agent_catalog",
+            {"agent_id": agent_id},
+            update_values,
+            json_columns=_JSON_COLUMNS,
         )
         db.commit()
     except IntegrityError as exc:
         db.rollback()
         raise bad_request("Invalid agent update payload") from exc
-    return get_agent(db, agent_id)
+    if "is_active" in update_values and update_values["is_active"] != current.is_active:
+        # Any project may route to this agent, directly or through the fallback.
+        default_agents.invalidate()
+    return _map_row({**current.model_dump(), **update_values})
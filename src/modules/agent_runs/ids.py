@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.db import SessionLocal
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class RunIdAllocator:
+    """Hands out agent_run ids from blocks reserved in `agent_run_id_allocator`.
+
+    Lets a run id be returned before its row is written. Once write-behind is enabled
+    every agent_runs INSERT must take its id from here, because an AUTO_INCREMENT
+    insert could pick an id that is reserved but not yet written. The GREATEST() in
+    the reservation catches up with rows inserted before the allocator was in use.
+    Ids left in a block when the process exits are simply never used.
+
+    `prefetch` reserves the next block while the current one is still half full, so
+    `reserve` only waits on the DB when that spare block has not arrived yet.
+    """
+
+    def __init__(
+        self,
+        block_size: int,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ) -> None:
+        self.block_size = max(1, block_size)
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        # (first id, end) of the block reserved ahead by `prefetch`.
+        self._spare: tuple[int, int] | None = None
+
+    def _reserve_block(self, size: int) -> int:
+        db = self._session_factory()
+        try:
+            db.execute(
+                text(
+                    """
+                    UPDATE agent_run_id_allocator
+                    SET next_id = LAST_INSERT_ID(
+                      GREATEST(next_id, (SELECT COALESCE(MAX(agent_run_id), 0) + 1 FROM agent_runs))
+                      + :size
+                    )
+                    WHERE allocator_id = 1
+                    """
+                ),
+                {"size": size},
+            )
+            end = int(db.execute(text("SELECT LAST_INSERT_ID()")).scalar_one())
+            db.commit()
+        finally:
+            db.close()
+        logger.info("agent_run_ids_reserved first_id=%s size=%s", end - size, size)
+        return end - size
+
+    @property
+    def running_low(self) -> bool:
+        """True when the current block is half used and no spare block is reserved."""
+        with self._lock:
+            return self._spare is None and self._end - self._next < (self.block_size + 1) // 2
+
+    def prefetch(self) -> None:
+        """Reserve the next block ahead of time; meant for a single background caller."""
+        if not self.running_low:
+            return
+        first = self._reserve_block(self.block_size)
+        with self._lock:
+            self._spare = (first, first + self.block_size)
+
+    def reserve(self, count: int = 1) -> list[int]:
+        """Return `count` consecutive unused run ids."""
+        with self._lock:
+            if self._end - self._next < count:
+                if self._spare is not None and self._spare[1] - self._spare[0] >= count:
+                    self._next, self._end = self._spare
+                    self._spare = None
+                else:
+                    size = max(count, self.block_size)
+                    self._next = self._reserve_block(size)
+                    self._end = self._next + size
+            first = self._next
+            self._next += count
+        return list(range(first, first + count))
+
+
+run_ids = RunIdAllocator(block_size=settings.ai_run_id_block_size)
@@ -21,6 +21,18 @@ class AgentRunCreate(BaseModel):
     created_by_user_id: int | None = None
 
 
+class AgentRunUpdate(BaseModel):
+    run_status: str
+    provider: str | None = None
+    model_name: str | None = None
+    output_payload: dict | None = None
+    error_message: str | None = Field(default=None, max_length=1000)
+    duration_ms: int | None = None
+    token_input_count: int | None = None
+    token_output_count: int | None = None
+    cost_usd: float | None = None
+
+
 class AgentRunOut(BaseModel):
     agent_run_id: int
     project_id: int
@@ -1,14 +1,22 @@
 import json
+import uuid
+from datetime import datetime
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from src.core.config import settings
 from src.core.errors import bad_request
-from src.modules.agent_runs.schemas import AgentRunCreate, AgentRunOut
+from src.core.memberships import memberships
+from src.core.writes import db_now
+from src.modules.agent_runs.ids import run_ids
+from src.modules.agent_runs.schemas import AgentRunCreate, AgentRunOut, AgentRunUpdate
+from src.modules.project_budgets.spend import project_spend
 
 ALLOWED_RUN_STATUS = {"queued", "running", "success", "failed", "cancelled", "timeout"}
 ALLOWED_TRIGGER_SOURCE = {"manual", "schedule", "event", "api"}
+FINAL_RUN_STATUS = {"success", "failed", "cancelled", "timeout"}
 
 
 def _json_load(value: object) -> dict | None:
@@ -71,6 +79,9 @@ def list_agent_runs_for_user(
     project_id: int | None = None,
     agent_id: int | None = None,
 ) -> list[AgentRunOut]:
+    project_ids = list(memberships.projects_for_user(db, user_id))
+    if not project_ids:
+        return []
     rows = (
         db.execute(
             text(
@@ -81,16 +92,15 @@ def list_agent_runs_for_user(
                   ar.duration_ms, ar.token_input_count, ar.token_output_count, ar.cost_usd,
                   ar.created_by_user_id, ar.created_at
                 FROM agent_runs ar
-                JOIN project_members pm ON pm.project_id = ar.project_id
-                WHERE pm.user_id = :user_id
+                WHERE ar.project_id IN :project_ids
                   AND (:project_id IS NULL OR ar.project_id = :project_id)
                   AND (:agent_id IS NULL OR ar.agent_id = :agent_id)
                 ORDER BY ar.agent_run_id DESC
                 LIMIT :limit OFFSET :offset
                 """
-            ),
+            ).bindparams(bindparam("project_ids", expanding=True)),
             {
-                "user_id": user_id,
+                "project_ids": project_ids,
                 "project_id": project_id,
                 "agent_id": agent_id,
                 "limit": limit,
@@ -103,42 +113,181 @@ def list_agent_runs_for_user(
     return [_map_row(dict(r)) for r in rows]
 
 
-def create_agent_run(db: Session, payload: AgentRunCreate) -> AgentRunOut:
+def _validate_run(payload: AgentRunCreate) -> None:
     if payload.run_status not in ALLOWED_RUN_STATUS:
         raise bad_request(f"run_status must be one of: {sorted(ALLOWED_RUN_STATUS)}")
     if payload.trigger_source not in ALLOWED_TRIGGER_SOURCE:
         raise bad_request(f"trigger_source must be one of: {sorted(ALLOWED_TRIGGER_SOURCE)}")
 
+
+def _insert_params(payload: AgentRunCreate) -> dict:
+    return {
+        **payload.model_dump(),
+        "input_payload": json.dumps(payload.input_payload)
+        if payload.input_payload is not None
+        else None,
+        "output_payload": json.dumps(payload.output_payload)
+        if payload.output_payload is not None
+        else None,
+    }
+
+
+_INSERT_COLUMNS = (
+    "project_id",
+    "agent_id",
+    "stage_id",
+    "provider",
+    "model_name",
+    "run_status",
+    "trigger_source",
+    "input_payload",
+    "output_payload",
+    "error_message",
+    "duration_ms",
+    "token_input_count",
+    "token_output_count",
+    "cost_usd",
+    "created_by_user_id",
+)
+_JSON_COLUMNS = {"input_payload", "output_payload"}
+
+
+def _reserved_ids(count: int) -> list[int] | None:
+    """Explicit run ids while write-behind is enabled (see RunIdAllocator), else None."""
+    if not settings.ai_run_write_behind_enabled:
+        return None
+    return run_ids.reserve(count)
+
+
+def _insert_rows(
+    db: Session,
+    payloads: list[AgentRunCreate],
+    ids: list[int] | None = None,
+    keep_existing: bool = False,
+    created_at: datetime | None = None,
+) -> list[int]:
+    """Run one multi-row INSERT and return the ids of its rows in payload order.
+
+    Without `ids` the rows take AUTO_INCREMENT values. One row's id is `lastrowid`;
+    several rows are not guaranteed consecutive ids (innodb_autoinc_lock_mode=2), so
+    they share an `insert_batch` token and their ids are read back by it. Within one
+    statement the ids still grow in VALUES order. `keep_existing` turns rows whose id
+    is already stored into no-ops, so replaying a batch is safe. `created_at` replaces
+    the server default when the caller needs to return it.
+    """
+    columns = _INSERT_COLUMNS if ids is None else ("agent_run_id", *_INSERT_COLUMNS)
+    batch_token = uuid.uuid4().hex if ids is None and len(payloads) > 1 else None
+    if batch_token is not None:
+        columns = (*columns, "insert_batch")
+    if created_at is not None:
+        columns = (*columns, "created_at")
+    params: dict = {}
+    rows: list[str] = []
+    for index, payload in enumerate(payloads):
+        values = _insert_params(payload)
+        if ids is not None:
+            values["agent_run_id"] = ids[index]
+        values["insert_batch"] = batch_token
+        values["created_at"] = created_at
+        placeholders: list[str] = []
+        for column in columns:
+            key = f"{column}_{index}"
+            params[key] = values[column]
+            placeholders.append(f"CAST(:{key} AS JSON)" if column in _JSON_COLUMNS else f":{key}")
+        rows.append(f"({', '.join(placeholders)})")
+    sql = f"INSERT INTO agent_runs ({', '.join(columns)}) VALUES {', '.join(rows)}"
+    if keep_existing:
+        sql += " ON DUPLICATE KEY UPDATE agent_run_id = agent_run_id"
+    result = db.execute(text(sql), params)
+    if ids is not None:
+        return ids
+    if batch_token is None:
+        return [int(result.lastrowid)]
+    inserted = db.execute(
+        text(
+            """
+            SELECT agent_run_id
+            FROM agent_runs
+            WHERE insert_batch = :insert_batch
+            ORDER BY agent_run_id
+            """
+        ),
+        {"insert_batch": batch_token},
+    ).scalars()
+    return [int(agent_run_id) for agent_run_id in inserted]
+
+
+def create_agent_runs_bulk(db: Session, payloads: list[AgentRunCreate]) -> list[int]:
+    """Insert several agent_runs with one multi-row INSERT and return their ids in order."""
+    if not payloads:
+        return []
+    for payload in payloads:
+        _validate_run(payload)
+
     try:
-        result = db.execute(
-            text(
-                """
-                INSERT INTO agent_runs (
-                  project_id, agent_id, stage_id, provider, model_name, run_status, trigger_source,
-                  input_payload, output_payload, error_message, duration_ms,
-                  token_input_count, token_output_count, cost_usd, created_by_user_id
-                ) VALUES (
-                  :project_id, :agent_id, :stage_id, :provider, :model_name, :run_status, :trigger_source,
-                  CAST(:input_payload AS JSON), CAST(:output_payload AS JSON), :error_message, :duration_ms,
-                  :token_input_count, :token_output_count, :cost_usd, :created_by_user_id
-                )
-                """
-            ),
-            {
-                **payload.model_dump(),
-                "input_payload": json.dumps(payload.input_payload)
-                if payload.input_payload is not None
-                else None,
-                "output_payload": json.dumps(payload.output_payload)
-                if payload.output_payload is not None
-                else None,
-            },
-        )
+        inserted_ids = _insert_rows(db, payloads, _reserved_ids(len(payloads)))
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        raise bad_request("Invalid project_id, agent_id, stage_id or created_by_user_id") from exc
+
+    for payload in payloads:
+        project_spend.record(payload.project_id, payload.cost_usd)
+    return inserted_ids
+
+
+def write_agent_runs(db: Session, runs: list[tuple[int, AgentRunCreate]]) -> None:
+    """INSERT runs whose ids were reserved up front, in the caller's transaction.
+
+    Rows already stored are left untouched, so a journal can be replayed safely.
+    """
+    _insert_rows(db, [payload for _, payload in runs], [run_id for run_id, _ in runs], True)
+
+
+def insert_agent_run(
+    db: Session,
+    payload: AgentRunCreate,
+    created_at: datetime | None = None,
+) -> int:
+    """INSERT one agent_run in the caller's transaction and return its id.
+
+    Neither commits nor records project spend; callers do both once their
+    transaction is committed. IntegrityError propagates to the caller.
+    """
+    _validate_run(payload)
+    return _insert_rows(db, [payload], _reserved_ids(1), created_at=created_at)[0]
+
+
+def save_agent_run(
+    db: Session,
+    payload: AgentRunCreate,
+    created_at: datetime | None = None,
+) -> int:
+    """INSERT and commit one agent_run, returning its id without reading it back."""
+    try:
+        agent_run_id = insert_agent_run(db, payload, created_at)
         db.commit()
     except IntegrityError as exc:
         db.rollback()
         raise bad_request("Invalid project_id, agent_id, stage_id or created_by_user_id") from exc
 
+    project_spend.record(payload.project_id, payload.cost_usd)
+    return agent_run_id
+
+
+def create_agent_run(db: Session, payload: AgentRunCreate) -> AgentRunOut:
+    created_at = db_now()
+    agent_run_id = save_agent_run(db, payload, created_at)
+    return AgentRunOut(
+        **payload.model_dump(),
+        agent_run_id=agent_run_id,
+        started_at=None,
+        finished_at=None,
+        created_at=created_at,
+    )
+
+
+def get_agent_run(db: Session, agent_run_id: int) -> AgentRunOut | None:
     row = (
         db.execute(
             text(
@@ -152,11 +301,50 @@ def create_agent_run(db: Session, payload: AgentRunCreate) -> AgentRunOut:
                 WHERE agent_run_id = :agent_run_id
                 """
             ),
-            {"agent_run_id": result.lastrowid},
+            {"agent_run_id": agent_run_id},
         )
         .mappings()
         .first()
     )
-    if not row:
-        raise bad_request("Agent run insert failed")
-    return _map_row(dict(row))
+    return _map_row(dict(row)) if row else None
+
+
+def update_agent_run(db: Session, agent_run_id: int, payload: AgentRunUpdate) -> None:
+    """Move a run to a new status; NULL fields keep their stored value.
+
+    `running` stamps started_at (once); final statuses stamp finished_at.
+    """
+    if payload.run_status not in ALLOWED_RUN_STATUS:
+        raise bad_request(f"run_status must be one of: {sorted(ALLOWED_RUN_STATUS)}")
+    db.execute(
+        text(
+            """
+            UPDATE agent_runs
+            SET
+              run_status = :run_status,
+              provider = COALESCE(:provider, provider),
+              model_name = COALESCE(:model_name, model_name),
+              output_payload = COALESCE(CAST(:output_payload AS JSON), output_payload),
+              error_message = COALESCE(:error_message, error_message),
+              duration_ms = COALESCE(:duration_ms, duration_ms),
+              token_input_count = COALESCE(:token_input_count, token_input_count),
+              token_output_count = COALESCE(:token_output_count, token_output_count),
+              cost_usd = COALESCE(:cost_usd, cost_usd),
+              started_at = CASE
+                WHEN :run_status = 'running' THEN COALESCE(started_at, CURRENT_TIMESTAMP)
+                ELSE started_at
+              END,
+              finished_at = CASE WHEN :is_final THEN CURRENT_TIMESTAMP ELSE finished_at END
+            WHERE agent_run_id = :agent_run_id
+            """
+        ),
+        {
+            **payload.model_dump(),
+            "output_payload": json.dumps(payload.output_payload)
+            if payload.output_payload is not None
+            else None,
+            "is_final": payload.run_status in FINAL_RUN_STATUS,
+            "agent_run_id": agent_run_id,
+        },
+    )
+    db.commit()
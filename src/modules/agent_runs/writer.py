@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from contextlib import suppress
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.db import SessionLocal
+from src.core.logging import get_logger
+from src.modules.agent_runs.ids import RunIdAllocator, run_ids
+from src.modules.agent_runs.schemas import AgentRunCreate
+from src.modules.agent_runs.service import (
+    _validate_run,
+    create_agent_runs_bulk,
+    save_agent_run,
+    write_agent_runs,
+)
+from src.modules.project_budgets.spend import project_spend
+
+logger = get_logger(__name__)
+
+_Run = tuple[int, AgentRunCreate]
+# How often a pending journal is retried while the DB may still be down.
+_REPLAY_INTERVAL_SECONDS = 5.0
+# Upper bound for `submit(wait=True)`; past it the id is returned before its row exists.
+_WAIT_TIMEOUT_SECONDS = 10.0
+
+
+class AgentRunWriter:
+    """Write-behind buffer for agent_runs produced on the generation hot path.
+
+    `submit` reserves the run id, queues the run and returns at once; a background task
+    flushes the queue in multi-row INSERTs every `flush_seconds` or whenever a full batch
+    is waiting. With `wait=True` the caller is held until its rows are committed (or
+    journaled) and the flush starts at once, so concurrent runs still share one INSERT.
+    Batches that fail with a DB error are appended to a JSON-lines journal, which is
+    replayed every few seconds until the DB takes it. The flush task also reserves the
+    next run id block ahead of time. `stop` drains the queue on shutdown.
+
+    `submit` may be called from worker threads, so the queue is a locked deque rather
+    than an asyncio.Queue.
+    """
+
+    def __init__(
+        self,
+        allocator: RunIdAllocator,
+        max_queue: int,
+        batch_size: int,
+        flush_seconds: float,
+        journal_path: str,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ) -> None:
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.journal_path = journal_path
+        self._allocator = allocator
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._journal_lock = threading.Lock()
+        self._queue: deque[_Run] = deque()
+        # Ids that are queued or being flushed.
+        self._pending: set[int] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._next_replay = 0.0
+        self.flushed = 0
+        self.rejected = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the flush task on the running event loop (from the app lifespan)."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self._run(), name="agent-run-writer")
+        logger.info(
+            "agent_run_writer_started batch_size=%s max_queue=%s journal=%s",
+            self.batch_size,
+            self.max_queue,
+            self.journal_path,
+        )
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def submit(self, payloads: list[AgentRunCreate], wait: bool = False) -> list[int] | None:
+        """Queue runs and return their reserved ids, or None when the writer cannot take
+        them (not running or queue full) and the caller should insert synchronously.
+
+        With `wait`, return only once the runs have been flushed, so the ids can be
+        referenced right away (e.g. by ia_messages.run_id).
+        """
+        for payload in payloads:
+            _validate_run(payload)
+        # Waiting on the loop thread would block the flush it waits for.
+        if wait and self._on_loop_thread():
+            return None
+        with self._lock:
+            if not self.running or len(self._queue) + len(payloads) > self.max_queue:
+                return None
+        try:
+            ids = self._allocator.reserve(len(payloads))
+        except DBAPIError as exc:
+            logger.error("agent_run_writer_reserve_failed error=%s", exc.orig)
+            return None
+        with self._lock:
+            self._queue.extend(zip(ids, payloads, strict=True))
+            self._pending.update(ids)
+            flush_now = wait or len(self._queue) >= self.batch_size
+        for payload in payloads:
+            project_spend.record(payload.project_id, payload.cost_usd)
+        if flush_now or self._allocator.running_low:
+            self._wake_up()
+        if wait:
+            self._wait_flushed(ids)
+        return ids
+
+    def _wake_up(self) -> None:
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _wait_flushed(self, ids: list[int]) -> None:
+        wanted = set(ids)
+        with self._written:
+            flushed = self._written.wait_for(
+                lambda: self._pending.isdisjoint(wanted), _WAIT_TIMEOUT_SECONDS
+            )
+        if not flushed:
+            logger.warning("agent_run_writer_wait_timeout run_ids=%s", ids)
+
+    def _take(self, limit: int) -> list[_Run]:
+        with self._lock:
+            return [self._queue.popleft() for _ in range(min(limit, len(self._queue)))]
+
+    def _flush_taken(self, batch: list[_Run]) -> None:
+        try:
+            self.flush(batch)
+        finally:
+            with self._written:
+                self._pending.difference_update(run_id for run_id, _ in batch)
+                self._written.notify_all()
+
+    async def _run(self) -> None:
+        assert self._wake is not None
+        while True:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            self._wake.clear()
+            while batch := self._take(self.batch_size):
+                await run_in_threadpool(self._flush_taken, batch)
+            if self._allocator.running_low:
+                try:
+                    await run_in_threadpool(self._allocator.prefetch)
+                except DBAPIError as exc:
+                    logger.error("agent_run_writer_prefetch_failed error=%s", exc.orig)
+            if time.monotonic() >= self._next_replay:
+                self._next_replay = time.monotonic() + _REPLAY_INTERVAL_SECONDS
+                await run_in_threadpool(self.replay_journal)
+
+    def flush(self, batch: list[_Run]) -> bool:
+        """INSERT one batch; False (and the batch journaled) when the DB is unavailable."""
+        db = self._session_factory()
+        try:
+            try:
+                write_agent_runs(db, batch)
+                db.commit()
+                self.flushed += len(batch)
+                return True
+            except IntegrityError:
+                db.rollback()
+                # One bad row (e.g. a deleted agent) must not take the batch down with it.
+                for run in batch:
+                    try:
+                        write_agent_runs(db, [run])
+                        db.commit()
+                        self.flushed += 1
+                    except IntegrityError as exc:
+                        db.rollback()
+                        self.rejected += 1
+                        logger.error(
+                            "agent_run_writer_rejected run_id=%s project_id=%s error=%s",
+                            run[0],
+                            run[1].project_id,
+                            exc.orig,
+                        )
+                return True
+        except DBAPIError as exc:
+            with suppress(DBAPIError):
+                db.rollback()
+            self._spill(batch)
+            logger.error("agent_run_writer_db_unavailable runs=%s error=%s", len(batch), exc.orig)
+            return False
+        finally:
+            db.close()
+
+    def _spill(self, batch: list[_Run]) -> None:
+        lines = [
+            json.dumps({"agent_run_id": run_id, **payload.model_dump(mode="json")}) + "\n"
+            for run_id, payload in batch
+        ]
+        with self._journal_lock:
+            with open(self.journal_path, "a", encoding="utf-8") as journal:
+                journal.writelines(lines)
+                journal.flush()
+                os.fsync(journal.fileno())
+        self.spilled += len(batch)
+
+    def replay_journal(self) -> None:
+        """Re-insert journaled runs; rows that made it in before are skipped."""
+        replaying = f"{self.journal_path}.replay"
+        with self._journal_lock:
+            # A leftover replay file means a previous replay was interrupted: finish it first.
+            if not os.path.exists(replaying):
+                if not os.path.exists(self.journal_path):
+                    return
+                os.replace(self.journal_path, replaying)
+        runs: list[_Run] = []
+        with open(replaying, encoding="utf-8") as journal:
+            for line in journal:
+                if line.strip():
+                    data: dict[str, Any] = json.loads(line)
+                    runs.append((int(data.pop("agent_run_id")), AgentRunCreate(**data)))
+        for start in range(0, len(runs), self.batch_size):
+            batch = runs[start : start + self.batch_size]
+            if not self.flush(batch):
+                # The DB went away again: keep the rest journaled too.
+                self._spill(runs[start + self.batch_size :])
+                break
+            self.replayed += len(batch)
+        os.remove(replaying)
+        logger.info("agent_run_writer_journal_replayed runs=%s", len(runs))
+
+    async def stop(self) -> None:
+        """Stop the flush task and write out everything still queued."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        while batch := self._take(self.batch_size):
+            await run_in_threadpool(self._flush_taken, batch)
+        logger.info("agent_run_writer_stopped stats=%s", self.stats())
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            queued = len(self._queue)
+        return {
+            "running": self.running,
+            "queued": queued,
+            "max_queue": self.max_queue,
+            "flushed": self.flushed,
+            "rejected": self.rejected,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+        }
+
+
+run_writer = AgentRunWriter(
+    allocator=run_ids,
+    max_queue=settings.ai_run_write_behind_queue_size,
+    batch_size=settings.ai_run_write_behind_batch_size,
+    flush_seconds=settings.ai_run_write_behind_flush_ms / 1000,
+    journal_path=settings.ai_run_journal_path,
+)
+
+
+def record_agent_run(db: Session, payload: AgentRunCreate, wait: bool = False) -> int:
+    """Persist a finished generation run and return its id.
+
+    Goes through the write-behind queue when enabled and running, else one synchronous
+    INSERT + COMMIT (without reading the row back). A queued run's id is returned
+    before its row is written; pass `wait=True` when the same request goes on to
+    reference the id as a foreign key.
+    """
+    if settings.ai_run_write_behind_enabled:
+        ids = run_writer.submit([payload], wait)
+        if ids is not None:
+            return ids[0]
+    return save_agent_run(db, payload)
+
+
+def record_agent_runs(
+    db: Session,
+    payloads: list[AgentRunCreate],
+    wait: bool = False,
+) -> list[int]:
+    """Batch variant of `record_agent_run`; ids come back in payload order."""
+    if settings.ai_run_write_behind_enabled and payloads:
+        ids = run_writer.submit(payloads, wait)
+        if ids is not None:
+            return ids
+    return create_agent_runs_bulk(db, payloads)
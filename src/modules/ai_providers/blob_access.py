@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import time
+from urllib.parse import urlencode
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+
+
+def _signature(sha256: str, project_id: int, expires: int) -> str:
+    message = f"ai-blob:{sha256}:{project_id}:{expires}".encode()
+    return hmac.new(settings.jwt_secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def blob_url(sha256: str, project_id: int, now: float | None = None) -> str:
+    """Signed URL for a project's blob, valid for `BLOB_URL_TTL_SECONDS`.
+
+    The signature stands in for the bearer header an `<img>` cannot send; the URL is
+    absolute when `PUBLIC_API_BASE_URL` is set.
+    """
+    expires = int(now if now is not None else time.time()) + settings.blob_url_ttl_seconds
+    query = urlencode(
+        {"project_id": project_id, "exp": expires, "sig": _signature(sha256, project_id, expires)}
+    )
+    return f"{settings.public_api_base_url}/ai/blobs/{sha256}?{query}"
+
+
+def valid_blob_signature(sha256: str, project_id: int, expires: int, signature: str) -> bool:
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(sha256, project_id, expires), signature)
+
+
+def record_blob_project(db: Session, sha256: str, project_id: int) -> None:
+    """Record that `project_id` produced the blob, so its members may read it."""
+    db.execute(
+        text("INSERT IGNORE INTO ai_blob_projects (sha256, project_id) VALUES (:sha256, :pid)"),
+        {"sha256": sha256, "pid": project_id},
+    )
+    db.commit()
+
+
+def blob_in_project(db: Session, sha256: str, project_id: int) -> bool:
+    row = db.execute(
+        text(
+            """
+            SELECT 1
+            FROM ai_blob_projects
+            WHERE sha256 = :sha256 AND project_id = :project_id
+            """
+        ),
+        {"sha256": sha256, "project_id": project_id},
+    ).first()
+    return row is not None
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import httpx
+
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.modules.ai_providers.clients import provider_clients
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one provider.
+
+    closed -> open after `failure_threshold` unavailable outcomes in a row. Once
+    `open_seconds` have passed a single probe call is let through (half_open); its
+    outcome closes or re-opens the circuit. A probe that never reports back is
+    replaced after another `open_seconds`.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        failure_threshold: int,
+        open_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.provider = provider
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self._opened_at: float | None = None
+        self._probe_started_at: float | None = None
+        self.opened_at: float | None = None
+        self.last_failure_at: float | None = None
+        self.last_success_at: float | None = None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = self._clock()
+            if self.state == OPEN:
+                if self._opened_at is not None and now - self._opened_at < self.open_seconds:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_started_at = now
+                logger.info("ai_circuit_half_open provider=%s", self.provider)
+                return True
+            probe_age = now - (self._probe_started_at or 0.0)
+            if self._probe_started_at is not None and probe_age < self.open_seconds:
+                return False
+            self._probe_started_at = now
+            return True
+
+    def is_closed(self) -> bool:
+        with self._lock:
+            return self.state == CLOSED
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.last_success_at = time.time()
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                logger.info("ai_circuit_closed provider=%s", self.provider)
+            self.state = CLOSED
+            self._opened_at = None
+            self._probe_started_at = None
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.last_failure_at = time.time()
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.times_opened += 1
+                self._opened_at = self._clock()
+                self._probe_started_at = None
+                self.opened_at = time.time()
+                logger.warning(
+                    "ai_circuit_opened provider=%s consecutive_failures=%s",
+                    self.provider,
+                    self.consecutive_failures,
+                )
+
+    def retry_after_seconds(self) -> float | None:
+        with self._lock:
+            if self.state != OPEN or self._opened_at is None:
+                return None
+            return max(0.0, round(self.open_seconds - (self._clock() - self._opened_at), 3))
+
+    def snapshot(self) -> dict[str, Any]:
+        retry_after = self.retry_after_seconds()
+        with self._lock:
+            return {
+                "provider": self.provider,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "open_seconds": self.open_seconds,
+                "times_opened": self.times_opened,
+                "opened_at": self.opened_at,
+                "retry_after_seconds": retry_after,
+                "last_failure_at": self.last_failure_at,
+                "last_success_at": self.last_success_at,
+            }
+
+
+class CircuitBreakerRegistry:
+    """Per-provider breakers shared by every generation path in the process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is not None:
+            return breaker
+        with self._lock:
+            breaker = self._breakers.get(provider)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    provider,
+                    failure_threshold=settings.ai_circuit_failure_threshold,
+                    open_seconds=settings.ai_circuit_open_seconds,
+                )
+                self._breakers[provider] = breaker
+            return breaker
+
+    def allow(self, provider: str) -> bool:
+        return not settings.ai_circuit_enabled or self.get(provider).allow()
+
+    def is_closed(self, provider: str) -> bool:
+        return not settings.ai_circuit_enabled or self.get(provider).is_closed()
+
+    def record_success(self, provider: str) -> None:
+        self.get(provider).record_success()
+
+    def record_failure(self, provider: str) -> None:
+        self.get(provider).record_failure()
+
+    def stats(self) -> list[dict[str, Any]]:
+        with self._lock:
+            breakers = sorted(self._breakers.values(), key=lambda b: b.provider)
+        return [breaker.snapshot() for breaker in breakers]
+
+
+circuit_breakers = CircuitBreakerRegistry()
+
+
+def _probe_request(provider: str) -> tuple[str, dict[str, str], dict[str, str]] | None:
+    if provider == "openai":
+        if not settings.openai_api_key:
+            return None
+        headers = {"Authorization": f"Bearer {settings.openai_api_key}"}
+        return f"{settings.openai_base_url}/models", headers, {}
+    if not settings.gemini_api_key:
+        return None
+    return f"{settings.gemini_base_url}/models", {}, {"key": settings.gemini_api_key}
+
+
+async def probe_provider(provider: str) -> None:
+    """Check an open circuit with a free listing call instead of waiting for user traffic."""
+    request = _probe_request(provider)
+    if request is None or not circuit_breakers.get(provider).allow():
+        return
+    url, headers, params = request
+    try:
+        res = await provider_clients.get_async(provider).get(
+            url,
+            headers=headers,
+            params=params,
+            timeout=settings.ai_circuit_probe_timeout_seconds,
+        )
+    except httpx.HTTPError as exc:
+        logger.info("ai_circuit_probe_failed provider=%s error=%s", provider, exc)
+        circuit_breakers.record_failure(provider)
+        return
+    if res.status_code in {408, 429} or res.status_code >= 500:
+        logger.info("ai_circuit_probe_failed provider=%s status=%s", provider, res.status_code)
+        circuit_breakers.record_failure(provider)
+        return
+    logger.info("ai_circuit_probe_ok provider=%s status=%s", provider, res.status_code)
+    circuit_breakers.record_success(provider)
+
+
+async def run_health_probes(providers: list[str]) -> None:
+    while True:
+        await asyncio.sleep(settings.ai_circuit_probe_interval_seconds)
+        for provider in providers:
+            if circuit_breakers.is_closed(provider):
+                continue
+            try:
+                await probe_provider(provider)
+            except Exception:
+                logger.exception("ai_circuit_probe_error provider=%s", provider)
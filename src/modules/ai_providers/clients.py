@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import threading
+import time
+from typing import Any
+
+import httpx
+
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class ProviderClientRegistry:
+    """Process-wide pooled httpx clients, one per provider.
+
+    Clients are created lazily and reused for every generation so TCP/TLS
+    connections stay warm between calls. Clients are bound to the event loop
+    that created them. Call `aclose()` on shutdown.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._async_clients: dict[str, tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+        self._created_at: dict[str, float] = {}
+        self._request_counts: dict[str, int] = {}
+
+    @property
+    def http2(self) -> bool:
+        return settings.ai_http2_enabled and _http2_available()
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.ai_http_max_connections,
+            max_keepalive_connections=settings.ai_http_max_keepalive_connections,
+            keepalive_expiry=settings.ai_http_keepalive_expiry_seconds,
+        )
+
+    def _bump(self, provider: str) -> None:
+        with self._lock:
+            self._request_counts[provider] = self._request_counts.get(provider, 0) + 1
+
+    def _count_request_async(self, provider: str) -> Any:
+        async def hook(request: httpx.Request) -> None:
+            _ = request
+            self._bump(provider)
+
+        return hook
+
+    def get_async(self, provider: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        entry = self._async_clients.get(provider)
+        if entry is not None and entry[0] is loop and not entry[1].is_closed:
+            return entry[1]
+        with self._lock:
+            entry = self._async_clients.get(provider)
+            if entry is None or entry[0] is not loop or entry[1].is_closed:
+                client = httpx.AsyncClient(
+                    timeout=settings.ai_http_timeout_seconds,
+                    limits=self._limits(),
+                    http2=self.http2,
+                    event_hooks={"request": [self._count_request_async(provider)]},
+                )
+                entry = (loop, client)
+                self._async_clients[provider] = entry
+                self._created_at[provider] = time.time()
+                logger.info(
+                    "ai_async_http_client_created provider=%s http2=%s", provider, self.http2
+                )
+            return entry[1]
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entries = list(self._async_clients.items())
+            self._async_clients.clear()
+        for provider, (client_loop, client) in entries:
+            if client_loop is not loop:
+                continue
+            try:
+                await client.aclose()
+            except Exception:
+                logger.exception("ai_async_http_client_close_error provider=%s", provider)
+
+    def stats(self) -> list[dict[str, Any]]:
+        with self._lock:
+            items = [
+                (provider, "async", client) for provider, (_, client) in self._async_clients.items()
+            ]
+            counts = dict(self._request_counts)
+        out: list[dict[str, Any]] = []
+        for provider, mode, client in items:
+            out.append(
+                {
+                    "provider": provider,
+                    "mode": mode,
+                    "http2": self.http2,
+                    "created_at": self._created_at.get(provider),
+                    "requests_sent": counts.get(provider, 0),
+                    **_pool_connection_stats(client),
+                }
+            )
+        return out
+
+
+def _pool_connection_stats(client: httpx.AsyncClient) -> dict[str, int]:
+    # httpx does not expose pool state publicly; read it from the httpcore pool when present.
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for c in connections if c.is_idle())
+    return {
+        "connections_total": len(connections),
+        "connections_idle": idle,
+        "connections_active": len(connections) - idle,
+        "max_connections": settings.ai_http_max_connections,
+        "max_keepalive_connections": settings.ai_http_max_keepalive_connections,
+    }
+
+
+provider_clients = ProviderClientRegistry()
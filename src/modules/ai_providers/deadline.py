@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+
+from src.core.config import settings
+from src.modules.ai_providers.metrics import provider_metrics
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+
+class Deadline:
+    """Time budget for one API request, shared by every provider attempt it makes."""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.budget_seconds = seconds
+        self._clock = clock
+        self._expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def attempt_timeout(self, provider: str, model: str) -> float | None:
+        """Timeout for the next provider attempt, or None when it cannot finish in time.
+
+        An attempt needs at least `AI_DEADLINE_MIN_ATTEMPT_MS`, or the provider's
+        observed EWMA latency once enough samples exist.
+        """
+        remaining = self.remaining()
+        needed = settings.ai_deadline_min_attempt_ms / 1000
+        stats = provider_metrics.snapshot(provider, model)
+        if stats["ewma_ms"] is not None and stats["samples"] >= settings.ai_routing_min_samples:
+            needed = max(needed, stats["ewma_ms"] / 1000)
+        if remaining < needed:
+            return None
+        return min(remaining, settings.ai_http_timeout_seconds)
+
+    def max_queue_wait(self) -> float:
+        """How long an attempt may wait for capacity and still have time to run."""
+        return max(0.0, self.remaining() - settings.ai_deadline_min_attempt_ms / 1000)
+
+
+def request_deadline(header_ms: int | None) -> Deadline | None:
+    """Deadline from settings, optionally shortened (never extended) by the client header."""
+    budget_ms = settings.ai_request_deadline_ms
+    if header_ms is not None:
+        budget_ms = min(header_ms, budget_ms) if budget_ms > 0 else header_ms
+    if budget_ms <= 0:
+        return None
+    return Deadline(budget_ms / 1000)
@@ -1,8 +1,19 @@
-from fastapi import Depends
+from fastapi import Depends, Header
 from sqlalchemy.orm import Session
 
 from src.core.db import get_db
+from src.modules.ai_providers.deadline import DEADLINE_HEADER, Deadline, request_deadline
 
 
 def db_session(db: Session = Depends(get_db)) -> Session:
     return db
+
+
+def deadline_header_ms(
+    header_ms: int | None = Header(default=None, alias=DEADLINE_HEADER, ge=1),
+) -> int | None:
+    return header_ms
+
+
+def deadline_budget(header_ms: int | None = Depends(deadline_header_ms)) -> Deadline | None:
+    return request_deadline(header_ms)
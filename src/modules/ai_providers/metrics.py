@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from src.core.config import settings
+
+
+class LatencyWindow:
+    """Fixed-size window of recent successful call latencies (ms)."""
+
+    def __init__(self, size: int) -> None:
+        self._samples: deque[float] = deque(maxlen=max(1, size))
+
+    def add(self, latency_ms: float) -> None:
+        self._samples.append(latency_ms)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class ProviderStats:
+    """Rolling statistics for one provider/model: latency window, EWMA and error rate."""
+
+    def __init__(self, size: int, alpha: float) -> None:
+        self.latencies = LatencyWindow(size)
+        self.alpha = alpha
+        self.ewma_ms: float | None = None
+        self._outcomes: deque[bool] = deque(maxlen=max(1, size))
+        self.updated_at: float | None = None
+
+    def add_success(self, latency_ms: float) -> None:
+        self.latencies.add(latency_ms)
+        if self.ewma_ms is None:
+            self.ewma_ms = latency_ms
+        else:
+            self.ewma_ms = self.alpha * latency_ms + (1 - self.alpha) * self.ewma_ms
+        self._outcomes.append(True)
+        self.updated_at = time.time()
+
+    def add_failure(self) -> None:
+        self._outcomes.append(False)
+        self.updated_at = time.time()
+
+    @property
+    def samples(self) -> int:
+        return len(self._outcomes)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for ok in self._outcomes if not ok) / len(self._outcomes)
+
+
+class ProviderMetrics:
+    """Rolling per provider/model statistics fed by every provider call."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str], ProviderStats] = {}
+
+    def _get(self, provider: str, model: str) -> ProviderStats:
+        stats = self._stats.get((provider, model))
+        if stats is None:
+            stats = ProviderStats(settings.ai_metrics_window_size, settings.ai_routing_ewma_alpha)
+            self._stats[(provider, model)] = stats
+        return stats
+
+    def record_success(self, provider: str, model: str, latency_ms: float) -> None:
+        with self._lock:
+            self._get(provider, model).add_success(latency_ms)
+
+    def record_failure(self, provider: str, model: str) -> None:
+        with self._lock:
+            self._get(provider, model).add_failure()
+
+    def p95(self, provider: str, model: str, min_samples: int = 1) -> float | None:
+        with self._lock:
+            stats = self._stats.get((provider, model))
+            if stats is None or len(stats.latencies) < min_samples:
+                return None
+            return stats.latencies.percentile(95)
+
+    def snapshot(self, provider: str, model: str) -> dict[str, Any]:
+        with self._lock:
+            stats = self._stats.get((provider, model))
+            if stats is None:
+                return {
+                    "samples": 0,
+                    "ewma_ms": None,
+                    "p95_ms": None,
+                    "error_rate": 0.0,
+                    "updated_at": None,
+                }
+            return {
+                "samples": stats.samples,
+                "ewma_ms": stats.ewma_ms,
+                "p95_ms": stats.latencies.percentile(95),
+                "error_rate": stats.error_rate,
+                "updated_at": stats.updated_at,
+            }
+
+
+provider_metrics = ProviderMetrics()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled continuously at `rate` per second."""
+
+    def __init__(
+        self,
+        capacity: float,
+        rate: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self._clock = clock
+        self.tokens = capacity
+        self._updated = clock()
+
+    def refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 when they already are)."""
+        missing = min(amount, self.capacity) - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderRateLimiter:
+    """Requests-per-minute and tokens-per-minute budget for one provider/model.
+
+    A call is admitted only when both buckets can pay for it. Callers that cannot be
+    admitted wait up to `max_wait_seconds` in a queue of at most `max_queue` waiters;
+    otherwise they are rejected so the caller can fall back to another provider.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        rpm: int,
+        tpm: int,
+        max_wait_seconds: float,
+        max_queue: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.provider = provider
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait_seconds = max_wait_seconds
+        self.max_queue = max_queue
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(rpm, rpm / 60, clock) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm, tpm / 60, clock) if tpm > 0 else None
+        self.waiting = 0
+        self.admitted = 0
+        self.waited = 0
+        self.rejected = 0
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            wait = 0.0
+            if self._requests is not None:
+                self._requests.refill()
+                wait = max(wait, self._requests.wait_for(1))
+            if self._tokens is not None:
+                self._tokens.refill()
+                wait = max(wait, self._tokens.wait_for(tokens))
+            if wait == 0:
+                if self._requests is not None:
+                    self._requests.take(1)
+                if self._tokens is not None:
+                    self._tokens.take(tokens)
+            return wait
+
+    def _enqueue(self, wait: float, deadline: float) -> bool:
+        with self._lock:
+            if self.waiting >= self.max_queue or self._clock() + wait > deadline:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            return True
+
+    def _dequeue(self) -> None:
+        with self._lock:
+            self.waiting -= 1
+
+    def _admitted(self, waited: bool) -> None:
+        with self._lock:
+            self.admitted += 1
+            if waited:
+                self.waited += 1
+
+    def _wait_deadline(self, max_wait: float | None) -> float:
+        wait = self.max_wait_seconds if max_wait is None else min(max_wait, self.max_wait_seconds)
+        return self._clock() + wait
+
+    async def acquire_async(self, tokens: int, max_wait: float | None = None) -> bool:
+        deadline = self._wait_deadline(max_wait)
+        waited = False
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0:
+                self._admitted(waited)
+                return True
+            if not self._enqueue(wait, deadline):
+                return False
+            waited = True
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._dequeue()
+
+    def settle(self, reserved_tokens: int, used_tokens: int | None) -> None:
+        """Return the unused part of a token reservation once real usage is known."""
+        if self._tokens is None or used_tokens is None or used_tokens >= reserved_tokens:
+            return
+        with self._lock:
+            self._tokens.give_back(reserved_tokens - used_tokens)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            if self._requests is not None:
+                self._requests.refill()
+            if self._tokens is not None:
+                self._tokens.refill()
+            return {
+                "provider": self.provider,
+                "model_name": self.model,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "available_requests": (
+                    round(self._requests.tokens, 3) if self._requests is not None else None
+                ),
+                "available_tokens": (
+                    round(self._tokens.tokens, 3) if self._tokens is not None else None
+                ),
+                "waiting": self.waiting,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "waited": self.waited,
+                "rejected": self.rejected,
+            }
+
+
+def parse_limit_overrides(raw: str) -> dict[tuple[str, str], tuple[int, int]]:
+    """Parse `provider:model=rpm/tpm` entries separated by commas (0 = unlimited)."""
+    overrides: dict[tuple[str, str], tuple[int, int]] = {}
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            key, limits = item.split("=", 1)
+            provider, model = key.split(":", 1)
+            rpm, tpm = limits.split("/", 1)
+            overrides[(provider.strip().lower(), model.strip())] = (int(rpm), int(tpm))
+        except ValueError:
+            logger.warning("ai_rate_limit_override_invalid entry=%s", item)
+    return overrides
+
+
+def _provider_limits(provider: str) -> tuple[int, int]:
+    if provider == "openai":
+        return settings.openai_rpm, settings.openai_tpm
+    return settings.gemini_rpm, settings.gemini_tpm
+
+
+class RateLimiterRegistry:
+    """Lazily created limiters keyed by provider/model; unlimited pairs get none."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._limiters: dict[tuple[str, str], ProviderRateLimiter | None] = {}
+        self._overrides: dict[tuple[str, str], tuple[int, int]] | None = None
+
+    def get(self, provider: str, model: str) -> ProviderRateLimiter | None:
+        key = (provider, model)
+        if key in self._limiters:
+            return self._limiters[key]
+        with self._lock:
+            if key not in self._limiters:
+                if self._overrides is None:
+                    self._overrides = parse_limit_overrides(settings.ai_rate_limit_overrides)
+                rpm, tpm = self._overrides.get(key) or _provider_limits(provider)
+                limiter = None
+                if rpm > 0 or tpm > 0:
+                    limiter = ProviderRateLimiter(
+                        provider,
+                        model,
+                        rpm=rpm,
+                        tpm=tpm,
+                        max_wait_seconds=settings.ai_rate_limit_max_wait_ms / 1000,
+                        max_queue=settings.ai_rate_limit_max_queue,
+                    )
+                self._limiters[key] = limiter
+            return self._limiters[key]
+
+    async def acquire_async(
+        self,
+        provider: str,
+        model: str,
+        tokens: int,
+        max_wait: float | None = None,
+    ) -> bool:
+        limiter = self.get(provider, model) if settings.ai_rate_limit_enabled else None
+        return limiter is None or await limiter.acquire_async(tokens, max_wait)
+
+    def settle(self, provider: str, model: str, reserved: int, used: int | None) -> None:
+        limiter = self._limiters.get((provider, model))
+        if limiter is not None:
+            limiter.settle(reserved, used)
+
+    def stats(self) -> list[dict[str, Any]]:
+        with self._lock:
+            limiters = [limiter for limiter in self._limiters.values() if limiter is not None]
+        return [limiter.snapshot() for limiter in limiters]
+
+
+rate_limits = RateLimiterRegistry()
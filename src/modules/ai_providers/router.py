@@ -1,46 +1,234 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Path, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
-from src.core.project_authz import PROJECT_RW_ROLES, require_project_role
-from src.core.security import User
-from src.modules.ai_providers.dependencies import db_session
+from src.core.blobs import SHA256_PATTERN, blob_store, sniff_mime_type
+from src.core.errors import forbidden, not_found, unauthorized
+from src.core.project_authz import PROJECT_ALL_ROLES, PROJECT_RW_ROLES, require_project_role
+from src.core.security import User, bearer_scheme, decode_access_token
+from src.modules.ai_providers.blob_access import blob_in_project, valid_blob_signature
+from src.modules.ai_providers.circuit_breaker import circuit_breakers
+from src.modules.ai_providers.clients import provider_clients
+from src.modules.ai_providers.deadline import Deadline
+from src.modules.ai_providers.dependencies import (
+    db_session,
+    deadline_budget,
+    deadline_header_ms,
+)
+from src.modules.ai_providers.rate_limiter import rate_limits
+from src.modules.ai_providers.routing import routing_table
 from src.modules.ai_providers.schemas import (
+    AiCircuitBreakerOut,
+    AiHttpPoolStatsOut,
     AiImageGenerateRequest,
     AiImageGenerateResponse,
+    AiImageJobOut,
+    AiRateLimitOut,
+    AiRoutingTableOut,
+    AiTextBatchRequest,
+    AiTextBatchResponse,
+    AiTextEstimateResponse,
     AiTextGenerateRequest,
     AiTextGenerateResponse,
 )
-from src.modules.ai_providers.service import generate_image, generate_text
-from src.modules.users.dependencies import current_user
+from src.modules.ai_providers.service import (
+    PROVIDERS,
+    estimate_text,
+    generate_image_async,
+    generate_text_async,
+    generate_text_batch_async,
+    get_image_job_run,
+    stream_text_async,
+    submit_image_job_async,
+    wait_image_job_async,
+)
+from src.modules.users.dependencies import current_user, require_admin
 
 router = APIRouter()
 
 
 @router.post("/text/generate", response_model=AiTextGenerateResponse)
-def post_ai_text_generate(
+async def post_ai_text_generate(
     payload: AiTextGenerateRequest,
+    deadline: Deadline | None = Depends(deadline_budget),
     user: User = Depends(current_user),
     db: Session = Depends(db_session),
 ) -> AiTextGenerateResponse:
+    await run_in_threadpool(
+        require_project_role,
+        db=db,
+        project_id=payload.project_id,
+        user=user,
+        allowed_roles=PROJECT_RW_ROLES,
+    )
+    return await generate_text_async(db=db, user=user, req=payload, deadline=deadline)
+
+
+@router.post("/text/estimate", response_model=AiTextEstimateResponse)
+def post_ai_text_estimate(
+    payload: AiTextGenerateRequest,
+    user: User = Depends(current_user),
+    db: Session = Depends(db_session),
+) -> AiTextEstimateResponse:
     require_project_role(
         db=db,
         project_id=payload.project_id,
         user=user,
         allowed_roles=PROJECT_RW_ROLES,
     )
-    return generate_text(db=db, user=user, req=payload)
+    return estimate_text(payload)
 
 
-@router.post("/image/generate", response_model=AiImageGenerateResponse)
-def post_ai_image_generate(
+@router.post("/text/generate/batch", response_model=AiTextBatchResponse)
+async def post_ai_text_generate_batch(
+    payload: AiTextBatchRequest,
+    # Each item gets its own deadline; a batch as a whole is not held to one request's.
+    deadline_ms: int | None = Depends(deadline_header_ms),
+    user: User = Depends(current_user),
+    db: Session = Depends(db_session),
+) -> AiTextBatchResponse:
+    await run_in_threadpool(
+        require_project_role,
+        db=db,
+        project_id=payload.project_id,
+        user=user,
+        allowed_roles=PROJECT_RW_ROLES,
+    )
+    return await generate_text_batch_async(
+        db=db, user=user, req=payload, deadline_ms=deadline_ms
+    )
+
+
+@router.post("/text/generate/stream")
+async def post_ai_text_generate_stream(
+    payload: AiTextGenerateRequest,
+    user: User = Depends(current_user),
+    db: Session = Depends(db_session),
+) -> StreamingResponse:
+    await run_in_threadpool(
+        require_project_role,
+        db=db,
+        project_id=payload.project_id,
+        user=user,
+        allowed_roles=PROJECT_RW_ROLES,
+    )
+    events = await stream_text_async(db=db, user=user, req=payload)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/image/generate",
+    response_model=AiImageGenerateResponse,
+    responses={202: {"model": AiImageJobOut}},
+)
+async def post_ai_image_generate(
     payload: AiImageGenerateRequest,
+    deadline: Deadline | None = Depends(deadline_budget),
+    mode: str = Query(default="sync", pattern="^(sync|async)$"),
     user: User = Depends(current_user),
     db: Session = Depends(db_session),
-) -> AiImageGenerateResponse:
-    require_project_role(
+) -> AiImageGenerateResponse | JSONResponse:
+    await run_in_threadpool(
+        require_project_role,
         db=db,
         project_id=payload.project_id,
         user=user,
         allowed_roles=PROJECT_RW_ROLES,
     )
-    return generate_image(db=db, user=user, req=payload)
+    if mode == "async":
+        job = await submit_image_job_async(db=db, user=user, req=payload)
+        return JSONResponse(
+            status_code=202,
+            content=job.model_dump(mode="json"),
+            headers={"Location": f"/ai/image/jobs/{job.run_id}"},
+        )
+    return await generate_image_async(db=db, user=user, req=payload, deadline=deadline)
+
+
+@router.get("/image/jobs/{run_id}", response_model=AiImageJobOut)
+async def get_ai_image_job(
+    run_id: int,
+    wait_seconds: float = Query(default=0, ge=0, le=60),
+    user: User = Depends(current_user),
+    db: Session = Depends(db_session),
+) -> AiImageJobOut:
+    run = await run_in_threadpool(get_image_job_run, db, run_id)
+    await run_in_threadpool(
+        require_project_role,
+        db=db,
+        project_id=run.project_id,
+        user=user,
+        allowed_roles=PROJECT_ALL_ROLES,
+    )
+    return await wait_image_job_async(run=run, wait_seconds=wait_seconds)
+
+
+@router.get("/blobs/{sha256}", response_class=FileResponse)
+def get_ai_blob(
+    request: Request,
+    sha256: str = Path(pattern=SHA256_PATTERN),
+    project_id: int = Query(),
+    exp: int | None = Query(default=None),
+    sig: str | None = Query(default=None),
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+    db: Session = Depends(db_session),
+) -> Response:
+    # Signed URLs (from image responses) work as <img src>; API clients may use a bearer.
+    if sig is not None and exp is not None:
+        if not valid_blob_signature(sha256, project_id, exp, sig):
+            raise forbidden("Blob URL signature is invalid or expired")
+    elif credentials is not None:
+        require_project_role(
+            db=db,
+            project_id=project_id,
+            user=decode_access_token(credentials.credentials),
+            allowed_roles=PROJECT_ALL_ROLES,
+        )
+    else:
+        raise unauthorized("Missing bearer token or blob URL signature")
+    if not blob_in_project(db, sha256, project_id):
+        raise not_found("Blob not found")
+    # Blobs are content-addressed, so the digest is a strong validator that never changes.
+    headers = {"ETag": f'"{sha256}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or headers["ETag"] in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    path = blob_store.path(sha256)
+    if path is None:
+        raise not_found("Blob not found")
+    with path.open("rb") as fh:
+        media_type = sniff_mime_type(fh.read(16))
+    # FileResponse streams the file and answers Range requests with 206/416.
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.get("/internal/http-pools", response_model=list[AiHttpPoolStatsOut])
+def get_ai_http_pools(user: User = Depends(require_admin)) -> list[AiHttpPoolStatsOut]:
+    _ = user
+    return [AiHttpPoolStatsOut(**item) for item in provider_clients.stats()]
+
+
+@router.get("/internal/circuit-breakers", response_model=list[AiCircuitBreakerOut])
+def get_ai_circuit_breakers(user: User = Depends(require_admin)) -> list[AiCircuitBreakerOut]:
+    _ = user
+    for provider in sorted(PROVIDERS):
+        circuit_breakers.get(provider)
+    return [AiCircuitBreakerOut(**item) for item in circuit_breakers.stats()]
+
+
+@router.get("/internal/routing", response_model=list[AiRoutingTableOut])
+def get_ai_routing(user: User = Depends(require_admin)) -> list[AiRoutingTableOut]:
+    _ = user
+    return [AiRoutingTableOut(**routing_table(kind)) for kind in ("text", "image")]
+
+
+@router.get("/internal/rate-limits", response_model=list[AiRateLimitOut])
+def get_ai_rate_limits(user: User = Depends(require_admin)) -> list[AiRateLimitOut]:
+    _ = user
+    return [AiRateLimitOut(**item) for item in rate_limits.stats()]
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Any
+
+from src.core.config import settings
+from src.modules.ai_providers.metrics import provider_metrics
+
+STATIC_AUTO_ORDER = ["openai", "gemini"]
+
+
+def default_model(kind: str, provider: str) -> str:
+    if kind == "image":
+        return settings.openai_model_image if provider == "openai" else settings.gemini_model_image
+    return settings.openai_model_text if provider == "openai" else settings.gemini_model_text
+
+
+def _unit_cost(kind: str, provider: str) -> float:
+    if kind == "image":
+        if provider == "openai":
+            return settings.openai_image_cost_per_image
+        return settings.gemini_image_cost_per_image
+    if provider == "openai":
+        return settings.openai_text_input_cost_per_1k + settings.openai_text_output_cost_per_1k
+    return settings.gemini_text_input_cost_per_1k + settings.gemini_text_output_cost_per_1k
+
+
+def _cost_ceiling(kind: str) -> float:
+    if kind == "image":
+        return settings.ai_routing_max_image_cost
+    return settings.ai_routing_max_text_cost_per_1k
+
+
+def _expected_latency_ms(ewma_ms: float | None, error_rate: float) -> float:
+    # A failed attempt costs roughly a full timeout before falling back.
+    timeout_ms = settings.ai_http_timeout_seconds * 1000
+    latency = ewma_ms if ewma_ms is not None else timeout_ms
+    return latency + error_rate * timeout_ms
+
+
+def routing_table(kind: str, model_name: str | None = None) -> dict[str, Any]:
+    """Score the auto-mode candidates and return the chosen order with its inputs.
+
+    Providers within the cost ceiling come first, each group ordered by expected
+    latency (EWMA + error_rate * timeout). Until every candidate has
+    `AI_ROUTING_MIN_SAMPLES` outcomes the static order is kept.
+    """
+    ceiling = _cost_ceiling(kind)
+    entries: list[dict[str, Any]] = []
+    for position, provider in enumerate(STATIC_AUTO_ORDER):
+        model = model_name or default_model(kind, provider)
+        stats = provider_metrics.snapshot(provider, model)
+        unit_cost = _unit_cost(kind, provider)
+        entries.append(
+            {
+                "provider": provider,
+                "model_name": model,
+                **stats,
+                "expected_latency_ms": round(
+                    _expected_latency_ms(stats["ewma_ms"], stats["error_rate"]), 3
+                ),
+                "unit_cost_usd": unit_cost,
+                "within_cost_ceiling": ceiling <= 0 or unit_cost <= ceiling,
+                "static_position": position,
+            }
+        )
+
+    if not settings.ai_routing_adaptive:
+        reason = "static"
+    elif any(e["samples"] < settings.ai_routing_min_samples for e in entries):
+        reason = "cold_start"
+    else:
+        reason = "adaptive"
+
+    def sort_key(entry: dict[str, Any]) -> tuple[bool, float, int]:
+        latency = entry["expected_latency_ms"] if reason == "adaptive" else 0.0
+        return (not entry["within_cost_ceiling"], latency, entry["static_position"])
+
+    ranked = sorted(entries, key=sort_key)
+    return {
+        "kind": kind,
+        "reason": reason,
+        "cost_ceiling_usd": ceiling,
+        "order": [e["provider"] for e in ranked],
+        "entries": ranked,
+    }
+
+
+def auto_order(kind: str, model_name: str | None = None) -> list[str]:
+    return routing_table(kind, model_name)["order"]
@@ -1,16 +1,26 @@
+from datetime import datetime
+
 from pydantic import BaseModel, Field
 
 
+class AiTextTurn(BaseModel):
+    role: str = Field(pattern="^(user|assistant)$")
+    content: str = Field(min_length=1)
+
+
 class AiTextGenerateRequest(BaseModel):
     project_id: int
     agent_id: int | None = None
     prompt: str = Field(min_length=1, max_length=40000)
     system_prompt: str | None = None
+    history: list[AiTextTurn] = Field(default_factory=list)
     stage_id: int | None = None
     provider_preference: str = "auto"
     model_name: str | None = None
     temperature: float | None = Field(default=None, ge=0, le=2)
     max_output_tokens: int | None = Field(default=None, ge=1, le=16384)
+    use_cache: bool = True
+    cache_nondeterministic: bool = False
 
 
 class AiTextGenerateResponse(BaseModel):
@@ -21,6 +31,71 @@ class AiTextGenerateResponse(BaseModel):
     token_input_count: int | None = None
     token_output_count: int | None = None
     cost_usd: float | None = None
+    cached: bool = False
+    coalesced: bool = False
+
+
+class AiTextEstimateCandidateOut(BaseModel):
+    provider: str
+    model_name: str
+    context_window_tokens: int
+    output_budget_tokens: int
+    min_cost_usd: float
+    max_cost_usd: float
+
+
+class AiTextEstimateResponse(BaseModel):
+    prompt_tokens: int
+    system_prompt_tokens: int
+    input_tokens: int
+    requested_max_output_tokens: int | None = None
+    max_output_tokens: int
+    prompt_truncated: bool
+    candidates: list[AiTextEstimateCandidateOut]
+
+
+class AiTextBatchItem(BaseModel):
+    prompt: str = Field(min_length=1, max_length=40000)
+    system_prompt: str | None = None
+    stage_id: int | None = None
+    temperature: float | None = Field(default=None, ge=0, le=2)
+    max_output_tokens: int | None = Field(default=None, ge=1, le=16384)
+
+
+class AiTextBatchRequest(BaseModel):
+    project_id: int
+    agent_id: int | None = None
+    provider_preference: str = "auto"
+    model_name: str | None = None
+    system_prompt: str | None = None
+    temperature: float | None = Field(default=None, ge=0, le=2)
+    max_output_tokens: int | None = Field(default=None, ge=1, le=16384)
+    use_cache: bool = True
+    items: list[AiTextBatchItem] = Field(min_length=1)
+
+
+class AiTextBatchItemResult(BaseModel):
+    index: int
+    status: str
+    run_id: int | None = None
+    provider: str | None = None
+    model_name: str | None = None
+    text: str | None = None
+    token_input_count: int | None = None
+    token_output_count: int | None = None
+    cost_usd: float | None = None
+    cached: bool = False
+    status_code: int | None = None
+    error: str | None = None
+
+
+class AiTextBatchResponse(BaseModel):
+    project_id: int
+    agent_id: int
+    total: int
+    succeeded: int
+    failed: int
+    items: list[AiTextBatchItemResult]
 
 
 class AiImageGenerateRequest(BaseModel):
@@ -31,6 +106,7 @@ class AiImageGenerateRequest(BaseModel):
     provider_preference: str = "auto"
     model_name: str | None = None
     size: str | None = Field(default="1024x1024", max_length=30)
+    include_base64: bool = False
 
 
 class AiImageGenerateResponse(BaseModel):
@@ -40,4 +116,81 @@ class AiImageGenerateResponse(BaseModel):
     mime_type: str | None = None
     image_base64: str | None = None
     image_url: str | None = None
+    image_sha256: str | None = None
+    cost_usd: float | None = None
+
+
+class AiImageJobOut(BaseModel):
+    run_id: int
+    project_id: int
+    run_status: str
+    provider: str | None = None
+    model_name: str | None = None
+    error_message: str | None = None
     cost_usd: float | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    duration_ms: int | None = None
+    result: AiImageGenerateResponse | None = None
+
+
+class AiHttpPoolStatsOut(BaseModel):
+    provider: str
+    mode: str
+    http2: bool
+    created_at: float | None = None
+    requests_sent: int
+    connections_total: int
+    connections_idle: int
+    connections_active: int
+    max_connections: int
+    max_keepalive_connections: int
+
+
+class AiCircuitBreakerOut(BaseModel):
+    provider: str
+    state: str
+    consecutive_failures: int
+    failure_threshold: int
+    open_seconds: float
+    times_opened: int
+    opened_at: float | None = None
+    retry_after_seconds: float | None = None
+    last_failure_at: float | None = None
+    last_success_at: float | None = None
+
+
+class AiRoutingEntryOut(BaseModel):
+    provider: str
+    model_name: str
+    samples: int
+    ewma_ms: float | None = None
+    p95_ms: float | None = None
+    error_rate: float
+    expected_latency_ms: float
+    unit_cost_usd: float
+    within_cost_ceiling: bool
+    updated_at: float | None = None
+
+
+class AiRoutingTableOut(BaseModel):
+    kind: str
+    reason: str
+    cost_ceiling_usd: float
+    order: list[str]
+    entries: list[AiRoutingEntryOut]
+
+
+class AiRateLimitOut(BaseModel):
+    provider: str
+    model_name: str
+    rpm: int
+    tpm: int
+    available_requests: float | None = None
+    available_tokens: float | None = None
+    waiting: int
+    max_queue: int
+    admitted: int
+    waited: int
+    rejected: int
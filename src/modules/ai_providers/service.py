@@ -1,28 +1,74 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import suppress
+from dataclasses import dataclass, replace
 from typing import Any
 
+import anyio
 import httpx
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from src.core.blobs import blob_store, sniff_mime_type
+from src.core.cache import TTLCache
 from src.core.config import settings
-from src.core.errors import bad_request, service_unavailable
+from src.core.db import SessionLocal
+from src.core.errors import bad_request, gateway_timeout, not_found, service_unavailable
+from src.core.jobs import JobQueue
 from src.core.logging import get_logger
 from src.core.security import User
-from src.modules.agent_runs.schemas import AgentRunCreate
-from src.modules.agent_runs.service import create_agent_run
+from src.modules.agent_runs.schemas import AgentRunCreate, AgentRunOut, AgentRunUpdate
+from src.modules.agent_runs.service import create_agent_run, get_agent_run, update_agent_run
+from src.modules.agent_runs.writer import record_agent_run, record_agent_runs
+from src.modules.ai_providers.blob_access import blob_url, record_blob_project
+from src.modules.ai_providers.circuit_breaker import circuit_breakers
+from src.modules.ai_providers.clients import provider_clients
+from src.modules.ai_providers.deadline import Deadline, request_deadline
+from src.modules.ai_providers.metrics import provider_metrics
+from src.modules.ai_providers.rate_limiter import rate_limits
+from src.modules.ai_providers.routing import auto_order, default_model
 from src.modules.ai_providers.schemas import (
     AiImageGenerateRequest,
     AiImageGenerateResponse,
+    AiImageJobOut,
+    AiTextBatchItemResult,
+    AiTextBatchRequest,
+    AiTextBatchResponse,
+    AiTextEstimateCandidateOut,
+    AiTextEstimateResponse,
     AiTextGenerateRequest,
     AiTextGenerateResponse,
 )
+from src.modules.ai_providers.tokens import (
+    context_window,
+    count_tokens,
+    estimate_input_tokens,
+    output_budget,
+)
+from src.modules.project_agent_assignments.routing import default_agents
+from src.modules.project_budgets.service import enforce_project_budget, within_project_budget
+from src.modules.project_budgets.spend import project_spend
 
 PROVIDERS = {"openai", "gemini"}
 logger = get_logger(__name__)
 
+_text_cache: TTLCache[str, dict[str, Any]] = TTLCache(
+    max_entries=settings.ai_text_cache_max_entries,
+    ttl_seconds=settings.ai_text_cache_ttl_seconds,
+)
+# In-flight text generations by fingerprint. Resolved with ("ok", shared result),
+# ("failed", attempts) or None when the leading request went away without an outcome.
+_text_inflight: dict[str, asyncio.Future[tuple[str, Any] | None]] = {}
+
 
 def _trim_text(value: str | None, max_chars: int) -> str | None:
     if value is None:
@@ -33,6 +79,38 @@ def _trim_text(value: str | None, max_chars: int) -> str | None:
     return normalized[: max_chars - 32].rstrip() + " [truncated]"
 
 
+def _history_contents(req: AiTextGenerateRequest) -> list[str]:
+    return [turn.content for turn in req.history]
+
+
+def _fit_output_tokens(
+    req: AiTextGenerateRequest,
+    prompt: str,
+    system_prompt: str | None,
+    max_output_tokens: int,
+) -> int:
+    """Clamp the output budget to the tightest context window among the candidates."""
+    input_tokens = estimate_input_tokens(prompt, system_prompt, _history_contents(req))
+    budgets = {
+        model: output_budget(model, input_tokens)
+        for model in (_text_model(provider, req) for provider in _text_order(req))
+    }
+    model, budget = min(budgets.items(), key=lambda item: item[1])
+    if budget < 1:
+        raise bad_request(
+            f"Prompt needs ~{input_tokens} tokens and does not fit the context window of {model}"
+        )
+    if budget < max_output_tokens:
+        logger.info(
+            "ai_text_output_clamped project_id=%s model=%s input_tokens=%s max_output_tokens=%s",
+            req.project_id,
+            model,
+            input_tokens,
+            budget,
+        )
+    return min(max_output_tokens, budget)
+
+
 def _prepare_text_request(req: AiTextGenerateRequest) -> AiTextGenerateRequest:
     prompt = _trim_text(req.prompt, settings.ai_text_input_char_limit) or ""
     system_prompt = _trim_text(req.system_prompt, settings.ai_system_prompt_char_limit)
@@ -41,26 +119,70 @@ def _prepare_text_request(req: AiTextGenerateRequest) -> AiTextGenerateRequest:
     if max_output_tokens is None:
         max_output_tokens = settings.ai_text_default_max_output_tokens
     max_output_tokens = min(max_output_tokens, settings.ai_text_hard_max_output_tokens)
+    max_output_tokens = _fit_output_tokens(req, prompt, system_prompt, max_output_tokens)
 
     return AiTextGenerateRequest(
         project_id=req.project_id,
         agent_id=req.agent_id,
         prompt=prompt,
         system_prompt=system_prompt,
+        history=req.history,
         stage_id=req.stage_id,
         provider_preference=req.provider_preference,
         model_name=req.model_name,
         temperature=req.temperature,
         max_output_tokens=max_output_tokens,
+        use_cache=req.use_cache,
+        cache_nondeterministic=req.cache_nondeterministic,
+    )
+
+
+def _text_fingerprint(req: AiTextGenerateRequest) -> str:
+    material = json.dumps(
+        {
+            "provider": req.provider_preference.lower().strip(),
+            "model": req.model_name,
+            "prompt": req.prompt,
+            "system_prompt": req.system_prompt,
+            "history": [turn.model_dump() for turn in req.history],
+            "temperature": req.temperature,
+            "max_output_tokens": req.max_output_tokens,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
     )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
 
 
-def _providers_order(preference: str) -> list[str]:
+def _text_cache_key(req: AiTextGenerateRequest) -> str | None:
+    """Exact-match cache key for a prepared request, or None when caching does not apply.
+
+    Only deterministic requests (temperature 0) are cached unless the caller opts in.
+    """
+    if not settings.ai_text_cache_enabled or not req.use_cache:
+        return None
+    if req.temperature != 0 and not req.cache_nondeterministic:
+        return None
+    return _text_fingerprint(req)
+
+
+def _text_flight_key(req: AiTextGenerateRequest) -> str | None:
+    """Key for coalescing concurrent identical requests; `use_cache=false` opts out."""
+    if not settings.ai_single_flight_enabled or not req.use_cache:
+        return None
+    return _text_fingerprint(req)
+
+
+def _providers_order(
+    preference: str,
+    kind: str = "text",
+    model_name: str | None = None,
+) -> list[str]:
     pref = preference.lower().strip()
     if pref in PROVIDERS:
         return [pref, *sorted(PROVIDERS - {pref})]
     if pref == "auto":
-        return ["openai", "gemini"]
+        return auto_order(kind, model_name)
     raise bad_request("provider_preference must be one of: auto, openai, gemini")
 
 
@@ -86,10 +208,26 @@ def _estimate_image_cost(provider: str) -> float:
     return round(settings.gemini_image_cost_per_image, 6)
 
 
+def _admit_project_run(db: Session, project_id: int, requested_agent_id: int | None) -> int:
+    """Enforce the project's budget and resolve the agent for a new generation."""
+    enforce_project_budget(db, project_id)
+    return _resolve_agent_id(db, project_id, requested_agent_id)
+
+
 def _resolve_agent_id(db: Session, project_id: int, requested_agent_id: int | None) -> int:
     if requested_agent_id is not None:
         return int(requested_agent_id)
 
+    cached = default_agents.get(project_id)
+    if cached is not None:
+        return cached
+    generation = default_agents.generation
+    agent_id = _query_default_agent_id(db, project_id)
+    default_agents.set(project_id, agent_id, generation)
+    return agent_id
+
+
+def _query_default_agent_id(db: Session, project_id: int) -> int:
     project_agent = db.execute(
         text(
             """
@@ -125,40 +263,99 @@ def _resolve_agent_id(db: Session, project_id: int, requested_agent_id: int | No
     raise bad_request("No active agent available. Create/activate an agent first.")
 
 
-def _openai_text(req: AiTextGenerateRequest) -> dict[str, Any]:
+@dataclass(frozen=True)
+class _ProviderCall:
+    provider: str
+    kind: str
+    model: str
+    url: str
+    payload: dict[str, Any]
+    headers: dict[str, str]
+    params: dict[str, str] | None = None
+
+    @property
+    def label(self) -> str:
+        name = "OpenAI" if self.provider == "openai" else "Gemini"
+        return name if self.kind == "text" else f"{name} {self.kind}"
+
+
+def _openai_headers() -> dict[str, str]:
+    return {
+        "Authorization": f"Bearer {settings.openai_api_key}",
+        "Content-Type": "application/json",
+    }
+
+
+def _provider_error(call: _ProviderCall, res: httpx.Response) -> HTTPException:
+    name = "OpenAI" if call.provider == "openai" else "Gemini"
+    detail = f"{name} {call.kind} call failed: {res.status_code} {res.text[:300]}"
+    if res.status_code in {408, 429} or res.status_code >= 500:
+        provider_metrics.record_failure(call.provider, call.model)
+        return service_unavailable(detail)
+    return bad_request(detail)
+
+
+def _transport_error(call: _ProviderCall, exc: httpx.HTTPError) -> HTTPException:
+    provider_metrics.record_failure(call.provider, call.model)
+    if isinstance(exc, httpx.TimeoutException):
+        return service_unavailable(
+            f"{call.label} timeout: request exceeded the configured provider timeout."
+        )
+    return service_unavailable(f"{call.label} connectivity error: {exc}")
+
+
+def _request_timeout(timeout: float | None) -> Any:
+    return httpx.USE_CLIENT_DEFAULT if timeout is None else timeout
+
+
+async def _send_async(call: _ProviderCall, timeout: float | None = None) -> dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        res = await provider_clients.get_async(call.provider).post(
+            call.url,
+            params=call.params,
+            headers=call.headers,
+            json=call.payload,
+            timeout=_request_timeout(timeout),
+        )
+    except httpx.HTTPError as exc:
+        raise _transport_error(call, exc) from exc
+    if res.status_code >= 400:
+        raise _provider_error(call, res)
+    provider_metrics.record_success(
+        call.provider, call.model, (time.perf_counter() - started) * 1000
+    )
+    circuit_breakers.record_success(call.provider)
+    return res.json()
+
+
+def _openai_text_call(req: AiTextGenerateRequest) -> _ProviderCall:
     if not settings.openai_api_key:
         raise bad_request("OPENAI_API_KEY is not configured")
     model = req.model_name or settings.openai_model_text
     messages: list[dict[str, Any]] = []
     if req.system_prompt:
         messages.append({"role": "system", "content": [{"type": "input_text", "text": req.system_prompt}]})
+    for turn in req.history:
+        part_type = "output_text" if turn.role == "assistant" else "input_text"
+        messages.append({"role": turn.role, "content": [{"type": part_type, "text": turn.content}]})
     messages.append({"role": "user", "content": [{"type": "input_text", "text": req.prompt}]})
     payload: dict[str, Any] = {"model": model, "input": messages}
     if req.temperature is not None:
         payload["temperature"] = req.temperature
     if req.max_output_tokens is not None:
         payload["max_output_tokens"] = req.max_output_tokens
+    return _ProviderCall(
+        provider="openai",
+        kind="text",
+        model=model,
+        url=f"{settings.openai_base_url}/responses",
+        payload=payload,
+        headers=_openai_headers(),
+    )
 
-    try:
-        with httpx.Client(timeout=settings.ai_http_timeout_seconds) as client:
-            res = client.post(
-                f"{settings.openai_base_url}/responses",
-                headers={
-                    "Authorization": f"Bearer {settings.openai_api_key}",
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-            )
-    except httpx.TimeoutException as exc:
-        raise service_unavailable("OpenAI timeout: request exceeded the configured provider timeout.") from exc
-    except httpx.HTTPError as exc:
-        raise service_unavailable(f"OpenAI connectivity error: {exc}") from exc
-    if res.status_code >= 400:
-        detail = f"OpenAI text call failed: {res.status_code} {res.text[:300]}"
-        if res.status_code in {408, 429} or res.status_code >= 500:
-            raise service_unavailable(detail)
-        raise bad_request(detail)
-    data = res.json()
+
+def _openai_text_result(call: _ProviderCall, data: dict[str, Any]) -> dict[str, Any]:
     text_value = data.get("output_text")
     if not text_value:
         output = data.get("output", [])
@@ -171,7 +368,7 @@ def _openai_text(req: AiTextGenerateRequest) -> dict[str, Any]:
     out_tokens = usage.get("output_tokens")
     return {
         "provider": "openai",
-        "model_name": model,
+        "model_name": call.model,
         "text": text_value or "",
         "token_input_count": in_tokens,
         "token_output_count": out_tokens,
@@ -179,13 +376,16 @@ def _openai_text(req: AiTextGenerateRequest) -> dict[str, Any]:
     }
 
 
-def _gemini_text(req: AiTextGenerateRequest) -> dict[str, Any]:
+def _gemini_text_call(req: AiTextGenerateRequest) -> _ProviderCall:
     if not settings.gemini_api_key:
         raise bad_request("GEMINI_API_KEY is not configured")
     model = req.model_name or settings.gemini_model_text
-    payload: dict[str, Any] = {
-        "contents": [{"parts": [{"text": req.prompt}]}],
-    }
+    contents = [
+        {"role": "model" if turn.role == "assistant" else "user", "parts": [{"text": turn.content}]}
+        for turn in req.history
+    ]
+    contents.append({"role": "user", "parts": [{"text": req.prompt}]})
+    payload: dict[str, Any] = {"contents": contents}
     if req.system_prompt:
         payload["systemInstruction"] = {"parts": [{"text": req.system_prompt}]}
     if req.max_output_tokens is not None or req.temperature is not None:
@@ -194,25 +394,18 @@ def _gemini_text(req: AiTextGenerateRequest) -> dict[str, Any]:
             payload["generationConfig"]["maxOutputTokens"] = req.max_output_tokens
         if req.temperature is not None:
             payload["generationConfig"]["temperature"] = req.temperature
+    return _ProviderCall(
+        provider="gemini",
+        kind="text",
+        model=model,
+        url=f"{settings.gemini_base_url}/models/{model}:generateContent",
+        payload=payload,
+        headers={"Content-Type": "application/json"},
+        params={"key": settings.gemini_api_key},
+    )
 
-    try:
-        with httpx.Client(timeout=settings.ai_http_timeout_seconds) as client:
-            res = client.post(
-                f"{settings.gemini_base_url}/models/{model}:generateContent",
-                params={"key": settings.gemini_api_key},
-                headers={"Content-Type": "application/json"},
-                json=payload,
-            )
-    except httpx.TimeoutException as exc:
-        raise service_unavailable("Gemini timeout: request exceeded the configured provider timeout.") from exc
-    except httpx.HTTPError as exc:
-        raise service_unavailable(f"Gemini connectivity error: {exc}") from exc
-    if res.status_code >= 400:
-        detail = f"Gemini text call failed: {res.status_code} {res.text[:300]}"
-        if res.status_code in {408, 429} or res.status_code >= 500:
-            raise service_unavailable(detail)
-        raise bad_request(detail)
-    data = res.json()
+
+def _gemini_text_result(call: _ProviderCall, data: dict[str, Any]) -> dict[str, Any]:
     candidates = data.get("candidates", [])
     text_parts: list[str] = []
     if candidates:
@@ -223,7 +416,7 @@ def _gemini_text(req: AiTextGenerateRequest) -> dict[str, Any]:
     out_tokens = usage.get("candidatesTokenCount")
     return {
         "provider": "gemini",
-        "model_name": model,
+        "model_name": call.model,
         "text": "\n".join(text_parts).strip(),
         "token_input_count": in_tokens,
         "token_output_count": out_tokens,
@@ -231,38 +424,28 @@ def _gemini_text(req: AiTextGenerateRequest) -> dict[str, Any]:
     }
 
 
-def _openai_image(req: AiImageGenerateRequest) -> dict[str, Any]:
+def _openai_image_call(req: AiImageGenerateRequest) -> _ProviderCall:
     if not settings.openai_api_key:
         raise bad_request("OPENAI_API_KEY is not configured")
     model = req.model_name or settings.openai_model_image
     payload: dict[str, Any] = {"model": model, "prompt": req.prompt}
     if req.size:
         payload["size"] = req.size
+    return _ProviderCall(
+        provider="openai",
+        kind="image",
+        model=model,
+        url=f"{settings.openai_base_url}/images/generations",
+        payload=payload,
+        headers=_openai_headers(),
+    )
 
-    try:
-        with httpx.Client(timeout=settings.ai_http_timeout_seconds) as client:
-            res = client.post(
-                f"{settings.openai_base_url}/images/generations",
-                headers={
-                    "Authorization": f"Bearer {settings.openai_api_key}",
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-            )
-    except httpx.TimeoutException as exc:
-        raise service_unavailable("OpenAI image timeout: provider request exceeded timeout.") from exc
-    except httpx.HTTPError as exc:
-        raise service_unavailable(f"OpenAI image connectivity error: {exc}") from exc
-    if res.status_code >= 400:
-        detail = f"OpenAI image call failed: {res.status_code} {res.text[:300]}"
-        if res.status_code in {408, 429} or res.status_code >= 500:
-            raise service_unavailable(detail)
-        raise bad_request(detail)
-    data = res.json()
+
+def _openai_image_result(call: _ProviderCall, data: dict[str, Any]) -> dict[str, Any]:
     item = (data.get("data") or [{}])[0]
     return {
         "provider": "openai",
-        "model_name": model,
+        "model_name": call.model,
         "mime_type": "image/png",
         "image_base64": item.get("b64_json"),
         "image_url": item.get("url"),
@@ -270,7 +453,7 @@ def _openai_image(req: AiImageGenerateRequest) -> dict[str, Any]:
     }
 
 
-def _gemini_image(req: AiImageGenerateRequest) -> dict[str, Any]:
+def _gemini_image_call(req: AiImageGenerateRequest) -> _ProviderCall:
     if not settings.gemini_api_key:
         raise bad_request("GEMINI_API_KEY is not configured")
     model = req.model_name or settings.gemini_model_image
@@ -278,25 +461,18 @@ def _gemini_image(req: AiImageGenerateRequest) -> dict[str, Any]:
         "contents": [{"parts": [{"text": req.prompt}]}],
         "generationConfig": {"responseModalities": ["IMAGE", "TEXT"]},
     }
+    return _ProviderCall(
+        provider="gemini",
+        kind="image",
+        model=model,
+        url=f"{settings.gemini_base_url}/models/{model}:generateContent",
+        payload=payload,
+        headers={"Content-Type": "application/json"},
+        params={"key": settings.gemini_api_key},
+    )
 
-    try:
-        with httpx.Client(timeout=settings.ai_http_timeout_seconds) as client:
-            res = client.post(
-                f"{settings.gemini_base_url}/models/{model}:generateContent",
-                params={"key": settings.gemini_api_key},
-                headers={"Content-Type": "application/json"},
-                json=payload,
-            )
-    except httpx.TimeoutException as exc:
-        raise service_unavailable("Gemini image timeout: provider request exceeded timeout.") from exc
-    except httpx.HTTPError as exc:
-        raise service_unavailable(f"Gemini image connectivity error: {exc}") from exc
-    if res.status_code >= 400:
-        detail = f"Gemini image call failed: {res.status_code} {res.text[:300]}"
-        if res.status_code in {408, 429} or res.status_code >= 500:
-            raise service_unavailable(detail)
-        raise bad_request(detail)
-    data = res.json()
+
+def _gemini_image_result(call: _ProviderCall, data: dict[str, Any]) -> dict[str, Any]:
     candidates = data.get("candidates", [])
     parts = ((candidates[0].get("content", {}) if candidates else {}) or {}).get("parts", [])
     inline = next((p.get("inlineData") for p in parts if p.get("inlineData")), None)
@@ -304,7 +480,7 @@ def _gemini_image(req: AiImageGenerateRequest) -> dict[str, Any]:
         raise bad_request("Gemini image response did not include inlineData")
     return {
         "provider": "gemini",
-        "model_name": model,
+        "model_name": call.model,
         "mime_type": inline.get("mimeType"),
         "image_base64": inline.get("data"),
         "image_url": None,
@@ -312,185 +488,1449 @@ def _gemini_image(req: AiImageGenerateRequest) -> dict[str, Any]:
     }
 
 
-def generate_text(db: Session, user: User, req: AiTextGenerateRequest) -> AiTextGenerateResponse:
-    prepared_req = _prepare_text_request(req)
-    agent_id = _resolve_agent_id(db=db, project_id=req.project_id, requested_agent_id=req.agent_id)
+_TEXT_CALLS = {
+    "openai": (_openai_text_call, _openai_text_result),
+    "gemini": (_gemini_text_call, _gemini_text_result),
+}
+_IMAGE_CALLS = {
+    "openai": (_openai_image_call, _openai_image_result),
+    "gemini": (_gemini_image_call, _gemini_image_result),
+}
+
+
+def _openai_text_stream_call(req: AiTextGenerateRequest) -> _ProviderCall:
+    call = _openai_text_call(req)
+    return replace(call, payload={**call.payload, "stream": True})
+
+
+def _openai_stream_delta(event: dict[str, Any], usage: dict[str, Any]) -> str | None:
+    event_type = event.get("type")
+    if event_type == "response.output_text.delta":
+        return event.get("delta") or None
+    if event_type == "response.completed":
+        usage.update((event.get("response") or {}).get("usage") or {})
+    elif event_type in {"error", "response.failed", "response.incomplete"}:
+        raise service_unavailable(f"OpenAI stream failed: {str(event)[:300]}")
+    return None
+
+
+def _gemini_text_stream_call(req: AiTextGenerateRequest) -> _ProviderCall:
+    call = _gemini_text_call(req)
+    return replace(
+        call,
+        url=f"{settings.gemini_base_url}/models/{call.model}:streamGenerateContent",
+        params={**(call.params or {}), "alt": "sse"},
+    )
+
+
+def _gemini_stream_delta(event: dict[str, Any], usage: dict[str, Any]) -> str | None:
+    metadata = event.get("usageMetadata") or {}
+    if metadata:
+        usage["input_tokens"] = metadata.get("promptTokenCount")
+        usage["output_tokens"] = metadata.get("candidatesTokenCount")
+    candidates = event.get("candidates", [])
+    if not candidates:
+        return None
+    parts = (candidates[0].get("content", {}) or {}).get("parts", [])
+    return "".join(p.get("text", "") for p in parts if p.get("text")) or None
+
+
+_TEXT_STREAM_CALLS = {
+    "openai": (_openai_text_stream_call, _openai_stream_delta),
+    "gemini": (_gemini_text_stream_call, _gemini_stream_delta),
+}
+
+
+async def _iter_sse_data(res: httpx.Response) -> AsyncIterator[str]:
+    data_lines: list[str] = []
+    async for line in res.aiter_lines():
+        if not line:
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+            continue
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+    if data_lines:
+        yield "\n".join(data_lines)
+
+
+async def _stream_deltas(
+    call: _ProviderCall,
+    parse_delta: Any,
+    usage: dict[str, Any],
+) -> AsyncIterator[str]:
+    started = time.perf_counter()
+    try:
+        async with provider_clients.get_async(call.provider).stream(
+            "POST",
+            call.url,
+            params=call.params,
+            headers=call.headers,
+            json=call.payload,
+        ) as res:
+            if res.status_code >= 400:
+                await res.aread()
+                raise _provider_error(call, res)
+            async for data in _iter_sse_data(res):
+                if data == "[DONE]":
+                    break
+                try:
+                    delta = parse_delta(json.loads(data), usage)
+                except Exception:
+                    # An error event (or a garbled frame) inside a 200 stream still counts.
+                    provider_metrics.record_failure(call.provider, call.model)
+                    raise
+                if delta:
+                    yield delta
+        provider_metrics.record_success(
+            call.provider, call.model, (time.perf_counter() - started) * 1000
+        )
+        circuit_breakers.record_success(call.provider)
+    except httpx.HTTPError as exc:
+        raise _transport_error(call, exc) from exc
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+class _Attempts:
+    """Collects provider errors for one generation, logging each as it happens.
+
+    `execution` carries routing metadata (hedging, ...) that is persisted in the
+    agent_run output_payload. When a `deadline` is given every attempt is bounded by
+    what is left of it, and `timed_out` tells whether the budget ran out.
+    """
+
+    def __init__(
+        self,
+        event: str,
+        project_id: int,
+        agent_id: int,
+        deadline: Deadline | None = None,
+    ) -> None:
+        self.event = event
+        self.project_id = project_id
+        self.agent_id = agent_id
+        self.deadline = deadline
+        self.timed_out = False
+        self.errors: list[str] = []
+        self.statuses: list[int] = []
+        self.execution: dict[str, Any] = {}
+
+    def start(self, provider: str) -> None:
+        logger.info(
+            "%s_provider_attempt provider=%s project_id=%s agent_id=%s",
+            self.event,
+            provider,
+            self.project_id,
+            self.agent_id,
+        )
+
+    def admit(self, provider: str) -> bool:
+        """Start an attempt unless the provider's circuit is open."""
+        if circuit_breakers.allow(provider):
+            self.start(provider)
+            return True
+        self.skipped(provider, "circuit_open")
+        return False
+
+    def within_deadline(self, call: _ProviderCall) -> bool:
+        """Skip the attempt when the remaining request budget cannot cover it."""
+        if self.deadline is None:
+            return True
+        if self.deadline.attempt_timeout(call.provider, call.model) is not None:
+            return True
+        self.timed_out = True
+        self.skipped(call.provider, "deadline")
+        return False
+
+    @property
+    def timeout(self) -> float | None:
+        if self.deadline is None:
+            return None
+        return min(self.deadline.remaining(), settings.ai_http_timeout_seconds)
+
+    @property
+    def max_queue_wait(self) -> float | None:
+        return None if self.deadline is None else self.deadline.max_queue_wait()
+
+    def skipped(self, provider: str, reason: str) -> None:
+        """Record a provider that was not called at all; it counts as a 503."""
+        self.statuses.append(503)
+        self.errors.append(f"{provider}: skipped ({reason})")
+        self.execution.setdefault("skipped", {})[provider] = reason
+        logger.warning(
+            "%s_provider_skipped provider=%s project_id=%s agent_id=%s reason=%s",
+            self.event,
+            provider,
+            self.project_id,
+            self.agent_id,
+            reason,
+        )
+
+    def failed(self, provider: str, exc: Exception) -> None:
+        status = exc.status_code if isinstance(exc, HTTPException) else 503
+        detail = exc.detail if isinstance(exc, HTTPException) else exc
+        self.statuses.append(status)
+        # A call cut short by our own request budget says nothing about provider health.
+        if self.deadline is not None and self.deadline.expired:
+            self.timed_out = True
+        elif status >= 500:
+            circuit_breakers.record_failure(provider)
+        logger.error(
+            "%s_provider_error provider=%s project_id=%s agent_id=%s status=%s error=%s",
+            self.event,
+            provider,
+            self.project_id,
+            self.agent_id,
+            status,
+            str(exc),
+            exc_info=exc,
+        )
+        self.errors.append(f"{provider}: {detail}")
+
+    @property
+    def all_unavailable(self) -> bool:
+        return bool(self.statuses) and all(status >= 500 for status in self.statuses)
+
+
+def _text_order(req: AiTextGenerateRequest) -> list[str]:
+    return _providers_order(req.provider_preference, "text", req.model_name)
+
+
+def _text_rate_tokens(req: AiTextGenerateRequest) -> int:
+    # Local estimate for the reservation; settled against real usage afterwards.
+    input_tokens = estimate_input_tokens(req.prompt, req.system_prompt, _history_contents(req))
+    return input_tokens + (req.max_output_tokens or 0)
+
+
+async def _within_rate_limit_async(
+    call: _ProviderCall,
+    tokens: int,
+    attempts: _Attempts,
+) -> bool:
+    if await rate_limits.acquire_async(
+        call.provider, call.model, tokens, attempts.max_queue_wait
+    ):
+        return True
+    attempts.skipped(call.provider, "rate_limited")
+    return False
+
+
+def _settle_rate_limit(call: _ProviderCall, tokens: int, result: dict[str, Any]) -> None:
+    in_tokens = result.get("token_input_count")
+    out_tokens = result.get("token_output_count")
+    if in_tokens is not None and out_tokens is not None:
+        rate_limits.settle(call.provider, call.model, tokens, in_tokens + out_tokens)
+
+
+async def _execute_text_async(
+    req: AiTextGenerateRequest,
+    attempts: _Attempts,
+) -> dict[str, Any] | None:
+    tokens = _text_rate_tokens(req)
+    for provider in _text_order(req):
+        if not attempts.admit(provider):
+            continue
+        build, parse = _TEXT_CALLS[provider]
+        try:
+            call = build(req)
+            if not attempts.within_deadline(call):
+                continue
+            if not await _within_rate_limit_async(call, tokens, attempts):
+                continue
+            result = parse(call, await _send_async(call, attempts.timeout))
+        except Exception as exc:
+            attempts.failed(provider, exc)
+            continue
+        _settle_rate_limit(call, tokens, result)
+        return result
+    return None
+
+
+def _text_model(provider: str, req: AiTextGenerateRequest) -> str:
+    return req.model_name or default_model("text", provider)
+
+
+def _can_hedge(req: AiTextGenerateRequest) -> bool:
+    # Hedging only pays off with two healthy providers; otherwise use the sequential path.
+    if not settings.ai_hedge_enabled or req.provider_preference.lower().strip() != "auto":
+        return False
+    return all(circuit_breakers.is_closed(p) for p in _text_order(req))
+
+
+def _hedge_delay_seconds(provider: str, model: str) -> float:
+    if settings.ai_hedge_use_p95:
+        p95 = provider_metrics.p95(provider, model, min_samples=settings.ai_hedge_min_samples)
+        if p95 is not None:
+            return p95 / 1000
+    return settings.ai_hedge_delay_ms / 1000
+
+
+async def _execute_text_hedged(
+    req: AiTextGenerateRequest,
+    attempts: _Attempts,
+) -> dict[str, Any] | None:
+    """Race the secondary provider against a slow primary and keep the first success.
+
+    The secondary is fired when the primary has not answered within the hedge delay
+    (rolling p95 when enough samples exist) or as a plain fallback when the primary
+    fails first. The losing call is cancelled.
+    """
+    primary, secondary = _text_order(req)[:2]
+    delay = _hedge_delay_seconds(primary, _text_model(primary, req))
+    tokens = _text_rate_tokens(req)
+
+    async def attempt(provider: str) -> dict[str, Any] | None:
+        attempts.start(provider)
+        build, parse = _TEXT_CALLS[provider]
+        call = build(req)
+        if not attempts.within_deadline(call):
+            return None
+        if not await _within_rate_limit_async(call, tokens, attempts):
+            return None
+        result = parse(call, await _send_async(call, attempts.timeout))
+        _settle_rate_limit(call, tokens, result)
+        return result
+
+    tasks: dict[asyncio.Task[dict[str, Any] | None], str] = {
+        asyncio.create_task(attempt(primary)): primary
+    }
+    attempts.execution.update({"hedge_fired": False, "hedge_delay_ms": round(delay * 1000)})
+    secondary_started = False
+    done, _ = await asyncio.wait(tasks, timeout=delay)
+    if not done:
+        secondary_started = True
+        attempts.execution["hedge_fired"] = True
+        logger.info(
+            "ai_text_hedge_fired primary=%s secondary=%s project_id=%s delay_ms=%s",
+            primary,
+            secondary,
+            req.project_id,
+            round(delay * 1000),
+        )
+        tasks[asyncio.create_task(attempt(secondary))] = secondary
+
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                provider = tasks.pop(task)
+                exc = task.exception()
+                if exc is None and task.result() is not None:
+                    attempts.execution["winner"] = provider
+                    return task.result()
+                if exc is not None:
+                    attempts.failed(provider, exc)
+                if not secondary_started:
+                    secondary_started = True
+                    tasks[asyncio.create_task(attempt(secondary))] = secondary
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _execute_text_routed(
+    req: AiTextGenerateRequest,
+    attempts: _Attempts,
+) -> dict[str, Any] | None:
+    if _can_hedge(req):
+        return await _execute_text_hedged(req, attempts)
+    return await _execute_text_async(req, attempts)
+
+
+async def _execute_image_async(
+    req: AiImageGenerateRequest,
+    attempts: _Attempts,
+) -> dict[str, Any] | None:
+    for provider in _providers_order(req.provider_preference, "image", req.model_name):
+        if not attempts.admit(provider):
+            continue
+        build, parse = _IMAGE_CALLS[provider]
+        try:
+            call = build(req)
+            if not attempts.within_deadline(call):
+                continue
+            if not await _within_rate_limit_async(call, 0, attempts):
+                continue
+            return parse(call, await _send_async(call, attempts.timeout))
+        except Exception as exc:
+            attempts.failed(provider, exc)
+    return None
+
+
+def _log_text_start(user: User, req: AiTextGenerateRequest, agent_id: int) -> None:
     logger.info(
         "ai_text_start user_id=%s project_id=%s agent_id=%s provider_pref=%s model_override=%s prompt_len=%s system_len=%s max_output_tokens=%s",
         int(user.id),
-        prepared_req.project_id,
+        req.project_id,
+        agent_id,
+        req.provider_preference,
+        req.model_name,
+        len(req.prompt or ""),
+        len(req.system_prompt or ""),
+        req.max_output_tokens,
+    )
+
+
+def _log_image_start(user: User, req: AiImageGenerateRequest, agent_id: int) -> None:
+    logger.info(
+        "ai_image_start user_id=%s project_id=%s agent_id=%s provider_pref=%s model_override=%s prompt_len=%s size=%s",
+        int(user.id),
+        req.project_id,
         agent_id,
-        prepared_req.provider_preference,
-        prepared_req.model_name,
-        len(prepared_req.prompt or ""),
-        len(prepared_req.system_prompt or ""),
-        prepared_req.max_output_tokens,
-    )
-    errors: list[str] = []
-    error_statuses: list[int] = []
-    for provider in _providers_order(prepared_req.provider_preference):
-        try:
-            logger.info(
-                "ai_text_provider_attempt provider=%s project_id=%s agent_id=%s",
-                provider,
-                prepared_req.project_id,
-                agent_id,
-            )
-            result = _openai_text(prepared_req) if provider == "openai" else _gemini_text(prepared_req)
-            run = create_agent_run(
-                db=db,
-                payload=AgentRunCreate(
-                    project_id=prepared_req.project_id,
-                    agent_id=agent_id,
-                    stage_id=prepared_req.stage_id,
-                    provider=result["provider"],
-                    model_name=result["model_name"],
-                    run_status="success",
-                    trigger_source="api",
-                    input_payload={"prompt": prepared_req.prompt, "system_prompt": prepared_req.system_prompt},
-                    output_payload={"text": result["text"]},
-                    token_input_count=result.get("token_input_count"),
-                    token_output_count=result.get("token_output_count"),
-                    cost_usd=result.get("cost_usd"),
-                    created_by_user_id=int(user.id),
-                ),
-            )
-            return AiTextGenerateResponse(
-                run_id=run.agent_run_id,
+        req.provider_preference,
+        req.model_name,
+        len(req.prompt or ""),
+        req.size,
+    )
+
+
+def _with_execution(output_payload: dict[str, Any], attempts: _Attempts) -> dict[str, Any]:
+    if attempts.execution:
+        return {**output_payload, "execution": attempts.execution}
+    return output_payload
+
+
+def _text_input_payload(req: AiTextGenerateRequest) -> dict[str, Any]:
+    input_payload: dict[str, Any] = {"prompt": req.prompt, "system_prompt": req.system_prompt}
+    if req.history:
+        input_payload["history_turns"] = len(req.history)
+    return input_payload
+
+
+def _shared_text_run_payload(
+    user: User,
+    req: AiTextGenerateRequest,
+    agent_id: int,
+    shared: dict[str, Any],
+    execution: dict[str, Any],
+) -> AgentRunCreate:
+    return AgentRunCreate(
+        project_id=req.project_id,
+        agent_id=agent_id,
+        stage_id=req.stage_id,
+        provider=shared["provider"],
+        model_name=shared["model_name"],
+        run_status="success",
+        trigger_source="api",
+        input_payload=_text_input_payload(req),
+        output_payload={"text": shared["text"], "execution": execution},
+        cost_usd=0.0,
+        created_by_user_id=int(user.id),
+    )
+
+
+def _text_run_payload(
+    user: User,
+    req: AiTextGenerateRequest,
+    agent_id: int,
+    result: dict[str, Any] | None,
+    attempts: _Attempts,
+) -> AgentRunCreate:
+    input_payload = _text_input_payload(req)
+    if result is not None:
+        return AgentRunCreate(
+            project_id=req.project_id,
+            agent_id=agent_id,
+            stage_id=req.stage_id,
+            provider=result["provider"],
+            model_name=result["model_name"],
+            run_status="success",
+            trigger_source="api",
+            input_payload=input_payload,
+            output_payload=_with_execution({"text": result["text"]}, attempts),
+            token_input_count=result.get("token_input_count"),
+            token_output_count=result.get("token_output_count"),
+            cost_usd=result.get("cost_usd"),
+            created_by_user_id=int(user.id),
+        )
+    return AgentRunCreate(
+        project_id=req.project_id,
+        agent_id=agent_id,
+        stage_id=req.stage_id,
+        provider=None,
+        model_name=req.model_name,
+        run_status="timeout" if attempts.timed_out else "failed",
+        trigger_source="api",
+        input_payload=input_payload,
+        output_payload={"execution": attempts.execution} if attempts.execution else None,
+        error_message=" | ".join(attempts.errors)[:1000],
+        created_by_user_id=int(user.id),
+    )
+
+
+def _text_response(run_id: int, result: dict[str, Any]) -> AiTextGenerateResponse:
+    return AiTextGenerateResponse(
+        run_id=run_id,
+        provider=result["provider"],
+        model_name=result["model_name"],
+        text=result["text"],
+        token_input_count=result.get("token_input_count"),
+        token_output_count=result.get("token_output_count"),
+        cost_usd=result.get("cost_usd"),
+    )
+
+
+def _finish_shared_text(
+    db: Session,
+    user: User,
+    req: AiTextGenerateRequest,
+    agent_id: int,
+    shared: dict[str, Any],
+    execution: dict[str, Any],
+) -> AiTextGenerateResponse:
+    """Record a zero-cost run for a result produced by another run's provider call."""
+    run_id = record_agent_run(
+        db=db,
+        payload=_shared_text_run_payload(user, req, agent_id, shared, execution),
+    )
+    logger.info(
+        "ai_text_shared_result project_id=%s agent_id=%s run_id=%s source_run_id=%s execution=%s",
+        req.project_id,
+        agent_id,
+        run_id,
+        shared["run_id"],
+        execution,
+    )
+    return AiTextGenerateResponse(
+        run_id=run_id,
+        provider=shared["provider"],
+        model_name=shared["model_name"],
+        text=shared["text"],
+        cost_usd=0.0,
+        cached=bool(execution.get("cache_hit")),
+        coalesced=bool(execution.get("coalesced")),
+    )
+
+
+def _finish_cached_text(
+    db: Session,
+    user: User,
+    req: AiTextGenerateRequest,
+    agent_id: int,
+    cached: dict[str, Any],
+) -> AiTextGenerateResponse:
+    execution = {"cache_hit": True, "cached_from_run_id": cached["run_id"]}
+    return _finish_shared_text(db, user, req, agent_id, cached, execution)
+
+
+def _finish_coalesced_text(
+    db: Session,
+    user: User,
+    req: AiTextGenerateRequest,
+    agent_id: int,
+    outcome: tuple[str, Any],
+) -> AiTextGenerateResponse:
+    status, value = outcome
+    if status == "ok":
+        execution = {"coalesced": True, "coalesced_from_run_id": value["run_id"]}
+        return _finish_shared_text(db, user, req, agent_id, value, execution)
+    # The shared call failed: record this caller's failed run with the same errors.
+    attempts = _Attempts("ai_text", req.project_id, agent_id)
+    attempts.errors = list(value.errors)
+    attempts.statuses = list(value.statuses)
+    attempts.timed_out = value.timed_out
+    attempts.execution = {"coalesced": True}
+    return _finish_text(db, user, req, agent_id, None, attempts)
+
+
+def _finish_text(
+    db: Session,
+    user: User,
+    req: AiTextGenerateRequest,
+    agent_id: int,
+    result: dict[str, Any] | None,
+    attempts: _Attempts,
+    cache_key: str | None = None,
+) -> AiTextGenerateResponse:
+    payload = _text_run_payload(user, req, agent_id, result, attempts)
+    if result is not None:
+        run_id = record_agent_run(db=db, payload=payload)
+        if cache_key is not None:
+            _text_cache.set(cache_key, {**result, "run_id": run_id})
+        return _text_response(run_id, result)
+
+    failed_run_id = record_agent_run(db=db, payload=payload)
+    raise text_failure(failed_run_id, attempts)
+
+
+def text_failure(run_id: int, attempts: _Attempts) -> HTTPException:
+    """Log a text generation where every provider failed and build the error to raise."""
+    errors = attempts.errors
+    logger.error(
+        "ai_text_all_providers_failed project_id=%s agent_id=%s run_id=%s errors=%s",
+        attempts.project_id,
+        attempts.agent_id,
+        run_id,
+        errors,
+    )
+    if attempts.timed_out:
+        return gateway_timeout(f"Request deadline exceeded. run_id={run_id}. errors={errors}")
+    if attempts.all_unavailable:
+        return service_unavailable(
+            "All providers failed due to upstream/unavailable conditions. "
+            f"run_id={run_id}. errors={errors}"
+        )
+    return bad_request(f"All providers failed. run_id={run_id}. errors={errors}")
+
+
+def _store_image(
+    db: Session,
+    result: dict[str, Any],
+    project_id: int,
+    include_base64: bool,
+) -> dict[str, Any]:
+    """Decode the provider's base64 once and keep the bytes in the blob store.
+
+    The blob is recorded as the project's, and the result gains a signed `image_url`;
+    `image_base64` is dropped when the caller opted out of it.
+    """
+    encoded = result.get("image_base64")
+    if not encoded:
+        return result
+    try:
+        data = base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError) as exc:
+        raise bad_request(f"{result['provider']} returned invalid image data") from exc
+    blob = blob_store.put(data)
+    record_blob_project(db, blob.sha256, project_id)
+    return {
+        **result,
+        "mime_type": result.get("mime_type") or sniff_mime_type(data[:16]),
+        "image_sha256": blob.sha256,
+        "image_size_bytes": blob.size,
+        "image_url": blob_url(blob.sha256, project_id),
+        "image_base64": encoded if include_base64 else None,
+    }
+
+
+def _image_output_payload(result: dict[str, Any]) -> dict[str, Any]:
+    # Signed URLs expire, so stored runs keep the digest and sign a URL when read back.
+    output = {
+        "mime_type": result.get("mime_type"),
+        "image_sha256": result.get("image_sha256"),
+        "image_size_bytes": result.get("image_size_bytes"),
+    }
+    if result.get("image_sha256") is None:
+        output["image_url"] = result.get("image_url")
+    return output
+
+
+def _image_response(run_id: int, result: dict[str, Any]) -> AiImageGenerateResponse:
+    return AiImageGenerateResponse(
+        run_id=run_id,
+        provider=result["provider"],
+        model_name=result["model_name"],
+        mime_type=result.get("mime_type"),
+        image_base64=result.get("image_base64"),
+        image_url=result.get("image_url"),
+        image_sha256=result.get("image_sha256"),
+        cost_usd=result.get("cost_usd"),
+    )
+
+
+def _finish_image(
+    db: Session,
+    user: User,
+    req: AiImageGenerateRequest,
+    agent_id: int,
+    result: dict[str, Any] | None,
+    attempts: _Attempts,
+) -> AiImageGenerateResponse:
+    input_payload = {"prompt": req.prompt, "size": req.size}
+    if result is not None:
+        result = _store_image(db, result, req.project_id, req.include_base64)
+        run_id = record_agent_run(
+            db=db,
+            payload=AgentRunCreate(
+                project_id=req.project_id,
+                agent_id=agent_id,
+                stage_id=req.stage_id,
                 provider=result["provider"],
                 model_name=result["model_name"],
-                text=result["text"],
-                token_input_count=result.get("token_input_count"),
-                token_output_count=result.get("token_output_count"),
+                run_status="success",
+                trigger_source="api",
+                input_payload=input_payload,
+                output_payload=_image_output_payload(result),
                 cost_usd=result.get("cost_usd"),
-            )
-        except HTTPException as exc:
-            error_statuses.append(exc.status_code)
-            logger.exception(
-                "ai_text_provider_error provider=%s project_id=%s agent_id=%s status=%s error=%s",
-                provider,
-                prepared_req.project_id,
-                agent_id,
-                exc.status_code,
-                str(exc),
-            )
-            errors.append(f"{provider}: {exc.detail}")
-        except Exception as exc:
-            error_statuses.append(503)
-            logger.exception(
-                "ai_text_provider_error provider=%s project_id=%s agent_id=%s status=503 error=%s",
-                provider,
-                prepared_req.project_id,
-                agent_id,
-                str(exc),
-            )
-            errors.append(f"{provider}: {exc}")
+                created_by_user_id=int(user.id),
+            ),
+        )
+        return _image_response(run_id, result)
 
-    failed_run = create_agent_run(
+    failed_run_id = record_agent_run(
         db=db,
         payload=AgentRunCreate(
-            project_id=prepared_req.project_id,
+            project_id=req.project_id,
             agent_id=agent_id,
-            stage_id=prepared_req.stage_id,
+            stage_id=req.stage_id,
             provider=None,
-            model_name=prepared_req.model_name,
-            run_status="failed",
+            model_name=req.model_name,
+            run_status="timeout" if attempts.timed_out else "failed",
             trigger_source="api",
-            input_payload={"prompt": prepared_req.prompt, "system_prompt": prepared_req.system_prompt},
-            error_message=" | ".join(errors)[:1000],
+            input_payload=input_payload,
+            error_message=" | ".join(attempts.errors)[:1000],
             created_by_user_id=int(user.id),
         ),
     )
+    errors = attempts.errors
     logger.error(
-        "ai_text_all_providers_failed project_id=%s agent_id=%s run_id=%s errors=%s",
-        prepared_req.project_id,
+        "ai_image_all_providers_failed project_id=%s agent_id=%s run_id=%s errors=%s",
+        req.project_id,
         agent_id,
-        failed_run.agent_run_id,
+        failed_run_id,
         errors,
     )
-    if error_statuses and all(status >= 500 for status in error_statuses):
-        raise service_unavailable(
-            f"All providers failed due to upstream/unavailable conditions. run_id={failed_run.agent_run_id}. errors={errors}"
+    if attempts.timed_out:
+        raise gateway_timeout(
+            f"Request deadline exceeded. run_id={failed_run_id}. errors={errors}"
+        )
+    raise bad_request(f"All providers failed. run_id={failed_run_id}. errors={errors}")
+
+
+def estimate_text(req: AiTextGenerateRequest) -> AiTextEstimateResponse:
+    """Dry run of a text generation: local token counts and cost bounds, no provider call."""
+    prepared_req = _prepare_text_request(req)
+    input_tokens = estimate_input_tokens(
+        prepared_req.prompt, prepared_req.system_prompt, _history_contents(prepared_req)
+    )
+    max_output_tokens = prepared_req.max_output_tokens or 0
+    candidates = []
+    for provider in _text_order(prepared_req):
+        model = _text_model(provider, prepared_req)
+        candidates.append(
+            AiTextEstimateCandidateOut(
+                provider=provider,
+                model_name=model,
+                context_window_tokens=context_window(model),
+                output_budget_tokens=output_budget(model, input_tokens),
+                min_cost_usd=_estimate_text_cost(provider, input_tokens, 0),
+                max_cost_usd=_estimate_text_cost(provider, input_tokens, max_output_tokens),
+            )
         )
-    raise bad_request(f"All providers failed. run_id={failed_run.agent_run_id}. errors={errors}")
+    return AiTextEstimateResponse(
+        prompt_tokens=count_tokens(prepared_req.prompt),
+        system_prompt_tokens=count_tokens(prepared_req.system_prompt or ""),
+        input_tokens=input_tokens,
+        requested_max_output_tokens=req.max_output_tokens,
+        max_output_tokens=max_output_tokens,
+        prompt_truncated=prepared_req.prompt != " ".join(req.prompt.split()),
+        candidates=candidates,
+    )
+
+
+async def generate_text_async(
+    db: Session,
+    user: User,
+    req: AiTextGenerateRequest,
+    deadline: Deadline | None = None,
+) -> AiTextGenerateResponse:
+    """Generate text with provider fallback; provider I/O is awaited, DB work runs in threads.
+
+    Concurrent identical requests share a single provider call; each caller still gets
+    its own agent_run, linked through `execution.coalesced_from_run_id`.
+    """
+    prepared_req = _prepare_text_request(req)
+    agent_id = await run_in_threadpool(_admit_project_run, db, req.project_id, req.agent_id)
+    cache_key = _text_cache_key(prepared_req)
+    cached = _text_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        return await run_in_threadpool(
+            _finish_cached_text, db, user, prepared_req, agent_id, cached
+        )
+    flight_key = _text_flight_key(prepared_req)
+    flight = _text_inflight.get(flight_key) if flight_key else None
+    if flight is not None:
+        try:
+            outcome = await asyncio.wait_for(
+                asyncio.shield(flight), deadline.remaining() if deadline else None
+            )
+        except asyncio.TimeoutError:
+            outcome = ("failed", _flight_timed_out(prepared_req, agent_id))
+        if outcome is not None:
+            logger.info(
+                "ai_text_coalesced project_id=%s agent_id=%s outcome=%s",
+                prepared_req.project_id,
+                agent_id,
+                outcome[0],
+            )
+            return await run_in_threadpool(
+                _finish_coalesced_text, db, user, prepared_req, agent_id, outcome
+            )
+    _log_text_start(user, prepared_req, agent_id)
+    if flight_key is None or flight_key in _text_inflight:
+        return await _run_text(db, user, prepared_req, agent_id, cache_key, deadline)
+
+    flight = asyncio.get_running_loop().create_future()
+    _text_inflight[flight_key] = flight
+    try:
+        return await _run_text(db, user, prepared_req, agent_id, cache_key, deadline, flight)
+    finally:
+        if _text_inflight.get(flight_key) is flight:
+            del _text_inflight[flight_key]
+        if not flight.done():
+            flight.set_result(None)
+
+
+def _flight_timed_out(req: AiTextGenerateRequest, agent_id: int) -> _Attempts:
+    attempts = _Attempts("ai_text", req.project_id, agent_id)
+    attempts.timed_out = True
+    attempts.errors.append("request deadline exceeded while waiting for a shared call")
+    attempts.statuses.append(504)
+    return attempts
+
+
+async def _run_text(
+    db: Session,
+    user: User,
+    req: AiTextGenerateRequest,
+    agent_id: int,
+    cache_key: str | None,
+    deadline: Deadline | None,
+    flight: asyncio.Future[tuple[str, Any] | None] | None = None,
+) -> AiTextGenerateResponse:
+    attempts = _Attempts("ai_text", req.project_id, agent_id, deadline)
+    result = await _execute_text_routed(req, attempts)
+    if result is None and flight is not None:
+        flight.set_result(("failed", attempts))
+    response = await run_in_threadpool(
+        _finish_text, db, user, req, agent_id, result, attempts, cache_key
+    )
+    if flight is not None:
+        flight.set_result(("ok", {**result, "run_id": response.run_id}))
+    return response
+
+
+@dataclass
+class TextCompletion:
+    """Outcome of `complete_text_async`; `run` is ready to insert, `result` is None on failure."""
+
+    run: AgentRunCreate
+    result: dict[str, Any] | None
+    attempts: _Attempts
+
+
+async def complete_text_async(
+    db: Session,
+    user: User,
+    req: AiTextGenerateRequest,
+    deadline: Deadline | None = None,
+) -> TextCompletion:
+    """Run a text generation without persisting it, for callers that store the agent_run
+    in their own transaction. Cache and request coalescing do not apply.
+    """
+    prepared_req = _prepare_text_request(req)
+    agent_id = await run_in_threadpool(_admit_project_run, db, req.project_id, req.agent_id)
+    _log_text_start(user, prepared_req, agent_id)
+    attempts = _Attempts("ai_text", prepared_req.project_id, agent_id, deadline)
+    result = await _execute_text_routed(prepared_req, attempts)
+    return TextCompletion(
+        run=_text_run_payload(user, prepared_req, agent_id, result, attempts),
+        result=result,
+        attempts=attempts,
+    )
+
+
+@dataclass
+class _BatchItem:
+    req: AiTextGenerateRequest
+    cache_key: str | None
+    cached: dict[str, Any] | None = None
+    result: dict[str, Any] | None = None
+    attempts: _Attempts | None = None
+
+
+def _batch_item_request(
+    batch: AiTextBatchRequest,
+    agent_id: int,
+    index: int,
+) -> AiTextGenerateRequest:
+    item = batch.items[index]
+    return _prepare_text_request(
+        AiTextGenerateRequest(
+            project_id=batch.project_id,
+            agent_id=agent_id,
+            prompt=item.prompt,
+            system_prompt=item.system_prompt or batch.system_prompt,
+            stage_id=item.stage_id,
+            provider_preference=batch.provider_preference,
+            model_name=batch.model_name,
+            temperature=item.temperature if item.temperature is not None else batch.temperature,
+            max_output_tokens=item.max_output_tokens or batch.max_output_tokens,
+            use_cache=batch.use_cache,
+        )
+    )
+
+
+def _batch_item_status_code(attempts: _Attempts | None) -> int:
+    if attempts is not None and attempts.timed_out:
+        return 504
+    if attempts is not None and 402 in attempts.statuses:
+        return 402
+    return 503 if attempts is not None and attempts.all_unavailable else 400
+
+
+def _batch_item_result(index: int, run_id: int, item: _BatchItem) -> AiTextBatchItemResult:
+    if item.cached is not None:
+        return AiTextBatchItemResult(
+            index=index,
+            status="success",
+            run_id=run_id,
+            provider=item.cached["provider"],
+            model_name=item.cached["model_name"],
+            text=item.cached["text"],
+            cost_usd=0.0,
+            cached=True,
+        )
+    if item.result is not None:
+        return AiTextBatchItemResult(
+            index=index,
+            status="success",
+            **_text_response(run_id, item.result).model_dump(exclude={"cached", "coalesced"}),
+        )
+    attempts = item.attempts
+    return AiTextBatchItemResult(
+        index=index,
+        status="failed",
+        run_id=run_id,
+        status_code=_batch_item_status_code(attempts),
+        error=" | ".join(attempts.errors if attempts is not None else [])[:1000],
+    )
 
 
-def generate_image(db: Session, user: User, req: AiImageGenerateRequest) -> AiImageGenerateResponse:
-    agent_id = _resolve_agent_id(db=db, project_id=req.project_id, requested_agent_id=req.agent_id)
+def _text_cost_reservation(req: AiTextGenerateRequest) -> float:
+    """Upper estimate of a text call's cost, held against the budget while it runs."""
+    input_tokens = estimate_input_tokens(req.prompt, req.system_prompt, _history_contents(req))
+    return max(
+        _estimate_text_cost(provider, input_tokens, req.max_output_tokens)
+        for provider in _text_order(req)
+    )
+
+
+async def generate_text_batch_async(
+    db: Session,
+    user: User,
+    req: AiTextBatchRequest,
+    deadline_ms: int | None = None,
+) -> AiTextBatchResponse:
+    """Generate a list of prompts for one project with shared setup and one bulk insert.
+
+    Items run concurrently up to `AI_BATCH_MAX_CONCURRENCY` through the same routing,
+    circuit breaker and rate limiter as single requests. Each item gets its own request
+    deadline (`deadline_ms` is the client's deadline header), started when the item
+    begins running. The project budget is checked again before each item, counting what
+    finished items spent and an estimated cost for the ones still in flight. Item
+    failures are reported per item instead of failing the batch.
+    """
+    if len(req.items) > settings.ai_batch_max_items:
+        raise bad_request(f"items must contain at most {settings.ai_batch_max_items} prompts")
+    _providers_order(req.provider_preference)
+    agent_id = await run_in_threadpool(_admit_project_run, db, req.project_id, req.agent_id)
+    items: list[_BatchItem] = []
+    for index in range(len(req.items)):
+        item_req = _batch_item_request(req, agent_id, index)
+        items.append(_BatchItem(req=item_req, cache_key=_text_cache_key(item_req)))
     logger.info(
-        "ai_image_start user_id=%s project_id=%s agent_id=%s provider_pref=%s model_override=%s prompt_len=%s size=%s",
+        "ai_text_batch_start user_id=%s project_id=%s agent_id=%s items=%s concurrency=%s",
         int(user.id),
         req.project_id,
         agent_id,
-        req.provider_preference,
-        req.model_name,
-        len(req.prompt or ""),
-        req.size,
+        len(items),
+        settings.ai_batch_max_concurrency,
     )
-    errors: list[str] = []
-    for provider in _providers_order(req.provider_preference):
+
+    semaphore = asyncio.Semaphore(max(1, settings.ai_batch_max_concurrency))
+    # Spend of finished items and estimates for running ones; neither is recorded
+    # until the bulk insert at the end.
+    batch_spent = 0.0
+    batch_reserved = 0.0
+
+    async def run(item: _BatchItem) -> None:
+        nonlocal batch_spent, batch_reserved
+        item.cached = _text_cache.get(item.cache_key) if item.cache_key else None
+        if item.cached is not None:
+            return
+        async with semaphore:
+            item.attempts = _Attempts(
+                "ai_text_batch", req.project_id, agent_id, request_deadline(deadline_ms)
+            )
+            if not within_project_budget(req.project_id, batch_spent + batch_reserved):
+                item.attempts.statuses.append(402)
+                item.attempts.errors.append("Project monthly AI budget exhausted")
+                return
+            reservation = _text_cost_reservation(item.req)
+            batch_reserved += reservation
+            try:
+                item.result = await _execute_text_routed(item.req, item.attempts)
+            finally:
+                batch_reserved -= reservation
+            if item.result is not None:
+                batch_spent += item.result.get("cost_usd") or 0.0
+
+    await asyncio.gather(*(run(item) for item in items))
+
+    payloads = [
+        _shared_text_run_payload(
+            user,
+            item.req,
+            agent_id,
+            item.cached,
+            {"cache_hit": True, "cached_from_run_id": item.cached["run_id"]},
+        )
+        if item.cached is not None
+        else _text_run_payload(user, item.req, agent_id, item.result, item.attempts)
+        for item in items
+    ]
+    run_ids = await run_in_threadpool(record_agent_runs, db, payloads)
+
+    results: list[AiTextBatchItemResult] = []
+    for index, (item, run_id) in enumerate(zip(items, run_ids, strict=True)):
+        if item.result is not None and item.cache_key is not None:
+            _text_cache.set(item.cache_key, {**item.result, "run_id": run_id})
+        results.append(_batch_item_result(index, run_id, item))
+    succeeded = sum(1 for r in results if r.status == "success")
+    logger.info(
+        "ai_text_batch_done project_id=%s agent_id=%s total=%s succeeded=%s failed=%s",
+        req.project_id,
+        agent_id,
+        len(results),
+        succeeded,
+        len(results) - succeeded,
+    )
+    return AiTextBatchResponse(
+        project_id=req.project_id,
+        agent_id=agent_id,
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        items=results,
+    )
+
+
+def _finish_text_detached(
+    user: User,
+    req: AiTextGenerateRequest,
+    agent_id: int,
+    result: dict[str, Any] | None,
+    attempts: _Attempts,
+) -> AiTextGenerateResponse:
+    # Streaming responses outlive the request-scoped session, so persist with a fresh one.
+    db = SessionLocal()
+    try:
+        return _finish_text(db, user, req, agent_id, result, attempts)
+    finally:
+        db.close()
+
+
+def _stream_result(
+    call: _ProviderCall,
+    req: AiTextGenerateRequest,
+    chunks: list[str],
+    usage: dict[str, Any],
+    attempts: _Attempts,
+) -> dict[str, Any]:
+    text = "".join(chunks)
+    in_tokens = usage.get("input_tokens")
+    out_tokens = usage.get("output_tokens")
+    if in_tokens is None or out_tokens is None:
+        # A stream cut short never gets its usage event: bill the local estimate instead.
+        attempts.execution["usage_estimated"] = True
+        if in_tokens is None:
+            in_tokens = estimate_input_tokens(req.prompt, req.system_prompt, _history_contents(req))
+        if out_tokens is None:
+            out_tokens = count_tokens(text)
+    return {
+        "provider": call.provider,
+        "model_name": call.model,
+        "text": text,
+        "token_input_count": in_tokens,
+        "token_output_count": out_tokens,
+        "cost_usd": _estimate_text_cost(call.provider, in_tokens, out_tokens),
+    }
+
+
+def _record_partial_stream(
+    user: User,
+    req: AiTextGenerateRequest,
+    agent_id: int,
+    result: dict[str, Any],
+    attempts: _Attempts,
+    run_status: str,
+    error_message: str,
+) -> int:
+    """Persist a stream that ended after deltas were sent, with the text received so far."""
+    db = SessionLocal()
+    try:
+        return record_agent_run(
+            db=db,
+            payload=AgentRunCreate(
+                project_id=req.project_id,
+                agent_id=agent_id,
+                stage_id=req.stage_id,
+                provider=result["provider"],
+                model_name=result["model_name"],
+                run_status=run_status,
+                trigger_source="api",
+                input_payload=_text_input_payload(req),
+                output_payload=_with_execution({"text": result["text"]}, attempts),
+                token_input_count=result["token_input_count"],
+                token_output_count=result["token_output_count"],
+                cost_usd=result["cost_usd"],
+                error_message=error_message[:1000],
+                created_by_user_id=int(user.id),
+            ),
+        )
+    finally:
+        db.close()
+
+
+async def stream_text_async(
+    db: Session,
+    user: User,
+    req: AiTextGenerateRequest,
+) -> AsyncIterator[str]:
+    """Resolve the run context, then return an SSE event iterator for the completion.
+
+    Events: `start` (provider/model), `delta` (text chunk), `done` (the same body as
+    `AiTextGenerateResponse`) or `error`. Fallback to the next provider only happens
+    before the first delta has been sent; a stream cut short after that (provider error
+    or client disconnect) is recorded with the text received and its cost.
+    """
+    prepared_req = _prepare_text_request(req)
+    agent_id = await run_in_threadpool(_admit_project_run, db, req.project_id, req.agent_id)
+    _log_text_start(user, prepared_req, agent_id)
+    providers = _text_order(prepared_req)
+
+    async def events() -> AsyncIterator[str]:
+        attempts = _Attempts("ai_text_stream", prepared_req.project_id, agent_id)
+        attempts.execution["stream"] = True
+        chunks: list[str] = []
+        # The provider call whose deltas are being relayed; no fallback once it is set.
+        current: _ProviderCall | None = None
+        usage: dict[str, Any] = {}
+        rate_tokens = _text_rate_tokens(prepared_req)
         try:
-            logger.info("ai_image_provider_attempt provider=%s project_id=%s agent_id=%s", provider, req.project_id, agent_id)
-            result = _openai_image(req) if provider == "openai" else _gemini_image(req)
-            run = create_agent_run(
-                db=db,
-                payload=AgentRunCreate(
-                    project_id=req.project_id,
-                    agent_id=agent_id,
-                    stage_id=req.stage_id,
-                    provider=result["provider"],
-                    model_name=result["model_name"],
-                    run_status="success",
-                    trigger_source="api",
-                    input_payload={"prompt": req.prompt, "size": req.size},
-                    output_payload={
-                        "mime_type": result.get("mime_type"),
-                        "image_url": result.get("image_url"),
-                        "has_image_base64": bool(result.get("image_base64")),
-                    },
-                    cost_usd=result.get("cost_usd"),
-                    created_by_user_id=int(user.id),
+            for provider in providers:
+                if not attempts.admit(provider):
+                    continue
+                build, parse_delta = _TEXT_STREAM_CALLS[provider]
+                usage = {}
+                try:
+                    call = build(prepared_req)
+                    if not await _within_rate_limit_async(call, rate_tokens, attempts):
+                        continue
+                    async for delta in _stream_deltas(call, parse_delta, usage):
+                        if current is None:
+                            current = call
+                            yield _sse(
+                                "start", {"provider": call.provider, "model_name": call.model}
+                            )
+                        chunks.append(delta)
+                        yield _sse("delta", {"text": delta})
+                except Exception as exc:
+                    attempts.failed(provider, exc)
+                    if current is None:
+                        continue
+                    # Deltas already went out: record the partial run and its cost, then stop.
+                    result = _stream_result(call, prepared_req, chunks, usage, attempts)
+                    _settle_rate_limit(call, rate_tokens, result)
+                    current = None
+                    run_id = await run_in_threadpool(
+                        _record_partial_stream,
+                        user,
+                        prepared_req,
+                        agent_id,
+                        result,
+                        attempts,
+                        "timeout" if attempts.timed_out else "failed",
+                        " | ".join(attempts.errors),
+                    )
+                    failure = text_failure(run_id, attempts)
+                    yield _sse(
+                        "error", {"status_code": failure.status_code, "detail": failure.detail}
+                    )
+                    return
+
+                result = _stream_result(call, prepared_req, chunks, usage, attempts)
+                _settle_rate_limit(call, rate_tokens, result)
+                current = None
+                response = await run_in_threadpool(
+                    _finish_text_detached, user, prepared_req, agent_id, result, attempts
+                )
+                yield _sse("done", response.model_dump())
+                return
+
+            try:
+                await run_in_threadpool(
+                    _finish_text_detached, user, prepared_req, agent_id, None, attempts
+                )
+            except HTTPException as exc:
+                yield _sse("error", {"status_code": exc.status_code, "detail": exc.detail})
+        except (asyncio.CancelledError, GeneratorExit):
+            if current is not None:
+                logger.info(
+                    "ai_text_stream_cancelled project_id=%s agent_id=%s provider=%s chars=%s",
+                    prepared_req.project_id,
+                    agent_id,
+                    current.provider,
+                    sum(len(c) for c in chunks),
+                )
+                result = _stream_result(current, prepared_req, chunks, usage, attempts)
+                with anyio.CancelScope(shield=True):
+                    await run_in_threadpool(
+                        _record_partial_stream,
+                        user,
+                        prepared_req,
+                        agent_id,
+                        result,
+                        attempts,
+                        "cancelled",
+                        "Client disconnected before the stream completed",
+                    )
+            raise
+
+    return events()
+
+
+async def generate_image_async(
+    db: Session,
+    user: User,
+    req: AiImageGenerateRequest,
+    deadline: Deadline | None = None,
+) -> AiImageGenerateResponse:
+    """Generate an image with provider fallback; provider I/O is awaited, DB work in threads."""
+    agent_id = await run_in_threadpool(_admit_project_run, db, req.project_id, req.agent_id)
+    _log_image_start(user, req, agent_id)
+    attempts = _Attempts("ai_image", req.project_id, agent_id, deadline)
+    result = await _execute_image_async(req, attempts)
+    return await run_in_threadpool(_finish_image, db, user, req, agent_id, result, attempts)
+
+
+PENDING_JOB_STATUS = {"queued", "running"}
+
+
+@dataclass(frozen=True)
+class _ImageJob:
+    run_id: int
+    agent_id: int
+    req: AiImageGenerateRequest
+
+
+_image_job_events: dict[int, asyncio.Event] = {}
+
+
+def _in_new_session(fn: Callable[..., Any], *args: Any) -> Any:
+    # Background jobs outlive the request-scoped session, so each write opens its own.
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def _update_job_run(run_id: int, payload: AgentRunUpdate) -> None:
+    await run_in_threadpool(_in_new_session, update_agent_run, run_id, payload)
+
+
+async def _run_image_job(job: _ImageJob) -> None:
+    started = time.perf_counter()
+    try:
+        await _update_job_run(job.run_id, AgentRunUpdate(run_status="running"))
+        logger.info(
+            "ai_image_job_start run_id=%s project_id=%s agent_id=%s provider_pref=%s",
+            job.run_id,
+            job.req.project_id,
+            job.agent_id,
+            job.req.provider_preference,
+        )
+        attempts = _Attempts("ai_image_job", job.req.project_id, job.agent_id)
+        result = await _execute_image_async(job.req, attempts)
+        duration_ms = round((time.perf_counter() - started) * 1000)
+        if result is None:
+            await _update_job_run(
+                job.run_id,
+                AgentRunUpdate(
+                    run_status="failed",
+                    error_message=" | ".join(attempts.errors)[:1000],
+                    duration_ms=duration_ms,
                 ),
             )
-            return AiImageGenerateResponse(
-                run_id=run.agent_run_id,
+            logger.error(
+                "ai_image_job_failed run_id=%s project_id=%s errors=%s",
+                job.run_id,
+                job.req.project_id,
+                attempts.errors,
+            )
+            return
+        result = await run_in_threadpool(
+            _in_new_session, _store_image, result, job.req.project_id, False
+        )
+        project_spend.record(job.req.project_id, result.get("cost_usd"))
+        await _update_job_run(
+            job.run_id,
+            AgentRunUpdate(
+                run_status="success",
                 provider=result["provider"],
                 model_name=result["model_name"],
-                mime_type=result.get("mime_type"),
-                image_base64=result.get("image_base64"),
-                image_url=result.get("image_url"),
+                output_payload=_image_output_payload(result),
                 cost_usd=result.get("cost_usd"),
+                duration_ms=duration_ms,
+            ),
+        )
+        logger.info(
+            "ai_image_job_done run_id=%s provider=%s duration_ms=%s",
+            job.run_id,
+            result["provider"],
+            duration_ms,
+        )
+    except asyncio.CancelledError:
+        with anyio.CancelScope(shield=True):
+            await _update_job_run(
+                job.run_id,
+                AgentRunUpdate(
+                    run_status="cancelled",
+                    error_message="Server shut down while the job was running",
+                ),
             )
-        except Exception as exc:
-            logger.exception(
-                "ai_image_provider_error provider=%s project_id=%s agent_id=%s error=%s",
-                provider,
-                req.project_id,
-                agent_id,
-                str(exc),
-            )
-            errors.append(f"{provider}: {exc}")
+        raise
+    except Exception:
+        await _update_job_run(
+            job.run_id,
+            AgentRunUpdate(run_status="failed", error_message="Internal error while running job"),
+        )
+        raise
+    finally:
+        event = _image_job_events.pop(job.run_id, None)
+        if event is not None:
+            event.set()
 
-    failed_run = create_agent_run(
-        db=db,
-        payload=AgentRunCreate(
+
+async def _drop_image_job(job: _ImageJob) -> None:
+    await _update_job_run(
+        job.run_id,
+        AgentRunUpdate(
+            run_status="cancelled",
+            error_message="Server shut down before the job started",
+        ),
+    )
+    event = _image_job_events.pop(job.run_id, None)
+    if event is not None:
+        event.set()
+
+
+image_jobs: JobQueue[_ImageJob] = JobQueue(
+    "ai_image_jobs",
+    handler=_run_image_job,
+    workers=settings.ai_image_job_workers,
+    max_size=settings.ai_image_job_queue_size,
+    on_drop=_drop_image_job,
+)
+
+
+def _image_job_out(run: AgentRunOut) -> AiImageJobOut:
+    result = None
+    if run.run_status == "success" and run.provider and run.model_name:
+        output = run.output_payload or {}
+        sha256 = output.get("image_sha256")
+        result = AiImageGenerateResponse(
+            run_id=run.agent_run_id,
+            provider=run.provider,
+            model_name=run.model_name,
+            mime_type=output.get("mime_type"),
+            image_url=blob_url(sha256, run.project_id) if sha256 else output.get("image_url"),
+            image_sha256=output.get("image_sha256"),
+            cost_usd=run.cost_usd,
+        )
+    return AiImageJobOut(
+        run_id=run.agent_run_id,
+        project_id=run.project_id,
+        run_status=run.run_status,
+        provider=run.provider,
+        model_name=run.model_name,
+        error_message=run.error_message,
+        cost_usd=run.cost_usd,
+        created_at=run.created_at,
+        started_at=run.started_at,
+        finished_at=run.finished_at,
+        duration_ms=run.duration_ms,
+        result=result,
+    )
+
+
+async def submit_image_job_async(
+    db: Session,
+    user: User,
+    req: AiImageGenerateRequest,
+) -> AiImageJobOut:
+    """Queue an image generation and return its `queued` run right away."""
+    if not image_jobs.has_capacity():
+        raise service_unavailable("Image job queue is full. Retry later.")
+    _providers_order(req.provider_preference, "image", req.model_name)
+    agent_id = await run_in_threadpool(_admit_project_run, db, req.project_id, req.agent_id)
+    run = await run_in_threadpool(
+        create_agent_run,
+        db,
+        AgentRunCreate(
             project_id=req.project_id,
             agent_id=agent_id,
             stage_id=req.stage_id,
-            provider=None,
             model_name=req.model_name,
-            run_status="failed",
+            run_status="queued",
             trigger_source="api",
-            input_payload={"prompt": req.prompt, "size": req.size},
-            error_message=" | ".join(errors)[:1000],
+            input_payload={"prompt": req.prompt, "size": req.size, "mode": "async"},
             created_by_user_id=int(user.id),
         ),
     )
-    logger.error(
-        "ai_image_all_providers_failed project_id=%s agent_id=%s run_id=%s errors=%s",
+    _image_job_events[run.agent_run_id] = asyncio.Event()
+    if not image_jobs.submit(_ImageJob(run.agent_run_id, agent_id, req)):
+        _image_job_events.pop(run.agent_run_id, None)
+        await run_in_threadpool(
+            update_agent_run,
+            db,
+            run.agent_run_id,
+            AgentRunUpdate(run_status="failed", error_message="Image job queue is full"),
+        )
+        raise service_unavailable("Image job queue is full. Retry later.")
+    logger.info(
+        "ai_image_job_queued run_id=%s user_id=%s project_id=%s agent_id=%s",
+        run.agent_run_id,
+        int(user.id),
         req.project_id,
         agent_id,
-        failed_run.agent_run_id,
-        errors,
     )
-    raise bad_request(f"All providers failed. run_id={failed_run.agent_run_id}. errors={errors}")
+    return _image_job_out(run)
+
+
+def get_image_job_run(db: Session, run_id: int) -> AgentRunOut:
+    run = get_agent_run(db, run_id)
+    if run is None or (run.input_payload or {}).get("mode") != "async":
+        raise not_found("Image job not found")
+    return run
+
+
+async def wait_image_job_async(
+    run: AgentRunOut,
+    wait_seconds: float = 0,
+) -> AiImageJobOut:
+    """Return the job state, long-polling up to `wait_seconds` while it is pending."""
+    deadline = time.monotonic() + min(wait_seconds, settings.ai_image_job_max_wait_seconds)
+    while run.run_status in PENDING_JOB_STATUS:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        event = _image_job_events.get(run.agent_run_id)
+        if event is not None:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(event.wait(), remaining)
+        else:
+            # Job owned by another process: fall back to polling the run row.
+            await asyncio.sleep(min(remaining, 1.0))
+        # Fresh session: the request transaction would keep returning its first snapshot.
+        run = await run_in_threadpool(_in_new_session, get_agent_run, run.agent_run_id) or run
+    return _image_job_out(run)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import math
+import re
+from collections.abc import Sequence
+from functools import lru_cache
+
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Roughly how BPE tokenizers pre-split text: letter runs, short digit groups,
+# whitespace runs and punctuation runs each become one or more tokens.
+_PIECE_RE = re.compile(r"[^\W\d_]+|\d{1,3}|\s+|[^\w\s]+|_+")
+
+# Fixed framing tokens per chat message and per request (role markers, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+REQUEST_OVERHEAD_TOKENS = 3
+
+# Longest-prefix match of model name -> context window (input + output tokens).
+_CONTEXT_WINDOWS = {
+    "gpt-5": 400_000,
+    "gpt-4.1": 1_047_576,
+    "gpt-4o": 128_000,
+    "o3": 200_000,
+    "o4": 200_000,
+    "gemini": 1_048_576,
+}
+
+
+def _piece_tokens(piece: str) -> int:
+    if piece.isspace():
+        # A single space is merged into the following word by BPE vocabularies.
+        return 0 if piece == " " else max(1, piece.count("\n") + len(piece.strip("\n")) // 4)
+    if piece[0].isdigit():
+        return 1
+    if piece[0].isalpha():
+        if piece.isascii():
+            return max(1, (len(piece) + 3) // 5)
+        return max(1, math.ceil(len(piece.encode("utf-8")) / 3))
+    return len(piece)
+
+
+@lru_cache(maxsize=512)
+def count_tokens(text: str) -> int:
+    """Offline token estimate for `text`; tends to over-count slightly, never calls out.
+
+    Results are memoized, so repeated system prompts and templates are counted once.
+    """
+    return sum(_piece_tokens(piece) for piece in _PIECE_RE.findall(text))
+
+
+def estimate_input_tokens(
+    prompt: str,
+    system_prompt: str | None = None,
+    history: Sequence[str] = (),
+) -> int:
+    """Input tokens for a chat request; `history` holds the contents of earlier turns."""
+    tokens = REQUEST_OVERHEAD_TOKENS + MESSAGE_OVERHEAD_TOKENS + count_tokens(prompt)
+    if system_prompt:
+        tokens += MESSAGE_OVERHEAD_TOKENS + count_tokens(system_prompt)
+    for content in history:
+        tokens += MESSAGE_OVERHEAD_TOKENS + count_tokens(content)
+    return tokens
+
+
+def parse_context_window_overrides(raw: str) -> dict[str, int]:
+    """Parse `model=tokens` entries separated by commas."""
+    overrides: dict[str, int] = {}
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            model, tokens = item.split("=", 1)
+            overrides[model.strip()] = int(tokens)
+        except ValueError:
+            logger.warning("ai_context_window_override_invalid entry=%s", item)
+    return overrides
+
+
+@lru_cache(maxsize=1)
+def _context_window_overrides() -> dict[str, int]:
+    return parse_context_window_overrides(settings.ai_context_window_overrides)
+
+
+def context_window(model: str) -> int:
+    overrides = _context_window_overrides()
+    if model in overrides:
+        return overrides[model]
+    prefixes = [prefix for prefix in _CONTEXT_WINDOWS if model.startswith(prefix)]
+    if prefixes:
+        return _CONTEXT_WINDOWS[max(prefixes, key=len)]
+    return settings.ai_default_context_window_tokens
+
+
+def output_budget(model: str, input_tokens: int) -> int:
+    """Output tokens left in the model's context window after a safety margin on input."""
+    reserved = math.ceil(input_tokens * settings.ai_token_estimate_margin)
+    return context_window(model) - reserved
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 
 from src.core.config import settings
 from src.core.errors import forbidden, not_found
+from src.core.memberships import get_user_membership_version
 from src.core.security import User, create_access_token
 from src.modules.auth.schemas import (
     AuthLoginRequest,
@@ -50,18 +51,26 @@ def issue_dev_token(db: Session, payload: AuthTokenRequest) -> AuthTokenResponse
     )
 
 
-def _resolve_user_roles(db: Session, user_id: int) -> list[str]:
+def _load_project_roles(db: Session, user_id: int) -> dict[int, str]:
     rows = db.execute(
         text(
             """
-            SELECT DISTINCT member_role
+            SELECT project_id, member_role
             FROM project_members
             WHERE user_id = :user_id
             """
         ),
         {"user_id": user_id},
     ).mappings()
-    roles = sorted([str(r["member_role"]) for r in rows if r.get("member_role") in ALLOWED_ROLES])
+    return {
+        int(r["project_id"]): str(r["member_role"])
+        for r in rows
+        if r.get("member_role") in ALLOWED_ROLES
+    }
+
+
+def _resolve_user_roles(project_roles: dict[int, str]) -> list[str]:
+    roles = sorted(set(project_roles.values()))
     if roles:
         return roles
     return ["viewer"]
@@ -83,11 +92,22 @@ def issue_login_token(db: Session, payload: AuthLoginRequest) -> AuthTokenRespon
     if not row:
         raise not_found("User email not found")
 
-    roles = _resolve_user_roles(db=db, user_id=int(row["user_id"]))
+    user_id = int(row["user_id"])
+    # Read the version first: a change committed between the two reads leaves the
+    # token's claims at the older version, so they are ignored rather than trusted.
+    membership_version = (
+        get_user_membership_version(db, user_id)
+        if settings.auth_project_claims_enabled
+        else None
+    )
+    project_roles = _load_project_roles(db=db, user_id=user_id)
+    claims_fit = len(project_roles) <= settings.auth_project_claims_max_projects
     token = create_access_token(
-        user_id=int(row["user_id"]),
+        user_id=user_id,
         email=str(row["email"]),
-        roles=roles,
+        roles=_resolve_user_roles(project_roles),
+        project_roles=project_roles if membership_version is not None and claims_fit else None,
+        membership_version=membership_version if claims_fit else None,
     )
     return AuthTokenResponse(
         access_token=token,
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from src.core.cache import TTLCache
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.modules.ai_providers.schemas import AiTextTurn
+from src.modules.ai_providers.tokens import MESSAGE_OVERHEAD_TOKENS, count_tokens
+
+logger = get_logger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "Resume la conversacion entre un usuario y un asistente para que el asistente pueda "
+    "continuarla sin el historial completo. Conserva datos, cifras, decisiones, preferencias "
+    "del usuario y preguntas pendientes. Escribe en tercera persona, sin introducciones, en el "
+    "idioma de la conversacion."
+)
+SUMMARY_HEADER = "Resumen de la conversacion anterior:"
+_ROLE_LABELS = {"user": "Usuario", "assistant": "Asistente"}
+
+# (previous summary or None, transcript chunk) -> extended summary, or None if it failed.
+Summarizer = Callable[[str | None, str], Awaitable[str | None]]
+
+
+@dataclass(frozen=True)
+class ConversationSummary:
+    text: str
+    through_message_id: int
+
+
+@dataclass
+class ConversationContext:
+    history: list[AiTextTurn]
+    summary: str | None = None
+
+
+_summaries: TTLCache[int, ConversationSummary] = TTLCache(
+    max_entries=settings.ai_conversation_summary_cache_max_entries,
+    ttl_seconds=settings.ai_conversation_summary_cache_ttl_seconds,
+)
+
+
+def _turn_tokens(turn: dict) -> int:
+    return MESSAGE_OVERHEAD_TOKENS + count_tokens(turn["content"])
+
+
+def split_history(turns: list[dict], budget_tokens: int) -> tuple[list[dict], list[dict]]:
+    """Split turns into (older, recent) where `recent` is the longest suffix within budget."""
+    used = 0
+    start = len(turns)
+    for index in range(len(turns) - 1, -1, -1):
+        used += _turn_tokens(turns[index])
+        if used > budget_tokens:
+            break
+        start = index
+    return turns[:start], turns[start:]
+
+
+def transcript_chunks(turns: list[dict], max_chars: int) -> list[tuple[str, int]]:
+    """Render turns as `Rol: contenido` lines, grouped into chunks of at most `max_chars`.
+
+    Each chunk comes with the last message_id it covers.
+    """
+    chunks: list[tuple[str, int]] = []
+    lines: list[str] = []
+    size = 0
+    last_message_id = 0
+    for turn in turns:
+        line = f"{_ROLE_LABELS[turn['role']]}: {turn['content']}"[:max_chars]
+        if lines and size + len(line) > max_chars:
+            chunks.append(("\n".join(lines), last_message_id))
+            lines, size = [], 0
+        lines.append(line)
+        size += len(line) + 1
+        last_message_id = int(turn["message_id"])
+    if lines:
+        chunks.append(("\n".join(lines), last_message_id))
+    return chunks
+
+
+async def _extend_summary(
+    conversation_id: int,
+    older: list[dict],
+    summarize: Summarizer,
+) -> ConversationSummary | None:
+    """Bring the cached summary up to the last older turn, summarizing only new turns."""
+    summary = _summaries.get(conversation_id)
+    through_message_id = int(older[-1]["message_id"])
+    if summary is not None and summary.through_message_id >= through_message_id:
+        return summary
+
+    covered = summary.through_message_id if summary is not None else 0
+    pending = [turn for turn in older if int(turn["message_id"]) > covered]
+    chunks = transcript_chunks(pending, settings.ai_text_input_char_limit)
+    for transcript, last_message_id in chunks:
+        text_value = await summarize(summary.text if summary else None, transcript)
+        if not text_value:
+            logger.warning(
+                "ia_conversation_summary_incomplete conversation_id=%s through=%s target=%s",
+                conversation_id,
+                summary.through_message_id if summary else None,
+                through_message_id,
+            )
+            break
+        summary = ConversationSummary(text=text_value, through_message_id=last_message_id)
+        _summaries.set(conversation_id, summary)
+    logger.info(
+        "ia_conversation_summary conversation_id=%s pending_turns=%s through_message_id=%s",
+        conversation_id,
+        len(pending),
+        summary.through_message_id if summary else None,
+    )
+    return summary
+
+
+async def build_context(
+    conversation_id: int,
+    messages: list[dict],
+    summarize: Summarizer,
+) -> ConversationContext:
+    """Fit a conversation's user/assistant turns into the history token budget.
+
+    Recent turns are kept verbatim; when they do not all fit, older turns are replaced
+    by a rolling summary that is cached per conversation and extended incrementally.
+    """
+    turns = [m for m in messages if m["role"] in _ROLE_LABELS and m["content"]]
+    budget = settings.ai_conversation_history_tokens
+    older, recent = split_history(turns, budget)
+    summary = None
+    if older:
+        older, recent = split_history(turns, budget - settings.ai_conversation_summary_max_tokens)
+        summary = await _extend_summary(conversation_id, older, summarize)
+        if summary is not None:
+            recent = [t for t in recent if int(t["message_id"]) > summary.through_message_id]
+    return ConversationContext(
+        history=[AiTextTurn(role=t["role"], content=t["content"]) for t in recent],
+        summary=summary.text if summary is not None else None,
+    )
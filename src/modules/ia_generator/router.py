@@ -3,10 +3,14 @@ from sqlalchemy.orm import Session
 
 from src.core.project_authz import PROJECT_ALL_ROLES, require_project_role
 from src.core.security import User
+from src.modules.ai_providers.deadline import Deadline
+from src.modules.ai_providers.dependencies import deadline_budget
 from src.modules.ia_generator.dependencies import db_session
 from src.modules.ia_generator.schemas import (
     IaConversationCreate,
     IaConversationDetailOut,
+    IaConversationGenerateOut,
+    IaConversationGenerateRequest,
     IaConversationOut,
     IaMessageCreate,
     IaMessageOut,
@@ -17,6 +21,7 @@ from src.modules.ia_generator.schemas import (
 from src.modules.ia_generator.service import (
     create_conversation,
     create_message_for_conversation,
+    generate_conversation_reply_async,
     get_conversation_detail_for_user,
     list_text_specialties,
     list_conversations_for_user,
@@ -91,6 +96,27 @@ def post_conversation_message(
     )
 
 
+@router.post(
+    "/conversations/{conversation_id}/generate",
+    response_model=IaConversationGenerateOut,
+    status_code=201,
+)
+async def post_conversation_generate(
+    conversation_id: int,
+    payload: IaConversationGenerateRequest,
+    user: User = Depends(current_user),
+    db: Session = Depends(db_session),
+    deadline: Deadline | None = Depends(deadline_budget),
+) -> IaConversationGenerateOut:
+    return await generate_conversation_reply_async(
+        db=db,
+        conversation_id=conversation_id,
+        payload=payload,
+        user=user,
+        deadline=deadline,
+    )
+
+
 @router.post("/messages/{message_id}/save", response_model=IaSavedOutputOut, status_code=201)
 def post_save_message(
     message_id: int,
@@ -47,6 +47,24 @@ class IaConversationDetailOut(BaseModel):
     messages: list[IaMessageOut]
 
 
+class IaConversationGenerateRequest(BaseModel):
+    content: str = Field(min_length=1, max_length=40000)
+    system_prompt: str | None = None
+    stage_id: int | None = None
+    provider_preference: str = "auto"
+    model_name: str | None = None
+    temperature: float | None = Field(default=None, ge=0, le=2)
+    max_output_tokens: int | None = Field(default=None, ge=1, le=16384)
+
+
+class IaConversationGenerateOut(BaseModel):
+    run_id: int
+    user_message: IaMessageOut
+    assistant_message: IaMessageOut
+    token_input_count: int | None = None
+    token_output_count: int | None = None
+
+
 class IaSaveMessageRequest(BaseModel):
     label: str = Field(min_length=2, max_length=180)
     notes: str | None = Field(default=None, max_length=1000)
@@ -73,6 +91,7 @@ class IaTextSpecialtyOut(BaseModel):
     name: str
     description: str
     system_prompt_template: str
+    system_prompt_tokens: int | None = None
     recommended_provider: str
     recommended_model: str | None = None
     tags: list[str]
@@ -1,17 +1,40 @@
-from sqlalchemy import text
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, text
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from src.core.config import settings
 from src.core.errors import bad_request, conflict, forbidden, not_found
+from src.core.memberships import memberships
+from src.core.project_authz import PROJECT_RW_ROLES
+from src.core.security import User
+from src.core.writes import db_now, insert_row, update_row
+from src.modules.agent_runs.service import insert_agent_run
+from src.modules.agent_runs.writer import record_agent_run
+from src.modules.ai_providers.deadline import Deadline
+from src.modules.ai_providers.schemas import AiTextGenerateRequest
+from src.modules.ai_providers.service import TextCompletion, complete_text_async, text_failure
+from src.modules.ai_providers.tokens import count_tokens
+from src.modules.ia_generator.context import (
+    SUMMARY_HEADER,
+    SUMMARY_SYSTEM_PROMPT,
+    ConversationContext,
+    build_context,
+)
 from src.modules.ia_generator.schemas import (
     IaConversationCreate,
     IaConversationDetailOut,
+    IaConversationGenerateOut,
+    IaConversationGenerateRequest,
     IaConversationOut,
     IaMessageCreate,
     IaMessageOut,
     IaSavedOutputOut,
     IaTextSpecialtyOut,
 )
+from src.modules.project_budgets.spend import project_spend
 
 ALLOWED_MESSAGE_ROLES = {"system", "user", "assistant"}
 
@@ -88,10 +111,20 @@ def _map_saved_output(row: dict) -> IaSavedOutputOut:
 
 
 def list_text_specialties() -> list[IaTextSpecialtyOut]:
-    return TEXT_SPECIALTIES
+    return [
+        specialty.model_copy(
+            update={"system_prompt_tokens": count_tokens(specialty.system_prompt_template)}
+        )
+        for specialty in TEXT_SPECIALTIES
+    ]
 
 
-def _ensure_conversation_access(db: Session, conversation_id: int, user_id: int) -> IaConversationOut:
+def _ensure_conversation_access(
+    db: Session,
+    conversation_id: int,
+    user_id: int,
+    allowed_roles: set[str] | None = None,
+) -> IaConversationOut:
     row = (
         db.execute(
             text(
@@ -104,7 +137,8 @@ def _ensure_conversation_access(db: Session, conversation_id: int, user_id: int)
                   c.status,
                   c.created_by_user_id,
                   c.created_at,
-                  c.updated_at
+                  c.updated_at,
+                  pm.member_role
                 FROM ia_conversations c
                 JOIN project_members pm ON pm.project_id = c.project_id
                 WHERE c.conversation_id = :conversation_id
@@ -117,7 +151,11 @@ def _ensure_conversation_access(db: Session, conversation_id: int, user_id: int)
         .first()
     )
     if row:
-        return _map_conversation(dict(row))
+        conversation = dict(row)
+        member_role = conversation.pop("member_role")
+        if allowed_roles is not None and member_role not in allowed_roles:
+            raise forbidden(f"Member role '{member_role}' not allowed for this action")
+        return _map_conversation(conversation)
 
     exists = db.execute(
         text("SELECT 1 FROM ia_conversations WHERE conversation_id = :conversation_id"),
@@ -129,30 +167,28 @@ def _ensure_conversation_access(db: Session, conversation_id: int, user_id: int)
 
 
 def create_conversation(db: Session, payload: IaConversationCreate, user_id: int) -> IaConversationOut:
+    now = db_now()
     try:
-        result = db.execute(
-            text(
-                """
-                INSERT INTO ia_conversations (
-                  project_id, agent_id, title, status, created_by_user_id
-                ) VALUES (
-                  :project_id, :agent_id, :title, 'draft', :created_by_user_id
-                )
-                """
-            ),
+        conversation = insert_row(
+            db,
+            "ia_conversations",
             {
                 "project_id": payload.project_id,
                 "agent_id": payload.agent_id,
                 "title": payload.title,
+                "status": "draft",
                 "created_by_user_id": user_id,
+                "created_at": now,
+                "updated_at": now,
             },
+            id_column="conversation_id",
         )
         db.commit()
     except IntegrityError as exc:
         db.rollback()
         raise conflict("Invalid project_id/agent_id/created_by_user_id") from exc
 
-    return _ensure_conversation_access(db, int(result.lastrowid), user_id)
+    return _map_conversation(conversation)
 
 
 def list_conversations_for_user(
@@ -163,6 +199,9 @@ def list_conversations_for_user(
     project_id: int | None = None,
     agent_id: int | None = None,
 ) -> list[IaConversationOut]:
+    project_ids = list(memberships.projects_for_user(db, user_id))
+    if not project_ids:
+        return []
     rows = (
         db.execute(
             text(
@@ -177,16 +216,15 @@ def list_conversations_for_user(
                   c.created_at,
                   c.updated_at
                 FROM ia_conversations c
-                JOIN project_members pm ON pm.project_id = c.project_id
-                WHERE pm.user_id = :user_id
+                WHERE c.project_id IN :project_ids
                   AND (:project_id IS NULL OR c.project_id = :project_id)
                   AND (:agent_id IS NULL OR c.agent_id = :agent_id)
                 ORDER BY c.updated_at DESC, c.conversation_id DESC
                 LIMIT :limit OFFSET :offset
                 """
-            ),
+            ).bindparams(bindparam("project_ids", expanding=True)),
             {
-                "user_id": user_id,
+                "project_ids": project_ids,
                 "project_id": project_id,
                 "agent_id": agent_id,
                 "limit": limit,
@@ -242,70 +280,203 @@ def create_message_for_conversation(
     if payload.role not in ALLOWED_MESSAGE_ROLES:
         raise bad_request(f"role must be one of: {sorted(ALLOWED_MESSAGE_ROLES)}")
 
+    now = db_now()
     try:
-        result = db.execute(
-            text(
-                """
-                INSERT INTO ia_messages (
-                  conversation_id, role, content, provider, model_name, run_id, cost_usd
-                ) VALUES (
-                  :conversation_id, :role, :content, :provider, :model_name, :run_id, :cost_usd
-                )
-                """
-            ),
-            {
-                "conversation_id": conversation_id,
-                "role": payload.role,
-                "content": payload.content,
-                "provider": payload.provider,
-                "model_name": payload.model_name,
-                "run_id": payload.run_id,
-                "cost_usd": payload.cost_usd,
-            },
-        )
-
-        db.execute(
-            text(
-                """
-                UPDATE ia_conversations
-                SET updated_at = CURRENT_TIMESTAMP
-                WHERE conversation_id = :conversation_id
-                """
-            ),
-            {"conversation_id": conversation_id},
-        )
+        message = _insert_message(db, conversation_id, payload.model_dump(), now)
+        _touch_conversation(db, conversation_id, now)
         db.commit()
     except IntegrityError as exc:
         db.rollback()
         raise conflict("Invalid conversation_id/run_id for message") from exc
+    return message
 
-    row = (
+
+def _insert_message(
+    db: Session,
+    conversation_id: int,
+    message: dict,
+    created_at: datetime,
+) -> IaMessageOut:
+    row = insert_row(
+        db,
+        "ia_messages",
+        {
+            "conversation_id": conversation_id,
+            "role": message["role"],
+            "content": message["content"],
+            "provider": message.get("provider"),
+            "model_name": message.get("model_name"),
+            "run_id": message.get("run_id"),
+            "cost_usd": message.get("cost_usd"),
+            "is_saved": False,
+            "created_at": created_at,
+        },
+        id_column="message_id",
+    )
+    return _map_message(row)
+
+
+def _touch_conversation(db: Session, conversation_id: int, updated_at: datetime) -> None:
+    update_row(
+        db, "ia_conversations", {"conversation_id": conversation_id}, {"updated_at": updated_at}
+    )
+
+
+def _load_generation_context(
+    db: Session,
+    conversation_id: int,
+    user_id: int,
+) -> tuple[IaConversationOut, list[dict]]:
+    conv = _ensure_conversation_access(
+        db, conversation_id=conversation_id, user_id=user_id, allowed_roles=PROJECT_RW_ROLES
+    )
+    rows = (
         db.execute(
             text(
                 """
-                SELECT
-                  message_id,
-                  conversation_id,
-                  role,
-                  content,
-                  provider,
-                  model_name,
-                  run_id,
-                  cost_usd,
-                  is_saved,
-                  created_at
+                SELECT message_id, role, content
                 FROM ia_messages
-                WHERE message_id = :message_id
+                WHERE conversation_id = :conversation_id
+                ORDER BY message_id
                 """
             ),
-            {"message_id": int(result.lastrowid)},
+            {"conversation_id": conversation_id},
         )
         .mappings()
-        .first()
+        .all()
+    )
+    return conv, [dict(r) for r in rows]
+
+
+def _conversation_text_request(
+    conv: IaConversationOut,
+    payload: IaConversationGenerateRequest,
+    messages: list[dict],
+    context: ConversationContext,
+) -> AiTextGenerateRequest:
+    """Stored system messages, the request's system prompt and the history summary form
+    the system prompt; `context.history` carries the recent turns verbatim.
+    """
+    system_parts = [m["content"] for m in messages if m["role"] == "system"]
+    if payload.system_prompt:
+        system_parts.append(payload.system_prompt)
+    if context.summary:
+        system_parts.append(f"{SUMMARY_HEADER}\n{context.summary}")
+    return AiTextGenerateRequest(
+        project_id=conv.project_id,
+        agent_id=conv.agent_id,
+        prompt=payload.content,
+        system_prompt="\n\n".join(system_parts) or None,
+        history=context.history,
+        stage_id=payload.stage_id,
+        provider_preference=payload.provider_preference,
+        model_name=payload.model_name,
+        temperature=payload.temperature,
+        max_output_tokens=payload.max_output_tokens,
+        use_cache=False,
     )
-    if not row:
-        raise bad_request("Message insert failed")
-    return _map_message(dict(row))
+
+
+async def _summarize_history(
+    db: Session,
+    user: User,
+    conv: IaConversationOut,
+    deadline: Deadline | None,
+    previous: str | None,
+    transcript: str,
+) -> str | None:
+    """Extend `previous` with `transcript`; the call is recorded as its own agent_run."""
+    system_prompt = SUMMARY_SYSTEM_PROMPT
+    if previous:
+        system_prompt = f"{system_prompt}\n\n{SUMMARY_HEADER}\n{previous}"
+    req = AiTextGenerateRequest(
+        project_id=conv.project_id,
+        agent_id=conv.agent_id,
+        prompt=transcript,
+        system_prompt=system_prompt,
+        max_output_tokens=settings.ai_conversation_summary_max_tokens,
+        use_cache=False,
+    )
+    completion = await complete_text_async(db, user, req, deadline)
+    input_payload = {
+        **(completion.run.input_payload or {}),
+        "conversation_id": conv.conversation_id,
+        "purpose": "conversation_summary",
+    }
+    run = completion.run.model_copy(update={"input_payload": input_payload})
+    await run_in_threadpool(record_agent_run, db, run)
+    if completion.result is None:
+        return None
+    return completion.result["text"] or None
+
+
+def _persist_generation(
+    db: Session,
+    conv: IaConversationOut,
+    content: str,
+    completion: TextCompletion,
+) -> IaConversationGenerateOut:
+    """Store the agent_run, both messages and the conversation bump in one transaction."""
+    result = completion.result
+    if result is None:
+        failed_run_id = record_agent_run(db, completion.run)
+        raise text_failure(failed_run_id, completion.attempts)
+
+    now = db_now()
+    try:
+        run_id = insert_agent_run(db, completion.run, now)
+        user_message = _insert_message(
+            db, conv.conversation_id, {"role": "user", "content": content}, now
+        )
+        assistant_message = _insert_message(
+            db,
+            conv.conversation_id,
+            {
+                "role": "assistant",
+                "content": result["text"],
+                "provider": result["provider"],
+                "model_name": result["model_name"],
+                "run_id": run_id,
+                "cost_usd": result.get("cost_usd"),
+            },
+            now,
+        )
+        _touch_conversation(db, conv.conversation_id, now)
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        raise conflict("Invalid conversation_id/agent_id for generation") from exc
+
+    project_spend.record(conv.project_id, completion.run.cost_usd)
+    return IaConversationGenerateOut(
+        run_id=run_id,
+        user_message=user_message,
+        assistant_message=assistant_message,
+        token_input_count=result.get("token_input_count"),
+        token_output_count=result.get("token_output_count"),
+    )
+
+
+async def generate_conversation_reply_async(
+    db: Session,
+    conversation_id: int,
+    payload: IaConversationGenerateRequest,
+    user: User,
+    deadline: Deadline | None = None,
+) -> IaConversationGenerateOut:
+    """Generate the next assistant turn from the stored history and persist the exchange."""
+    conv, messages = await run_in_threadpool(
+        _load_generation_context, db, conversation_id, int(user.id)
+    )
+
+    async def summarize(previous: str | None, transcript: str) -> str | None:
+        return await _summarize_history(db, user, conv, deadline, previous, transcript)
+
+    context = await build_context(conv.conversation_id, messages, summarize)
+    completion = await complete_text_async(
+        db, user, _conversation_text_request(conv, payload, messages, context), deadline
+    )
+    return await run_in_threadpool(_persist_generation, db, conv, payload.content, completion)
 
 
 def save_message_output(
@@ -323,7 +494,12 @@ def save_message_output(
                   m.message_id,
                   m.conversation_id,
                   m.role,
-                  c.project_id
+                  m.run_id,
+                  m.provider,
+                  m.model_name,
+                  m.content,
+                  c.project_id,
+                  c.agent_id
                 FROM ia_messages m
                 JOIN ia_conversations c ON c.conversation_id = m.conversation_id
                 JOIN project_members pm ON pm.project_id = c.project_id
@@ -348,71 +524,41 @@ def save_message_output(
     if str(row["role"]) != "assistant":
         raise bad_request("Only assistant messages can be saved")
 
+    conversation_id = int(row["conversation_id"])
     try:
-        result = db.execute(
-            text(
-                """
-                INSERT INTO ia_saved_outputs (
-                  conversation_id, message_id, label, notes, created_by_user_id
-                ) VALUES (
-                  :conversation_id, :message_id, :label, :notes, :created_by_user_id
-                )
-                """
-            ),
+        saved = insert_row(
+            db,
+            "ia_saved_outputs",
             {
-                "conversation_id": int(row["conversation_id"]),
+                "conversation_id": conversation_id,
                 "message_id": message_id,
                 "label": label,
                 "notes": notes,
                 "created_by_user_id": user_id,
+                "created_at": db_now(),
             },
+            id_column="saved_output_id",
         )
-
-        db.execute(
-            text("UPDATE ia_messages SET is_saved = 1 WHERE message_id = :message_id"),
-            {"message_id": message_id},
-        )
-        db.execute(
-            text("UPDATE ia_conversations SET status = 'saved' WHERE conversation_id = :conversation_id"),
-            {"conversation_id": int(row["conversation_id"])},
+        update_row(db, "ia_messages", {"message_id": message_id}, {"is_saved": True})
+        update_row(
+            db, "ia_conversations", {"conversation_id": conversation_id}, {"status": "saved"}
         )
         db.commit()
     except IntegrityError as exc:
         db.rollback()
         raise conflict("Could not save output (possible duplicate relation)") from exc
 
-    saved_row = (
-        db.execute(
-            text(
-                """
-                SELECT
-                  s.saved_output_id,
-                  s.conversation_id,
-                  s.message_id,
-                  s.label,
-                  s.notes,
-                  s.created_by_user_id,
-                  s.created_at,
-                  c.project_id,
-                  c.agent_id,
-                  m.run_id,
-                  m.provider,
-                  m.model_name,
-                  m.content
-                FROM ia_saved_outputs s
-                JOIN ia_conversations c ON c.conversation_id = s.conversation_id
-                JOIN ia_messages m ON m.message_id = s.message_id
-                WHERE s.saved_output_id = :saved_output_id
-                """
-            ),
-            {"saved_output_id": int(result.lastrowid)},
-        )
-        .mappings()
-        .first()
+    return _map_saved_output(
+        {
+            **saved,
+            "project_id": row["project_id"],
+            "agent_id": row["agent_id"],
+            "run_id": row["run_id"],
+            "provider": row["provider"],
+            "model_name": row["model_name"],
+            "content": row["content"],
+        }
     )
-    if not saved_row:
-        raise bad_request("Saved output insert failed")
-    return _map_saved_output(dict(saved_row))
 
 
 def list_saved_outputs_for_user(
@@ -423,6 +569,9 @@ def list_saved_outputs_for_user(
     project_id: int | None = None,
     agent_id: int | None = None,
 ) -> list[IaSavedOutputOut]:
+    project_ids = list(memberships.projects_for_user(db, user_id))
+    if not project_ids:
+        return []
     rows = (
         db.execute(
             text(
@@ -444,16 +593,15 @@ def list_saved_outputs_for_user(
                 FROM ia_saved_outputs s
                 JOIN ia_conversations c ON c.conversation_id = s.conversation_id
                 JOIN ia_messages m ON m.message_id = s.message_id
-                JOIN project_members pm ON pm.project_id = c.project_id
-                WHERE pm.user_id = :user_id
+                WHERE c.project_id IN :project_ids
                   AND (:project_id IS NULL OR c.project_id = :project_id)
                   AND (:agent_id IS NULL OR c.agent_id = :agent_id)
                 ORDER BY s.saved_output_id DESC
                 LIMIT :limit OFFSET :offset
                 """
-            ),
+            ).bindparams(bindparam("project_ids", expanding=True)),
             {
-                "user_id": user_id,
+                "project_ids": project_ids,
                 "project_id": project_id,
                 "agent_id": agent_id,
                 "limit": limit,
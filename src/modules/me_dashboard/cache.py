@@ -0,0 +1,106 @@
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.core.cache import TTLCache
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.modules.me_dashboard.schemas import MeDashboardOut
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class _Entry:
+    fresh_until: float
+    dashboard: MeDashboardOut
+
+
+class DashboardCache:
+    """Per-user dashboards, fresh for `ttl_seconds` and servable stale for `stale_seconds`.
+
+    One request per user recomputes an expired dashboard; concurrent requests get the
+    stale copy, or wait up to `wait_seconds` for the recompute when there is none and
+    then compute their own. A recompute that fails with a stale copy at hand (for
+    example a query cut off by its time limit) serves that copy instead of the error.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        stale_seconds: float,
+        wait_seconds: float,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+        self._cache: TTLCache[int, _Entry] = TTLCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds + stale_seconds
+        )
+        self._lock = threading.Lock()
+        self._inflight: dict[int, threading.Event] = {}
+
+    def get(
+        self,
+        user_id: int,
+        load: Callable[[bool], MeDashboardOut],
+    ) -> MeDashboardOut:
+        """Cached dashboard for `user_id`; `load(has_stale)` computes a fresh one."""
+        if self.ttl_seconds <= 0:
+            return load(False)
+
+        entry = self._cache.get(user_id)
+        if entry is not None and time.monotonic() < entry.fresh_until:
+            return entry.dashboard
+
+        with self._lock:
+            flight = self._inflight.get(user_id)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[user_id] = threading.Event()
+
+        if not leader:
+            if entry is not None:
+                return entry.dashboard
+            if not flight.wait(self.wait_seconds):
+                logger.warning("me_dashboard_wait_timeout user_id=%s", user_id)
+                return load(False)
+            entry = self._cache.get(user_id)
+            # The leader failed: compute for this request alone.
+            return entry.dashboard if entry is not None else load(False)
+
+        try:
+            try:
+                dashboard = load(entry is not None)
+            except SQLAlchemyError as exc:
+                if entry is None:
+                    raise
+                logger.warning("me_dashboard_stale_served user_id=%s", user_id, exc_info=exc)
+                return entry.dashboard
+            self._cache.set(user_id, _Entry(time.monotonic() + self.ttl_seconds, dashboard))
+            return dashboard
+        finally:
+            with self._lock:
+                del self._inflight[user_id]
+            flight.set()
+
+    def invalidate(self, user_id: int | None = None) -> None:
+        """Drop one user's dashboard, or every dashboard when `user_id` is None."""
+        if user_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(user_id)
+
+    def stats(self) -> dict[str, int]:
+        return self._cache.stats()
+
+
+dashboards = DashboardCache(
+    max_entries=settings.me_dashboard_cache_max_entries,
+    ttl_seconds=settings.me_dashboard_cache_ttl_seconds,
+    stale_seconds=settings.me_dashboard_stale_seconds,
+    wait_seconds=settings.me_dashboard_refresh_timeout_ms / 1000,
+)
@@ -1,166 +1,117 @@
 from datetime import UTC, datetime
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from src.core.config import settings
+from src.core.memberships import memberships
 from src.core.security import User
+from src.modules.me_dashboard.cache import dashboards
 from src.modules.me_dashboard.schemas import (
     MeDashboardKpisOut,
     MeDashboardOut,
     MeDashboardProjectOut,
 )
 
+# Per-project counters for the user's projects in one statement; every derived table
+# is restricted to those projects, so agent_runs is scanned only through their rows.
+_PROJECT_KPIS_SQL = """
+    SELECT {hint}
+      p.project_id,
+      p.project_key,
+      p.project_name,
+      p.lifecycle_status,
+      p.updated_at,
+      COALESCE(bs.blocked_stages_count, 0) AS blocked_stages_count,
+      COALESCE(ar.failed_runs_count_7d, 0) AS failed_runs_count_7d,
+      COALESCE(ar.queued_runs_count, 0) AS queued_runs_count,
+      COALESCE(ar.cost_usd_total_30d, 0) AS cost_usd_total_30d,
+      COALESCE(pa.published_artifacts_count, 0) AS published_artifacts_count
+    FROM projects p
+    LEFT JOIN (
+      SELECT project_id, COUNT(*) AS blocked_stages_count
+      FROM project_stage_status
+      WHERE project_id IN :project_ids
+        AND stage_status = 'blocked'
+      GROUP BY project_id
+    ) bs ON bs.project_id = p.project_id
+    LEFT JOIN (
+      SELECT
+        project_id,
+        SUM(run_status = 'failed' AND created_at >= UTC_TIMESTAMP() - INTERVAL 7 DAY)
+          AS failed_runs_count_7d,
+        SUM(run_status = 'queued') AS queued_runs_count,
+        SUM(CASE WHEN created_at >= UTC_TIMESTAMP() - INTERVAL 30 DAY THEN cost_usd END)
+          AS cost_usd_total_30d
+      FROM agent_runs
+      WHERE project_id IN :project_ids
+        AND (run_status = 'queued' OR created_at >= UTC_TIMESTAMP() - INTERVAL 30 DAY)
+      GROUP BY project_id
+    ) ar ON ar.project_id = p.project_id
+    LEFT JOIN (
+      SELECT project_id, COUNT(*) AS published_artifacts_count
+      FROM project_artifacts
+      WHERE project_id IN :project_ids
+        AND artifact_status = 'published'
+      GROUP BY project_id
+    ) pa ON pa.project_id = p.project_id
+    WHERE p.project_id IN :project_ids
+"""
 
-def get_me_dashboard(db: Session, user: User, limit: int = 20) -> MeDashboardOut:
-    user_id = int(user.id)
-
-    projects_count = int(
-        db.execute(
-            text("SELECT COUNT(*) FROM project_members WHERE user_id = :user_id"),
-            {"user_id": user_id},
-        ).scalar_one()
-    )
-
-    blocked_stages_count = int(
-        db.execute(
-            text(
-                """
-                SELECT COUNT(*)
-                FROM project_stage_status pss
-                JOIN project_members pm ON pm.project_id = pss.project_id
-                WHERE pm.user_id = :user_id
-                  AND pss.stage_status = 'blocked'
-                """
-            ),
-            {"user_id": user_id},
-        ).scalar_one()
-    )
-
-    failed_runs_count_7d = int(
-        db.execute(
-            text(
-                """
-                SELECT COUNT(*)
-                FROM agent_runs ar
-                JOIN project_members pm ON pm.project_id = ar.project_id
-                WHERE pm.user_id = :user_id
-                  AND ar.run_status = 'failed'
-                  AND ar.created_at >= UTC_TIMESTAMP() - INTERVAL 7 DAY
-                """
-            ),
-            {"user_id": user_id},
-        ).scalar_one()
-    )
-
-    queued_runs_count = int(
-        db.execute(
-            text(
-                """
-                SELECT COUNT(*)
-                FROM agent_runs ar
-                JOIN project_members pm ON pm.project_id = ar.project_id
-                WHERE pm.user_id = :user_id
-                  AND ar.run_status = 'queued'
-                """
-            ),
-            {"user_id": user_id},
-        ).scalar_one()
-    )
-
-    published_artifacts_count = int(
-        db.execute(
-            text(
-                """
-                SELECT COUNT(*)
-                FROM project_artifacts pa
-                JOIN project_members pm ON pm.project_id = pa.project_id
-                WHERE pm.user_id = :user_id
-                  AND pa.artifact_status = 'published'
-                """
-            ),
-            {"user_id": user_id},
-        ).scalar_one()
-    )
 
-    cost_usd_total_30d = float(
-        db.execute(
-            text(
-                """
-                SELECT COALESCE(SUM(ar.cost_usd), 0)
-                FROM agent_runs ar
-                JOIN project_members pm ON pm.project_id = ar.project_id
-                WHERE pm.user_id = :user_id
-                  AND ar.created_at >= UTC_TIMESTAMP() - INTERVAL 30 DAY
-                """
-            ),
-            {"user_id": user_id},
-        ).scalar_one()
-    )
-
-    project_rows = (
-        db.execute(
-            text(
-                """
-                SELECT
-                  p.project_id,
-                  p.project_key,
-                  p.project_name,
-                  p.lifecycle_status,
-                  p.updated_at,
-                  pm.member_role,
-                  COALESCE(bs.blocked_stages_count, 0) AS blocked_stages_count,
-                  COALESCE(fr.failed_runs_count_7d, 0) AS failed_runs_count_7d,
-                  COALESCE(qr.queued_runs_count, 0) AS queued_runs_count,
-                  COALESCE(cst.cost_usd_total_30d, 0) AS cost_usd_total_30d
-                FROM projects p
-                JOIN project_members pm ON pm.project_id = p.project_id
-                LEFT JOIN (
-                  SELECT project_id, COUNT(*) AS blocked_stages_count
-                  FROM project_stage_status
-                  WHERE stage_status = 'blocked'
-                  GROUP BY project_id
-                ) bs ON bs.project_id = p.project_id
-                LEFT JOIN (
-                  SELECT project_id, COUNT(*) AS failed_runs_count_7d
-                  FROM agent_runs
-                  WHERE run_status = 'failed'
-                    AND created_at >= UTC_TIMESTAMP() - INTERVAL 7 DAY
-                  GROUP BY project_id
-                ) fr ON fr.project_id = p.project_id
-                LEFT JOIN (
-                  SELECT project_id, COUNT(*) AS queued_runs_count
-                  FROM agent_runs
-                  WHERE run_status = 'queued'
-                  GROUP BY project_id
-                ) qr ON qr.project_id = p.project_id
-                LEFT JOIN (
-                  SELECT project_id, COALESCE(SUM(cost_usd), 0) AS cost_usd_total_30d
-                  FROM agent_runs
-                  WHERE created_at >= UTC_TIMESTAMP() - INTERVAL 30 DAY
-                  GROUP BY project_id
-                ) cst ON cst.project_id = p.project_id
-                WHERE pm.user_id = :user_id
-                ORDER BY p.updated_at DESC, p.project_id DESC
-                LIMIT :limit
-                """
-            ),
-            {"user_id": user_id, "limit": limit},
+def _compute_dashboard(db: Session, user_id: int, max_execution_ms: int | None) -> MeDashboardOut:
+    project_roles = memberships.projects_for_user(db, user_id)
+    rows = []
+    if project_roles:
+        hint = f"/*+ MAX_EXECUTION_TIME({max_execution_ms}) */" if max_execution_ms else ""
+        rows = (
+            db.execute(
+                text(_PROJECT_KPIS_SQL.format(hint=hint)).bindparams(
+                    bindparam("project_ids", expanding=True)
+                ),
+                {"project_ids": list(project_roles)},
+            )
+            .mappings()
+            .all()
         )
-        .mappings()
-        .all()
-    )
 
-    projects = [MeDashboardProjectOut(**dict(row)) for row in project_rows]
+    projects = sorted(
+        (
+            MeDashboardProjectOut(**dict(row), member_role=project_roles[int(row["project_id"])])
+            for row in rows
+        ),
+        key=lambda p: (p.updated_at, p.project_id),
+        reverse=True,
+    )
     return MeDashboardOut(
         user_id=user_id,
         generated_at=datetime.now(UTC),
         kpis=MeDashboardKpisOut(
-            projects_count=projects_count,
-            blocked_stages_count=blocked_stages_count,
-            failed_runs_count_7d=failed_runs_count_7d,
-            queued_runs_count=queued_runs_count,
-            published_artifacts_count=published_artifacts_count,
-            cost_usd_total_30d=cost_usd_total_30d,
+            projects_count=len(project_roles),
+            blocked_stages_count=sum(p.blocked_stages_count for p in projects),
+            failed_runs_count_7d=sum(p.failed_runs_count_7d for p in projects),
+            queued_runs_count=sum(p.queued_runs_count for p in projects),
+            published_artifacts_count=sum(int(r["published_artifacts_count"]) for r in rows),
+            cost_usd_total_30d=round(sum(p.cost_usd_total_30d for p in projects), 6),
         ),
         projects=projects,
     )
+
+
+def get_me_dashboard(db: Session, user: User, limit: int = 20) -> MeDashboardOut:
+    user_id = int(user.id)
+
+    def load(has_stale: bool) -> MeDashboardOut:
+        # With a stale copy to fall back on, a slow database is cut off instead of waited on.
+        max_execution_ms = settings.me_dashboard_refresh_timeout_ms if has_stale else None
+        try:
+            return _compute_dashboard(db, user_id, max_execution_ms)
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+
+    dashboard = dashboards.get(user_id, load)
+    if len(dashboard.projects) <= limit:
+        return dashboard
+    return dashboard.model_copy(update={"projects": dashboard.projects[:limit]})
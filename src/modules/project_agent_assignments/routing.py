@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import threading
+
+from src.core.cache import TTLCache
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class DefaultAgentTable:
+    """In-process map of project_id -> default agent_id for generations without one.
+
+    Writes in this worker invalidate entries directly; the TTL bounds how long another
+    worker keeps a stale answer. `generation` guards against a lookup that read the
+    database before an invalidation and stores its result after it.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self._cache: TTLCache[int, int] = TTLCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds
+        )
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def get(self, project_id: int) -> int | None:
+        return self._cache.get(project_id)
+
+    def set(self, project_id: int, agent_id: int, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._cache.set(project_id, agent_id)
+
+    def invalidate(self, project_id: int | None = None) -> None:
+        """Drop one project's entry, or every entry when `project_id` is None."""
+        with self._lock:
+            self._generation += 1
+            if project_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(project_id)
+        logger.info("default_agent_invalidated project_id=%s", project_id)
+
+    def stats(self) -> dict[str, int]:
+        return self._cache.stats()
+
+
+default_agents = DefaultAgentTable(
+    max_entries=settings.ai_agent_routing_cache_max_entries,
+    ttl_seconds=settings.ai_agent_routing_ttl_seconds,
+)
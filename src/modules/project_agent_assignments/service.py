@@ -1,13 +1,17 @@
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from src.core.errors import bad_request, conflict, not_found
+from src.core.memberships import memberships
+from src.core.writes import db_now, insert_row, update_row
+from src.modules.project_agent_assignments.routing import default_agents
 from src.modules.project_agent_assignments.schemas import (
     ProjectAgentAssignmentCreate,
     ProjectAgentAssignmentOut,
     ProjectAgentAssignmentUpdate,
 )
+from src.modules.project_stage_status.catalog import stage_by_id
 
 ALLOWED_ASSIGNMENT_STATUS = {"active", "paused", "disabled"}
 
@@ -66,6 +70,9 @@ def list_assignments_for_user(
     project_id: int | None = None,
     agent_id: int | None = None,
 ) -> list[ProjectAgentAssignmentOut]:
+    project_ids = list(memberships.projects_for_user(db, user_id))
+    if not project_ids:
+        return []
     rows = (
         db.execute(
             text(
@@ -81,17 +88,16 @@ def list_assignments_for_user(
                   sc.stage_code,
                   sc.stage_name
                 FROM project_agent_assignments paa
-                JOIN project_members pm ON pm.project_id = paa.project_id
                 LEFT JOIN stage_catalog sc ON sc.stage_id = paa.stage_id
-                WHERE pm.user_id = :user_id
+                WHERE paa.project_id IN :project_ids
                   AND (:project_id IS NULL OR paa.project_id = :project_id)
                   AND (:agent_id IS NULL OR paa.agent_id = :agent_id)
                 ORDER BY paa.project_agent_assignment_id DESC
                 LIMIT :limit OFFSET :offset
                 """
-            ),
+            ).bindparams(bindparam("project_ids", expanding=True)),
             {
-                "user_id": user_id,
+                "project_ids": project_ids,
                 "project_id": project_id,
                 "agent_id": agent_id,
                 "limit": limit,
@@ -141,17 +147,11 @@ def create_assignment(db: Session, payload: ProjectAgentAssignmentCreate) -> Pro
         )
 
     try:
-        result = db.execute(
-            text(
-                """
-                INSERT INTO project_agent_assignments (
-                  project_id, agent_id, stage_id, assignment_status, assigned_by_user_id
-                ) VALUES (
-                  :project_id, :agent_id, :stage_id, :assignment_status, :assigned_by_user_id
-                )
-                """
-            ),
-            payload.model_dump(),
+        assignment = insert_row(
+            db,
+            "project_agent_assignments",
+            {**payload.model_dump(), "assigned_at": db_now()},
+            id_column="project_agent_assignment_id",
         )
         db.commit()
     except IntegrityError as exc:
@@ -159,7 +159,15 @@ def create_assignment(db: Session, payload: ProjectAgentAssignmentCreate) -> Pro
         raise conflict(
             "Invalid project_id/agent_id/stage_id or duplicated assignment tuple"
         ) from exc
-    return get_assignment(db, int(result.lastrowid))
+    default_agents.invalidate(payload.project_id)
+    stage = stage_by_id(db, payload.stage_id) if payload.stage_id is not None else None
+    return _map_row(
+        {
+            **assignment,
+            "stage_code": stage.stage_code if stage else None,
+            "stage_name": stage.stage_name if stage else None,
+        }
+    )
 
 
 def update_assignment(
@@ -167,30 +175,23 @@ def update_assignment(
     assignment_id: int,
     payload: ProjectAgentAssignmentUpdate,
 ) -> ProjectAgentAssignmentOut:
-    _ = get_assignment(db, assignment_id)
+    current = get_assignment(db, assignment_id)
     if payload.assignment_status not in ALLOWED_ASSIGNMENT_STATUS:
         raise bad_request(
             f"assignment_status must be one of: {sorted(ALLOWED_ASSIGNMENT_STATUS)}"
         )
 
+    update_values = payload.model_dump()
     try:
-        db.execute(
-            text(
-                """
-                UPDATE project_agent_assignments
-                SET assignment_status = :assignment_status,
-                    assigned_by_user_id = :assigned_by_user_id
-                WHERE project_agent_assignment_id = :assignment_id
-                """
-            ),
-            {
-                "assignment_status": payload.assignment_status,
-                "assigned_by_user_id": payload.assigned_by_user_id,
-                "assignment_id": assignment_id,
-            },
+        update_row(
+            db,
+            "project_agent_assignments",
+            {"project_agent_assignment_id": assignment_id},
+            update_values,
         )
         db.commit()
     except IntegrityError as exc:
         db.rollback()
         raise bad_request("Invalid assignment update payload") from exc
-    return get_assignment(db, assignment_id)
+    default_agents.invalidate(current.project_id)
+    return current.model_copy(update=update_values)
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from src.core.project_authz import PROJECT_ALL_ROLES, require_project_role
+from src.core.security import User
+from src.modules.project_budgets.dependencies import db_session
+from src.modules.project_budgets.schemas import ProjectBudgetOut, ProjectBudgetUpdate
+from src.modules.project_budgets.service import get_project_budget, upsert_project_budget
+from src.modules.users.dependencies import current_user
+
+router = APIRouter()
+
+
+@router.get("/projects/{project_id}/budget", response_model=ProjectBudgetOut)
+def get_budget(
+    project_id: int,
+    user: User = Depends(current_user),
+    db: Session = Depends(db_session),
+) -> ProjectBudgetOut:
+    require_project_role(db=db, project_id=project_id, user=user, allowed_roles=PROJECT_ALL_ROLES)
+    return get_project_budget(db=db, project_id=project_id)
+
+
+@router.put("/projects/{project_id}/budget", response_model=ProjectBudgetOut)
+def put_budget(
+    project_id: int,
+    payload: ProjectBudgetUpdate,
+    user: User = Depends(current_user),
+    db: Session = Depends(db_session),
+) -> ProjectBudgetOut:
+    require_project_role(db=db, project_id=project_id, user=user, allowed_roles={"admin"})
+    return upsert_project_budget(
+        db=db,
+        project_id=project_id,
+        payload=payload,
+        user_id=int(user.id),
+    )
@@ -0,0 +1,19 @@
+from datetime import date, datetime
+
+from pydantic import BaseModel, Field
+
+
+class ProjectBudgetUpdate(BaseModel):
+    soft_limit_usd: float | None = Field(default=None, ge=0)
+    hard_limit_usd: float | None = Field(default=None, ge=0)
+
+
+class ProjectBudgetOut(BaseModel):
+    project_id: int
+    soft_limit_usd: float | None
+    hard_limit_usd: float | None
+    period_start: date
+    spent_usd: float
+    budget_status: str
+    updated_by_user_id: int | None = None
+    updated_at: datetime | None = None
@@ -0,0 +1,249 @@
+import asyncio
+from datetime import date
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.db import SessionLocal
+from src.core.errors import bad_request, payment_required
+from src.core.logging import get_logger
+from src.core.writes import db_now
+from src.modules.project_budgets.schemas import ProjectBudgetOut, ProjectBudgetUpdate
+from src.modules.project_budgets.spend import (
+    BUDGET_HARD_EXCEEDED,
+    BUDGET_SOFT_EXCEEDED,
+    Budget,
+    current_period,
+    project_spend,
+)
+
+logger = get_logger(__name__)
+
+# MySQL ER_NO_SUCH_TABLE.
+_NO_SUCH_TABLE = 1146
+
+
+def _load_period_spend(db: Session) -> dict[int, float]:
+    rows = db.execute(
+        text(
+            """
+            SELECT project_id, COALESCE(SUM(cost_usd), 0) AS spent_usd
+            FROM agent_runs
+            WHERE created_at >= :period_start
+              AND cost_usd IS NOT NULL
+            GROUP BY project_id
+            """
+        ),
+        {"period_start": current_period()},
+    ).all()
+    return {int(row.project_id): float(row.spent_usd) for row in rows}
+
+
+def _load_budgets(db: Session) -> dict[int, Budget]:
+    try:
+        rows = db.execute(
+            text("SELECT project_id, soft_limit_usd, hard_limit_usd FROM project_budgets")
+        ).all()
+    except ProgrammingError as exc:
+        # Before migration 004 there is no project_budgets table: no project has a budget.
+        if exc.orig is None or exc.orig.args[:1] != (_NO_SUCH_TABLE,):
+            raise
+        logger.warning("project_budgets_table_missing migration=004_project_budgets.sql")
+        return {}
+    return {
+        int(row.project_id): Budget(
+            soft_limit_usd=float(row.soft_limit_usd) if row.soft_limit_usd is not None else None,
+            hard_limit_usd=float(row.hard_limit_usd) if row.hard_limit_usd is not None else None,
+        )
+        for row in rows
+    }
+
+
+def reconcile_project_spend(db: Session) -> None:
+    """Replace the in-memory counters with the database's month-to-date totals."""
+    if not project_spend.try_begin_reconcile():
+        return
+    try:
+        period = current_period()
+        spend = _load_period_spend(db)
+        budgets = _load_budgets(db)
+        project_spend.load(period, spend, budgets)
+        logger.info(
+            "project_spend_reconciled period=%s projects=%s budgets=%s",
+            period,
+            len(spend),
+            len(budgets),
+        )
+    finally:
+        project_spend.end_reconcile()
+
+
+def _reconcile_in_new_session() -> None:
+    db = SessionLocal()
+    try:
+        reconcile_project_spend(db)
+    finally:
+        db.close()
+
+
+async def run_spend_reconciler() -> None:
+    """Seed the spend counters at startup, then reconcile them every interval."""
+    while True:
+        try:
+            await run_in_threadpool(_reconcile_in_new_session)
+        except Exception:
+            logger.exception("project_spend_reconcile_error")
+        await asyncio.sleep(settings.ai_budget_reconcile_seconds)
+
+
+def enforce_project_budget(db: Session, project_id: int) -> None:
+    """Reject new provider calls for a project over its hard budget.
+
+    Uses the in-memory counters; they are refreshed inline only when the background
+    reconciler has not run for two intervals (first request, frozen Lambda workers).
+    """
+    if not settings.ai_budgets_enabled:
+        return
+    if project_spend.is_stale(settings.ai_budget_reconcile_seconds * 2):
+        reconcile_project_spend(db)
+    status = project_spend.status(project_id)
+    if status == BUDGET_HARD_EXCEEDED:
+        logger.warning(
+            "project_budget_blocked project_id=%s spent_usd=%s",
+            project_id,
+            round(project_spend.spent(project_id), 6),
+        )
+        raise payment_required("Project monthly AI budget exhausted (hard limit reached)")
+    if status == BUDGET_SOFT_EXCEEDED and project_spend.first_soft_warning(project_id):
+        logger.warning(
+            "project_budget_soft_limit_exceeded project_id=%s spent_usd=%s",
+            project_id,
+            round(project_spend.spent(project_id), 6),
+        )
+
+
+def within_project_budget(project_id: int, pending_usd: float = 0.0) -> bool:
+    """In-memory re-check for work already admitted by `enforce_project_budget`.
+
+    `pending_usd` is spend not recorded yet, such as earlier items of the same batch.
+    """
+    if not settings.ai_budgets_enabled:
+        return True
+    return project_spend.status(project_id, pending_usd) != BUDGET_HARD_EXCEEDED
+
+
+def _period_spend(db: Session, project_id: int, period_start: date) -> float:
+    spent = db.execute(
+        text(
+            """
+            SELECT COALESCE(SUM(cost_usd), 0)
+            FROM agent_runs
+            WHERE project_id = :project_id
+              AND created_at >= :period_start
+            """
+        ),
+        {"project_id": project_id, "period_start": period_start},
+    ).scalar_one()
+    return float(spent or 0)
+
+
+def _budget_out(
+    project_id: int,
+    budget: dict,
+    period_start: date,
+    spent_usd: float,
+) -> ProjectBudgetOut:
+    soft = budget.get("soft_limit_usd")
+    hard = budget.get("hard_limit_usd")
+    status = "ok"
+    if hard is not None and spent_usd >= float(hard):
+        status = BUDGET_HARD_EXCEEDED
+    elif soft is not None and spent_usd >= float(soft):
+        status = BUDGET_SOFT_EXCEEDED
+    return ProjectBudgetOut(
+        project_id=project_id,
+        soft_limit_usd=float(soft) if soft is not None else None,
+        hard_limit_usd=float(hard) if hard is not None else None,
+        period_start=period_start,
+        spent_usd=spent_usd,
+        budget_status=status,
+        updated_by_user_id=budget.get("updated_by_user_id"),
+        updated_at=budget.get("updated_at"),
+    )
+
+
+def get_project_budget(db: Session, project_id: int) -> ProjectBudgetOut:
+    row = (
+        db.execute(
+            text(
+                """
+                SELECT project_id, soft_limit_usd, hard_limit_usd, updated_by_user_id, updated_at
+                FROM project_budgets
+                WHERE project_id = :project_id
+                """
+            ),
+            {"project_id": project_id},
+        )
+        .mappings()
+        .first()
+    )
+    period_start = current_period()
+    return _budget_out(
+        project_id,
+        dict(row) if row else {},
+        period_start,
+        _period_spend(db, project_id, period_start),
+    )
+
+
+def upsert_project_budget(
+    db: Session,
+    project_id: int,
+    payload: ProjectBudgetUpdate,
+    user_id: int,
+) -> ProjectBudgetOut:
+    if (
+        payload.soft_limit_usd is not None
+        and payload.hard_limit_usd is not None
+        and payload.soft_limit_usd > payload.hard_limit_usd
+    ):
+        raise bad_request("soft_limit_usd cannot be greater than hard_limit_usd")
+    budget = {
+        "project_id": project_id,
+        "soft_limit_usd": payload.soft_limit_usd,
+        "hard_limit_usd": payload.hard_limit_usd,
+        "updated_by_user_id": user_id,
+        "updated_at": db_now(),
+    }
+    db.execute(
+        text(
+            """
+            INSERT INTO project_budgets (
+              project_id, soft_limit_usd, hard_limit_usd, updated_by_user_id, updated_at
+            ) VALUES (
+              :project_id, :soft_limit_usd, :hard_limit_usd, :updated_by_user_id, :updated_at
+            )
+            ON DUPLICATE KEY UPDATE
+              soft_limit_usd = VALUES(soft_limit_usd),
+              hard_limit_usd = VALUES(hard_limit_usd),
+              updated_by_user_id = VALUES(updated_by_user_id),
+              updated_at = VALUES(updated_at)
+            """
+        ),
+        budget,
+    )
+    db.commit()
+    project_spend.set_budget(
+        project_id,
+        Budget(soft_limit_usd=payload.soft_limit_usd, hard_limit_usd=payload.hard_limit_usd),
+    )
+    period_start = current_period()
+    return _budget_out(
+        project_id,
+        budget,
+        period_start,
+        _period_spend(db, project_id, period_start),
+    )
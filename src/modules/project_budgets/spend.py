@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
+
+BUDGET_OK = "ok"
+BUDGET_SOFT_EXCEEDED = "soft_limit_exceeded"
+BUDGET_HARD_EXCEEDED = "hard_limit_exceeded"
+
+
+def current_period() -> date:
+    """First day of the current UTC month; budgets and spend reset monthly."""
+    return datetime.now(UTC).date().replace(day=1)
+
+
+@dataclass(frozen=True)
+class Budget:
+    soft_limit_usd: float | None = None
+    hard_limit_usd: float | None = None
+
+
+class ProjectSpendTracker:
+    """Month-to-date spend and budgets per project, kept in memory.
+
+    Seeded from the database and periodically replaced by a fresh snapshot; between
+    snapshots each process adds the runs it records itself. Spend recorded by other
+    processes is only seen at the next reconciliation, so with several workers a
+    project can overspend by up to one reconcile interval of their traffic.
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.monotonic,
+        period: Callable[[], date] = current_period,
+    ) -> None:
+        self._clock = clock
+        self._current_period = period
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._period: date | None = None
+        self._spend: dict[int, float] = {}
+        self._budgets: dict[int, Budget] = {}
+        self._soft_warned: set[int] = set()
+        self.reconciled_at: float | None = None
+
+    def _roll(self) -> None:
+        period = self._current_period()
+        if period != self._period:
+            self._period = period
+            self._spend = {}
+            self._soft_warned = set()
+
+    def load(self, period: date, spend: dict[int, float], budgets: dict[int, Budget]) -> None:
+        with self._lock:
+            self._roll()
+            if period == self._period:
+                self._spend = dict(spend)
+            self._budgets = dict(budgets)
+            self.reconciled_at = self._clock()
+
+    def try_begin_reconcile(self) -> bool:
+        """Claim the (single) reconciliation slot; False when one is already running."""
+        return self._reconcile_lock.acquire(blocking=False)
+
+    def end_reconcile(self) -> None:
+        self._reconcile_lock.release()
+
+    def is_stale(self, max_age_seconds: float) -> bool:
+        return self.reconciled_at is None or self._clock() - self.reconciled_at > max_age_seconds
+
+    def record(self, project_id: int, cost_usd: float | None) -> None:
+        if not cost_usd:
+            return
+        with self._lock:
+            self._roll()
+            self._spend[project_id] = self._spend.get(project_id, 0.0) + float(cost_usd)
+
+    def set_budget(self, project_id: int, budget: Budget) -> None:
+        with self._lock:
+            self._budgets[project_id] = budget
+            self._soft_warned.discard(project_id)
+
+    def spent(self, project_id: int) -> float:
+        with self._lock:
+            self._roll()
+            return self._spend.get(project_id, 0.0)
+
+    def status(self, project_id: int, pending_usd: float = 0.0) -> str:
+        """Budget status, counting `pending_usd` of spend that is not recorded yet."""
+        with self._lock:
+            self._roll()
+            budget = self._budgets.get(project_id)
+            if budget is None:
+                return BUDGET_OK
+            spent = self._spend.get(project_id, 0.0) + pending_usd
+            if budget.hard_limit_usd is not None and spent >= budget.hard_limit_usd:
+                return BUDGET_HARD_EXCEEDED
+            if budget.soft_limit_usd is not None and spent >= budget.soft_limit_usd:
+                return BUDGET_SOFT_EXCEEDED
+            return BUDGET_OK
+
+    def first_soft_warning(self, project_id: int) -> bool:
+        """True only the first time a project is seen over its soft limit this period."""
+        with self._lock:
+            if project_id in self._soft_warned:
+                return False
+            self._soft_warned.add(project_id)
+            return True
+
+
+project_spend = ProjectSpendTracker()
@@ -3,6 +3,9 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from src.core.errors import bad_request, conflict, not_found
+from src.core.memberships import bump_membership_version, memberships
+from src.core.project_authz import forget_project_access
+from src.core.writes import db_now, insert_row, update_row
 from src.modules.project_members.schemas import (
     ProjectMemberCreate,
     ProjectMemberOut,
@@ -70,6 +73,46 @@ def get_member(
     return _map_row(dict(row))
 
 
+def _membership_changed(db: Session, project_id: int, user_id: int) -> None:
+    memberships.invalidate(user_id)
+    forget_project_access(db, project_id)
+
+
+def _get_member_and_owner(
+    db: Session,
+    project_id: int,
+    user_id: int,
+) -> tuple[ProjectMemberOut, int]:
+    """Load a member together with its project's owner_user_id in one query."""
+    row = (
+        db.execute(
+            text(
+                """
+                SELECT
+                  pm.project_member_id,
+                  pm.project_id,
+                  pm.user_id,
+                  pm.member_role,
+                  pm.created_at,
+                  p.owner_user_id
+                FROM project_members pm
+                JOIN projects p ON p.project_id = pm.project_id
+                WHERE pm.project_id = :project_id
+                  AND pm.user_id = :user_id
+                """
+            ),
+            {"project_id": project_id, "user_id": user_id},
+        )
+        .mappings()
+        .first()
+    )
+    if not row:
+        raise not_found("Project member not found")
+    member = dict(row)
+    owner_user_id = int(member.pop("owner_user_id"))
+    return _map_row(member), owner_user_id
+
+
 def create_member(
     db: Session,
     project_id: int,
@@ -79,27 +122,24 @@ def create_member(
         raise bad_request(f"member_role must be one of: {sorted(ALLOWED_MEMBER_ROLES)}")
 
     try:
-        db.execute(
-            text(
-                """
-                INSERT INTO project_members (
-                  project_id, user_id, member_role
-                ) VALUES (
-                  :project_id, :user_id, :member_role
-                )
-                """
-            ),
+        member = insert_row(
+            db,
+            "project_members",
             {
                 "project_id": project_id,
                 "user_id": payload.user_id,
                 "member_role": payload.member_role,
+                "created_at": db_now(),
             },
+            id_column="project_member_id",
         )
+        bump_membership_version(db, payload.user_id)
         db.commit()
     except IntegrityError as exc:
         db.rollback()
         raise conflict("Invalid user_id/project_id or duplicated project member") from exc
-    return get_member(db, project_id=project_id, user_id=payload.user_id)
+    _membership_changed(db, project_id, payload.user_id)
+    return _map_row(member)
 
 
 def update_member(
@@ -111,15 +151,8 @@ def update_member(
     if payload.member_role not in ALLOWED_MEMBER_ROLES:
         raise bad_request(f"member_role must be one of: {sorted(ALLOWED_MEMBER_ROLES)}")
 
-    current = get_member(db, project_id=project_id, user_id=user_id)
-    owner_user_id = db.execute(
-        text("SELECT owner_user_id FROM projects WHERE project_id = :project_id"),
-        {"project_id": project_id},
-    ).scalar_one_or_none()
-    if owner_user_id is None:
-        raise not_found("Project not found")
-
-    if int(owner_user_id) == user_id and payload.member_role != "admin":
+    current, owner_user_id = _get_member_and_owner(db, project_id=project_id, user_id=user_id)
+    if owner_user_id == user_id and payload.member_role != "admin":
         raise bad_request("Project owner must keep admin role")
 
     if current.member_role == "admin" and payload.member_role != "admin":
@@ -136,34 +169,21 @@ def update_member(
         if int(admin_count) <= 1:
             raise bad_request("Project must have at least one admin member")
 
-    db.execute(
-        text(
-            """
-            UPDATE project_members
-            SET member_role = :member_role
-            WHERE project_id = :project_id
-              AND user_id = :user_id
-            """
-        ),
-        {
-            "member_role": payload.member_role,
-            "project_id": project_id,
-            "user_id": user_id,
-        },
+    update_row(
+        db,
+        "project_members",
+        {"project_id": project_id, "user_id": user_id},
+        {"member_role": payload.member_role},
     )
+    bump_membership_version(db, user_id)
     db.commit()
-    return get_member(db, project_id=project_id, user_id=user_id)
+    _membership_changed(db, project_id, user_id)
+    return current.model_copy(update={"member_role": payload.member_role})
 
 
 def delete_member(db: Session, project_id: int, user_id: int) -> None:
-    member = get_member(db, project_id=project_id, user_id=user_id)
-    owner_user_id = db.execute(
-        text("SELECT owner_user_id FROM projects WHERE project_id = :project_id"),
-        {"project_id": project_id},
-    ).scalar_one_or_none()
-    if owner_user_id is None:
-        raise not_found("Project not found")
-    if int(owner_user_id) == user_id:
+    member, owner_user_id = _get_member_and_owner(db, project_id=project_id, user_id=user_id)
+    if owner_user_id == user_id:
         raise bad_request("Project owner cannot be removed from project members")
 
     if member.member_role == "admin":
@@ -190,4 +210,6 @@ def delete_member(db: Session, project_id: int, user_id: int) -> None:
         ),
         {"project_id": project_id, "user_id": user_id},
     )
+    bump_membership_version(db, user_id)
     db.commit()
+    _membership_changed(db, project_id, user_id)
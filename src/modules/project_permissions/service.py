@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 
-from src.core.project_authz import get_project_member_role, require_project_role
+from src.core.project_authz import require_project_role
 from src.core.security import User
 from src.modules.project_permissions.schemas import ProjectPermissionsMeOut
 
@@ -10,15 +10,12 @@ def get_my_project_permissions(
     project_id: int,
     user: User,
 ) -> ProjectPermissionsMeOut:
-    role = require_project_role(
+    member_role = require_project_role(
         db=db,
         project_id=project_id,
         user=user,
         allowed_roles={"admin", "operator", "viewer"},
     )
-    member_role = get_project_member_role(db=db, project_id=project_id, user_id=int(user.id))
-    if member_role is None:
-        member_role = role
 
     can_rw = member_role in {"admin", "operator"}
     is_admin = member_role == "admin"
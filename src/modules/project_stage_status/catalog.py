@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.core.cache import TTLCache
+
+# stage_catalog is seeded by migrations and has no write API; the TTL only bounds how
+# long a reordered or renamed stage keeps its old labels in this worker.
+_CATALOG_TTL_SECONDS = 300.0
+_CATALOG_KEY = "stages"
+
+
+@dataclass(frozen=True)
+class Stage:
+    stage_id: int
+    stage_code: str
+    stage_name: str
+    stage_order: int
+
+
+@dataclass(frozen=True)
+class _Catalog:
+    by_id: dict[int, Stage]
+    by_code: dict[str, Stage]
+
+
+_catalog: TTLCache[str, _Catalog] = TTLCache(max_entries=1, ttl_seconds=_CATALOG_TTL_SECONDS)
+
+
+def _load(db: Session) -> _Catalog:
+    rows = (
+        db.execute(
+            text("SELECT stage_id, stage_code, stage_name, stage_order FROM stage_catalog")
+        )
+        .mappings()
+        .all()
+    )
+    stages = [Stage(**dict(r)) for r in rows]
+    catalog = _Catalog(
+        by_id={s.stage_id: s for s in stages},
+        by_code={s.stage_code: s for s in stages},
+    )
+    _catalog.set(_CATALOG_KEY, catalog)
+    return catalog
+
+
+def _lookup(db: Session, find: Callable[[_Catalog], Stage | None]) -> Stage | None:
+    catalog = _catalog.get(_CATALOG_KEY)
+    stage = find(catalog) if catalog is not None else None
+    if stage is None:
+        # Unknown key: reload in case a stage was added since the last load.
+        stage = find(_load(db))
+    return stage
+
+
+def stage_by_id(db: Session, stage_id: int) -> Stage | None:
+    return _lookup(db, lambda catalog: catalog.by_id.get(stage_id))
+
+
+def stage_by_code(db: Session, stage_code: str) -> Stage | None:
+    return _lookup(db, lambda catalog: catalog.by_code.get(stage_code))
+
+
+def clear_stage_catalog() -> None:
+    _catalog.clear()
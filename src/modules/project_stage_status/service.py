@@ -3,6 +3,8 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from src.core.errors import bad_request, not_found
+from src.core.writes import db_now
+from src.modules.project_stage_status.catalog import stage_by_code
 from src.modules.project_stage_status.schemas import (
     ProjectStageStatusOut,
     ProjectStageStatusUpdate,
@@ -60,63 +62,74 @@ def update_project_stage_status(
     stage_code: str,
     payload: ProjectStageStatusUpdate,
 ) -> ProjectStageStatusOut:
-    stage = (
+    stage = stage_by_code(db, stage_code)
+    if stage is None:
+        raise not_found("Stage not found")
+
+    # Locks the current status row so the started_at returned below is the one stored.
+    current = (
         db.execute(
-            text("SELECT stage_id FROM stage_catalog WHERE stage_code = :stage_code"),
-            {"stage_code": stage_code},
+            text(
+                """
+                SELECT p.project_id, pss.started_at
+                FROM projects p
+                LEFT JOIN project_stage_status pss
+                  ON pss.project_id = p.project_id
+                 AND pss.stage_id = :stage_id
+                WHERE p.project_id = :project_id
+                FOR UPDATE
+                """
+            ),
+            {"project_id": project_id, "stage_id": stage.stage_id},
         )
         .mappings()
         .first()
     )
-    if not stage:
-        raise not_found("Stage not found")
-
-    project_exists = db.execute(
-        text("SELECT 1 FROM projects WHERE project_id = :project_id"),
-        {"project_id": project_id},
-    ).first()
-    if not project_exists:
+    if not current:
         raise not_found("Project not found")
 
-    stage_id = int(stage["stage_id"])
     if payload.stage_status not in ALLOWED_STAGE_STATUS:
         raise bad_request(f"stage_status must be one of: {sorted(ALLOWED_STAGE_STATUS)}")
-
-    started_at_sql = "NULL"
-    completed_at_sql = "NULL"
-    if payload.stage_status == "in_progress":
-        started_at_sql = "CURRENT_TIMESTAMP"
-    if payload.stage_status in {"done", "failed", "skipped"}:
-        completed_at_sql = "CURRENT_TIMESTAMP"
     if payload.stage_status == "done" and payload.progress_percent < 100:
         raise bad_request("progress_percent must be 100 when stage_status is done")
 
-    db.execute(
-        text(
-            f"""
-            INSERT INTO project_stage_status (
-              project_id, stage_id, stage_status, progress_percent, updated_by_user_id, started_at, completed_at
-            ) VALUES (
-              :project_id, :stage_id, :stage_status, :progress_percent, :updated_by_user_id, {started_at_sql}, {completed_at_sql}
-            )
-            ON DUPLICATE KEY UPDATE
-              stage_status = VALUES(stage_status),
-              progress_percent = VALUES(progress_percent),
-              updated_by_user_id = VALUES(updated_by_user_id),
-              started_at = COALESCE(project_stage_status.started_at, VALUES(started_at)),
-              completed_at = VALUES(completed_at)
-            """
-        ),
-        {
-            "project_id": project_id,
-            "stage_id": stage_id,
-            "stage_status": payload.stage_status,
-            "progress_percent": payload.progress_percent,
-            "updated_by_user_id": payload.updated_by_user_id,
-        },
-    )
+    now = db_now()
+    started_at = now if payload.stage_status == "in_progress" else None
+    completed_at = now if payload.stage_status in {"done", "failed", "skipped"} else None
+    values = {
+        "project_id": project_id,
+        "stage_id": stage.stage_id,
+        "stage_status": payload.stage_status,
+        "progress_percent": round(payload.progress_percent, 2),
+        "updated_by_user_id": payload.updated_by_user_id,
+        "started_at": current["started_at"] or started_at,
+        "completed_at": completed_at,
+        "updated_at": now,
+    }
 
     try:
+        result = db.execute(
+            text(
+                """
+                INSERT INTO project_stage_status (
+                  project_id, stage_id, stage_status, progress_percent, updated_by_user_id,
+                  started_at, completed_at, updated_at
+                ) VALUES (
+                  :project_id, :stage_id, :stage_status, :progress_percent, :updated_by_user_id,
+                  :started_at, :completed_at, :updated_at
+                )
+                ON DUPLICATE KEY UPDATE
+                  project_stage_status_id = LAST_INSERT_ID(project_stage_status_id),
+                  stage_status = VALUES(stage_status),
+                  progress_percent = VALUES(progress_percent),
+                  updated_by_user_id = VALUES(updated_by_user_id),
+                  started_at = COALESCE(project_stage_status.started_at, VALUES(started_at)),
+                  completed_at = VALUES(completed_at),
+                  updated_at = VALUES(updated_at)
+                """
+            ),
+            values,
+        )
         db.execute(
             text(
                 """
@@ -134,7 +147,7 @@ def update_project_stage_status(
             ),
             {
                 "project_id": project_id,
-                "stage_id": stage_id,
+                "stage_id": stage.stage_id,
                 "stage_status": payload.stage_status,
                 "progress_percent": payload.progress_percent,
                 "event_note": payload.event_note,
@@ -146,34 +159,13 @@ def update_project_stage_status(
         db.rollback()
         raise bad_request("Invalid user_id in stage update") from exc
 
-    row = (
-        db.execute(
-            text(
-                """
-                SELECT
-                  pss.project_stage_status_id,
-                  pss.project_id,
-                  pss.stage_id,
-                  sc.stage_code,
-                  sc.stage_name,
-                  sc.stage_order,
-                  pss.stage_status,
-                  pss.started_at,
-                  pss.completed_at,
-                  pss.progress_percent,
-                  pss.updated_by_user_id,
-                  pss.updated_at
-                FROM project_stage_status pss
-                JOIN stage_catalog sc ON sc.stage_id = pss.stage_id
-                WHERE pss.project_id = :project_id
-                  AND pss.stage_id = :stage_id
-                """
-            ),
-            {"project_id": project_id, "stage_id": stage_id},
-        )
-        .mappings()
-        .first()
+    # LAST_INSERT_ID(project_stage_status_id) makes lastrowid the existing row's id on update.
+    return _map_row(
+        {
+            **values,
+            "project_stage_status_id": int(result.lastrowid),
+            "stage_code": stage.stage_code,
+            "stage_name": stage.stage_name,
+            "stage_order": stage.stage_order,
+        }
     )
-    if not row:
-        raise not_found("Project stage status not found")
-    return _map_row(dict(row))
@@ -1,8 +1,10 @@
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from src.core.errors import bad_request, conflict, not_found
+from src.core.memberships import bump_membership_version, memberships
+from src.core.writes import db_now, insert_row, update_row
 from src.modules.projects.schemas import ProjectCreate, ProjectOut, ProjectUpdate
 
 ALLOWED_LIFECYCLE_STATUS = {"draft", "active", "paused", "completed", "cancelled"}
@@ -39,6 +41,9 @@ def list_projects_for_user(
     limit: int = 50,
     offset: int = 0,
 ) -> list[ProjectOut]:
+    project_ids = list(memberships.projects_for_user(db, user_id))
+    if not project_ids:
+        return []
     rows = (
         db.execute(
             text(
@@ -47,13 +52,12 @@ def list_projects_for_user(
                   p.project_id, p.project_key, p.project_name, p.description,
                   p.lifecycle_status, p.owner_user_id, p.created_at, p.updated_at
                 FROM projects p
-                JOIN project_members pm ON pm.project_id = p.project_id
-                WHERE pm.user_id = :user_id
+                WHERE p.project_id IN :project_ids
                 ORDER BY p.project_id DESC
                 LIMIT :limit OFFSET :offset
                 """
-            ),
-            {"user_id": user_id, "limit": limit, "offset": offset},
+            ).bindparams(bindparam("project_ids", expanding=True)),
+            {"project_ids": project_ids, "limit": limit, "offset": offset},
         )
         .mappings()
         .all()
@@ -89,20 +93,15 @@ def create_project(db: Session, payload: ProjectCreate) -> ProjectOut:
     if payload.lifecycle_status not in ALLOWED_LIFECYCLE_STATUS:
         raise bad_request(f"lifecycle_status must be one of: {sorted(ALLOWED_LIFECYCLE_STATUS)}")
 
+    now = db_now()
     try:
-        result = db.execute(
-            text(
-                """
-                INSERT INTO projects (
-                  project_key, project_name, description, lifecycle_status, owner_user_id
-                ) VALUES (
-                  :project_key, :project_name, :description, :lifecycle_status, :owner_user_id
-                )
-                """
-            ),
-            payload.model_dump(),
+        project = insert_row(
+            db,
+            "projects",
+            {**payload.model_dump(), "created_at": now, "updated_at": now},
+            id_column="project_id",
         )
-        project_id = result.lastrowid
+        project_id = project["project_id"]
 
         db.execute(
             text(
@@ -130,12 +129,14 @@ def create_project(db: Session, payload: ProjectCreate) -> ProjectOut:
             ),
             {"project_id": project_id},
         )
+        bump_membership_version(db, payload.owner_user_id)
         db.commit()
     except IntegrityError as exc:
         db.rollback()
         raise conflict("Invalid owner_user_id or duplicated project_key") from exc
+    memberships.invalidate(payload.owner_user_id)
 
-    return get_project(db, int(project_id))
+    return _row_to_project(project)
 
 
 def update_project(db: Session, project_id: int, payload: ProjectUpdate) -> ProjectOut:
@@ -147,15 +148,7 @@ def update_project(db: Session, project_id: int, payload: ProjectUpdate) -> Proj
     if lifecycle_status and lifecycle_status not in ALLOWED_LIFECYCLE_STATUS:
         raise bad_request(f"lifecycle_status must be one of: {sorted(ALLOWED_LIFECYCLE_STATUS)}")
 
-    fields = []
-    params: dict[str, object] = {"project_id": project_id}
-    for key, value in update_values.items():
-        fields.append(f"{key} = :{key}")
-        params[key] = value
-
-    db.execute(
-        text(f"UPDATE projects SET {', '.join(fields)} WHERE project_id = :project_id"),
-        params,
-    )
+    update_values["updated_at"] = db_now()
+    update_row(db, "projects", {"project_id": project_id}, update_values)
     db.commit()
-    return get_project(db, project_id)
+    return current.model_copy(update=update_values)
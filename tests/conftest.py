@@ -0,0 +1,140 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+import httpx
+import pytest
+
+from src.core.config import settings
+from src.modules.agent_runs.schemas import AgentRunCreate
+from src.modules.ai_providers import service
+from src.modules.ai_providers.circuit_breaker import CircuitBreakerRegistry
+from src.modules.ai_providers.metrics import ProviderMetrics
+
+Handler = Callable[[httpx.Request], Awaitable[httpx.Response]]
+
+
+def _text_body(provider: str, text: str) -> dict:
+    if provider == "openai":
+        return {"output_text": text, "usage": {"input_tokens": 3, "output_tokens": 2}}
+    return {
+        "candidates": [{"content": {"parts": [{"text": text}]}}],
+        "usageMetadata": {"promptTokenCount": 3, "candidatesTokenCount": 2},
+    }
+
+
+def _stream_events(provider: str, deltas: list[str]) -> list[dict]:
+    if provider == "openai":
+        events = [{"type": "response.output_text.delta", "delta": d} for d in deltas]
+        usage = {"input_tokens": 3, "output_tokens": len(deltas)}
+        return [*events, {"type": "response.completed", "response": {"usage": usage}}]
+    events = [{"candidates": [{"content": {"parts": [{"text": d}]}}]} for d in deltas]
+    if events:
+        events[-1]["usageMetadata"] = {"promptTokenCount": 3, "candidatesTokenCount": len(deltas)}
+    return events
+
+
+class FakeProviders:
+    """Stands in for `provider_clients`; each provider is answered by an async handler.
+
+    Requests go through real `httpx.AsyncClient`s over `httpx.MockTransport`, so the
+    service's request, streaming and error handling run unchanged.
+    """
+
+    def __init__(self) -> None:
+        self.handlers: dict[str, Handler] = {}
+        self.calls: list[str] = []
+        self.cancelled: list[str] = []
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def get_async(self, provider: str) -> httpx.AsyncClient:
+        client = self._clients.get(provider)
+        if client is None:
+
+            async def handle(request: httpx.Request) -> httpx.Response:
+                self.calls.append(provider)
+                try:
+                    return await self.handlers[provider](request)
+                except asyncio.CancelledError:
+                    self.cancelled.append(provider)
+                    raise
+
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+            self._clients[provider] = client
+        return client
+
+    def reply(self, provider: str, text: str, delay: float = 0.0) -> None:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(delay)
+            return httpx.Response(200, json=_text_body(provider, text))
+
+        self.handlers[provider] = handler
+
+    def fail(self, provider: str, status: int = 503, delay: float = 0.0) -> None:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(delay)
+            return httpx.Response(status, text=f"{provider} says no")
+
+        self.handlers[provider] = handler
+
+    def stream(
+        self,
+        provider: str,
+        deltas: list[str],
+        raw: bytes | None = None,
+        then: Callable[[], Awaitable[None]] | None = None,
+    ) -> None:
+        """Answer with SSE frames for `deltas` (or `raw` bytes), then await `then`."""
+        body = raw
+        if body is None:
+            events = _stream_events(provider, deltas)
+            body = b"".join(f"data: {json.dumps(event)}\n\n".encode() for event in events)
+
+        async def content() -> AsyncIterator[bytes]:
+            for line in body.splitlines(keepends=True):
+                yield line
+                await asyncio.sleep(0)
+            if then is not None:
+                await then()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=content())
+
+        self.handlers[provider] = handler
+
+
+@pytest.fixture
+def providers(monkeypatch) -> FakeProviders:
+    fake = FakeProviders()
+    monkeypatch.setattr(service, "provider_clients", fake)
+    monkeypatch.setattr(service, "circuit_breakers", CircuitBreakerRegistry())
+    monkeypatch.setattr(service, "provider_metrics", ProviderMetrics())
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    monkeypatch.setattr(settings, "gemini_api_key", "test-key")
+    monkeypatch.setattr(settings, "ai_rate_limit_enabled", False)
+    return fake
+
+
+class RecordedRuns:
+    """Stands in for the agent_runs persistence used by the generation paths."""
+
+    def __init__(self) -> None:
+        self.payloads: list[AgentRunCreate] = []
+        self.waits: list[bool] = []
+
+    def record(self, db, payload: AgentRunCreate, wait: bool = False) -> int:
+        self.payloads.append(payload)
+        self.waits.append(wait)
+        return 100 + len(self.payloads)
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def runs(monkeypatch) -> RecordedRuns:
+    recorded = RecordedRuns()
+    monkeypatch.setattr(service, "record_agent_run", recorded.record)
+    monkeypatch.setattr(service, "SessionLocal", lambda: recorded)
+    monkeypatch.setattr(service, "_admit_project_run", lambda db, project_id, agent_id: 2)
+    return recorded
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from src.modules.agent_runs.schemas import AgentRunCreate
+from src.modules.agent_runs.service import create_agent_runs_bulk
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.statements: list[tuple[str, dict]] = []
+        self.commits = 0
+
+    def execute(self, statement, params=None):
+        self.statements.append((str(statement), params or {}))
+        # Ids of one multi-row INSERT need not be consecutive.
+        return SimpleNamespace(lastrowid=41, scalars=lambda: iter([41, 44]))
+
+    def commit(self) -> None:
+        self.commits += 1
+
+
+def test_bulk_insert_uses_one_statement_and_reads_the_ids_back() -> None:
+    db = FakeSession()
+    payloads = [
+        AgentRunCreate(project_id=1, agent_id=2, run_status="success", trigger_source="api"),
+        AgentRunCreate(
+            project_id=1,
+            agent_id=2,
+            run_status="failed",
+            trigger_source="api",
+            output_payload={"execution": {"coalesced": True}},
+        ),
+    ]
+    assert create_agent_runs_bulk(db, payloads) == [41, 44]
+    assert len(db.statements) == 2
+    assert db.commits == 1
+    sql, params = db.statements[0]
+    assert sql.count("CAST(:output_payload_") == 2
+    assert params["run_status_1"] == "failed"
+    assert params["output_payload_1"] == '{"execution": {"coalesced": true}}'
+    assert params["insert_batch_0"] == params["insert_batch_1"]
+    select, select_params = db.statements[1]
+    assert "WHERE insert_batch = :insert_batch" in select
+    assert select_params == {"insert_batch": params["insert_batch_0"]}
@@ -0,0 +1,154 @@
+import base64
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.core.blobs import LocalBlobStore, sniff_mime_type
+from src.core.config import settings
+from src.main import create_app
+from src.modules.ai_providers import router as ai_router
+from src.modules.ai_providers import service
+from src.modules.ai_providers.blob_access import blob_url, valid_blob_signature
+from src.modules.ai_providers.dependencies import db_session
+from src.modules.ai_providers.schemas import AiImageGenerateRequest
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+def test_local_blob_store_is_content_addressed_and_deduplicates(tmp_path) -> None:
+    store = LocalBlobStore(tmp_path)
+
+    first = store.put(PNG)
+    second = store.put(PNG)
+
+    assert first.created is True
+    assert second.created is False
+    assert first.sha256 == second.sha256
+    path = store.path(first.sha256)
+    assert path is not None and path.read_bytes() == PNG
+    assert len([p for p in tmp_path.rglob("*") if p.is_file()]) == 1
+
+
+def test_local_blob_store_rejects_unknown_or_malformed_keys(tmp_path) -> None:
+    store = LocalBlobStore(tmp_path)
+
+    assert store.path("0" * 64) is None
+    assert store.path("../../etc/passwd") is None
+
+
+def test_sniff_mime_type() -> None:
+    assert sniff_mime_type(PNG) == "image/png"
+    assert sniff_mime_type(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert sniff_mime_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert sniff_mime_type(b"hello") == "application/octet-stream"
+
+
+class FakeBlobDatabase:
+    """Enough of a Session for blob ownership in `ai_blob_projects`."""
+
+    def __init__(self) -> None:
+        self.owners: set[tuple[str, int]] = set()
+
+    def execute(self, statement, params=None):
+        if "INSERT IGNORE INTO ai_blob_projects" in str(statement):
+            self.owners.add((params["sha256"], params["pid"]))
+            return _Result()
+        owned = (params["sha256"], params["project_id"]) in self.owners
+        return _Result(row=(1,) if owned else None)
+
+    def commit(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class _Result:
+    def __init__(self, row=None) -> None:
+        self.row = row
+
+    def first(self):
+        return self.row
+
+
+def test_blob_urls_are_signed_per_project_and_expire(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "public_api_base_url", "https://api.example.com")
+    url = urlsplit(blob_url("a" * 64, 9))
+    query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+    assert f"{url.scheme}://{url.netloc}" == "https://api.example.com"
+    assert url.path == f"/ai/blobs/{'a' * 64}"
+    assert query["project_id"] == "9"
+    exp, sig = int(query["exp"]), query["sig"]
+    assert valid_blob_signature("a" * 64, 9, exp, sig)
+    assert not valid_blob_signature("a" * 64, 10, exp, sig)
+    assert not valid_blob_signature("b" * 64, 9, exp, sig)
+    expired = parse_qs(urlsplit(blob_url("a" * 64, 9, now=time.time() - 7200)).query)
+    assert not valid_blob_signature("a" * 64, 9, int(expired["exp"][0]), expired["sig"][0])
+
+
+def test_stored_images_record_the_project_and_base64_is_opt_in(monkeypatch, tmp_path) -> None:
+    database = FakeBlobDatabase()
+    monkeypatch.setattr(service, "blob_store", LocalBlobStore(tmp_path))
+    result = {"provider": "openai", "image_base64": base64.b64encode(PNG).decode()}
+
+    stored = service._store_image(database, result, 9, include_base64=True)
+
+    assert stored["image_base64"] == result["image_base64"]
+    assert stored["mime_type"] == "image/png"
+    assert database.owners == {(stored["image_sha256"], 9)}
+    assert "sig=" in stored["image_url"]
+    assert "image_url" not in service._image_output_payload(stored)
+    assert service._store_image(database, result, 9, include_base64=False)["image_base64"] is None
+
+
+@pytest.fixture
+def blob_client(monkeypatch, tmp_path):
+    database = FakeBlobDatabase()
+    store = LocalBlobStore(tmp_path)
+    sha256 = store.put(PNG).sha256
+    database.owners.add((sha256, 9))
+    monkeypatch.setattr(ai_router, "blob_store", store)
+    app = create_app()
+    app.dependency_overrides[db_session] = lambda: database
+    return TestClient(app), sha256
+
+
+def test_signed_blob_url_serves_the_image_without_a_bearer(blob_client) -> None:
+    client, sha256 = blob_client
+    url = urlsplit(blob_url(sha256, 9))
+    res = client.get(f"{url.path}?{url.query}")
+
+    assert res.status_code == 200
+    assert res.content == PNG
+    assert res.headers["content-type"] == "image/png"
+
+
+def test_blob_reads_need_a_signature_or_bearer_and_project_ownership(blob_client) -> None:
+    client, sha256 = blob_client
+    other = urlsplit(blob_url(sha256, 10))
+    tampered = urlsplit(blob_url(sha256, 9)).query.replace("project_id=9", "project_id=10")
+
+    assert client.get(f"/ai/blobs/{sha256}?project_id=9").status_code == 401
+    assert client.get(f"/ai/blobs/{sha256}?{tampered}").status_code == 403
+    # Validly signed for project 10, but project 10 never produced this blob.
+    assert client.get(f"{other.path}?{other.query}").status_code == 404
+
+
+def test_blob_reads_support_range_and_etag(blob_client) -> None:
+    client, sha256 = blob_client
+    url = urlsplit(blob_url(sha256, 9))
+    target = f"{url.path}?{url.query}"
+
+    partial = client.get(target, headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.content == PNG[:8]
+    assert partial.headers["content-range"] == f"bytes 0-7/{len(PNG)}"
+    assert client.get(target, headers={"Range": "bytes=1000-"}).status_code == 416
+    assert client.get(target, headers={"If-None-Match": f'"{sha256}"'}).status_code == 304
+
+
+def test_image_requests_omit_base64_unless_asked() -> None:
+    assert AiImageGenerateRequest(project_id=1, prompt="x").include_base64 is False
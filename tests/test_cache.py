@@ -0,0 +1,30 @@
+import time
+
+from src.core.cache import MISSING, TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used() -> None:
+    cache: TTLCache[str, int] = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries() -> None:
+    cache: TTLCache[str, int] = TTLCache(max_entries=10, ttl_seconds=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_can_store_none_values() -> None:
+    cache: TTLCache[str, int | None] = TTLCache(max_entries=10, ttl_seconds=60)
+    cache.set("a", None)
+    assert cache.get("a", MISSING) is None
+    assert cache.get("b", MISSING) is MISSING
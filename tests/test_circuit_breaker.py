@@ -0,0 +1,46 @@
+from src.modules.ai_providers.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_circuit_opens_after_threshold_and_skips_calls() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker("openai", failure_threshold=3, open_seconds=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["retry_after_seconds"] == 30
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker("gemini", failure_threshold=1, open_seconds=30, clock=clock)
+    breaker.record_failure()
+    clock.now += 31
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_circuit() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker("gemini", failure_threshold=1, open_seconds=30, clock=clock)
+    breaker.record_failure()
+    clock.now += 31
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.allow()
@@ -0,0 +1,45 @@
+import asyncio
+
+from src.core.config import settings
+from src.modules.ia_generator import context
+from src.modules.ia_generator.context import build_context, split_history
+
+
+def _turns(count: int) -> list[dict]:
+    return [
+        {"message_id": i, "role": "user" if i % 2 else "assistant", "content": f"turn {i} " * 20}
+        for i in range(1, count + 1)
+    ]
+
+
+def test_split_history_keeps_the_newest_turns_within_budget() -> None:
+    turns = _turns(6)
+    older, recent = split_history(turns, 130)
+    assert [t["message_id"] for t in recent] == [5, 6]
+    assert older + recent == turns
+    assert split_history(turns, 0) == (turns, [])
+
+
+def test_summary_is_cached_and_extended_incrementally(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "ai_conversation_history_tokens", 260)
+    monkeypatch.setattr(settings, "ai_conversation_summary_max_tokens", 130)
+    context._summaries.clear()
+    calls: list[tuple[str | None, str]] = []
+
+    async def summarize(previous: str | None, transcript: str) -> str:
+        calls.append((previous, transcript))
+        return f"summary {len(calls)}"
+
+    first = asyncio.run(build_context(9, _turns(6), summarize))
+    assert first.summary == "summary 1"
+    assert len(first.history) == 2
+    assert "turn 4" in calls[0][1] and "turn 5" not in calls[0][1]
+
+    again = asyncio.run(build_context(9, _turns(6), summarize))
+    assert again.summary == "summary 1"
+    assert len(calls) == 1
+
+    longer = asyncio.run(build_context(9, _turns(8), summarize))
+    assert longer.summary == "summary 2"
+    assert calls[1][0] == "summary 1"
+    assert "turn 5" in calls[1][1] and "turn 4" not in calls[1][1]
@@ -0,0 +1,97 @@
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+from src.core.config import settings
+from src.modules.agent_runs.schemas import AgentRunCreate
+from src.modules.ai_providers.schemas import AiTextTurn
+from src.modules.ai_providers.service import TextCompletion, _Attempts, _openai_text_call
+from src.modules.ia_generator.context import ConversationContext
+from src.modules.ia_generator.schemas import IaConversationGenerateRequest, IaConversationOut
+from src.modules.ia_generator.service import _conversation_text_request, _persist_generation
+
+NOW = datetime(2026, 1, 1, tzinfo=UTC)
+CONVERSATION = IaConversationOut(
+    conversation_id=5,
+    project_id=1,
+    agent_id=2,
+    title=None,
+    status="draft",
+    created_by_user_id=3,
+    created_at=NOW,
+    updated_at=NOW,
+)
+
+
+class FakeResult:
+    def __init__(self, lastrowid: int, rows: list[dict]) -> None:
+        self.lastrowid = lastrowid
+        self.rowcount = 1
+        self.rows = rows
+
+    def mappings(self):
+        return SimpleNamespace(all=lambda: self.rows)
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.statements: list[tuple[str, dict]] = []
+        self.messages: list[dict] = []
+        self.commits = 0
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        params = params or {}
+        self.statements.append((sql, params))
+        if "INSERT INTO ia_messages" in sql:
+            message_id = 100 + len(self.messages)
+            self.messages.append(
+                {**params, "message_id": message_id, "is_saved": 0, "created_at": NOW}
+            )
+            return FakeResult(message_id, [])
+        if "FROM ia_messages" in sql:
+            ids = params["message_ids"]
+            return FakeResult(0, [m for m in self.messages if m["message_id"] in ids])
+        return FakeResult(41, [])
+
+    def commit(self) -> None:
+        self.commits += 1
+
+
+def test_persist_generation_writes_run_and_messages_in_one_transaction() -> None:
+    db = FakeSession()
+    result = {"provider": "openai", "model_name": "gpt", "text": "answer", "cost_usd": 0.01}
+    completion = TextCompletion(
+        run=AgentRunCreate(
+            project_id=1, agent_id=2, run_status="success", trigger_source="api", cost_usd=0.01
+        ),
+        result=result,
+        attempts=_Attempts("ai_text", 1, 2),
+    )
+    out = _persist_generation(db, CONVERSATION, "question", completion)
+
+    assert db.commits == 1
+    writes = [sql.split()[0] for sql, _ in db.statements]
+    assert writes == ["INSERT", "INSERT", "INSERT", "UPDATE"]
+    assert out.run_id == 41
+    assert (out.user_message.role, out.user_message.content) == ("user", "question")
+    assert out.assistant_message.run_id == 41
+    assert out.assistant_message.content == "answer"
+    assert out.assistant_message.created_at == db.statements[-1][1]["updated_at"]
+
+
+def test_conversation_request_uses_stored_history(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "openai_api_key", "test")
+    messages = [
+        {"message_id": 1, "role": "system", "content": "be brief"},
+        {"message_id": 2, "role": "user", "content": "hi"},
+        {"message_id": 3, "role": "assistant", "content": "hello"},
+    ]
+    history = [AiTextTurn(role="user", content="hi"), AiTextTurn(role="assistant", content="hello")]
+    context = ConversationContext(history=history, summary="earlier talk")
+    payload = IaConversationGenerateRequest(content="next", system_prompt="in spanish")
+    req = _conversation_text_request(CONVERSATION, payload, messages, context)
+
+    assert req.system_prompt.startswith("be brief\n\nin spanish\n\n")
+    assert req.system_prompt.endswith("earlier talk")
+    roles = [message["role"] for message in _openai_text_call(req).payload["input"]]
+    assert roles == ["system", "user", "assistant", "user"]
@@ -0,0 +1,56 @@
+from src.core.config import settings
+from src.modules.ai_providers import deadline as deadline_module
+from src.modules.ai_providers.deadline import Deadline, request_deadline
+from src.modules.ai_providers.metrics import ProviderMetrics
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _settings(monkeypatch) -> ProviderMetrics:
+    metrics = ProviderMetrics()
+    monkeypatch.setattr(deadline_module, "provider_metrics", metrics)
+    monkeypatch.setattr(settings, "ai_http_timeout_seconds", 20.0)
+    monkeypatch.setattr(settings, "ai_deadline_min_attempt_ms", 1000)
+    monkeypatch.setattr(settings, "ai_routing_min_samples", 3)
+    return metrics
+
+
+def test_client_header_can_only_shorten_the_configured_budget(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "ai_request_deadline_ms", 25000)
+    assert request_deadline(None).budget_seconds == 25
+    assert request_deadline(8000).budget_seconds == 8
+    assert request_deadline(60000).budget_seconds == 25
+    monkeypatch.setattr(settings, "ai_request_deadline_ms", 0)
+    assert request_deadline(None) is None
+    assert request_deadline(3000).budget_seconds == 3
+
+
+def test_attempt_timeout_is_the_remaining_budget(monkeypatch) -> None:
+    _settings(monkeypatch)
+    clock = FakeClock()
+    deadline = Deadline(25, clock=clock)
+
+    assert deadline.attempt_timeout("openai", "m") == 20
+    clock.now += 18
+    assert deadline.attempt_timeout("gemini", "m") == 7
+    clock.now += 6.5
+    assert deadline.attempt_timeout("gemini", "m") is None
+    clock.now += 1
+    assert deadline.expired
+
+
+def test_attempt_is_skipped_when_observed_latency_exceeds_remaining(monkeypatch) -> None:
+    metrics = _settings(monkeypatch)
+    for _ in range(3):
+        metrics.record_success("gemini", "m", 6000)
+    clock = FakeClock()
+    deadline = Deadline(5, clock=clock)
+
+    assert deadline.attempt_timeout("gemini", "m") is None
+    assert deadline.attempt_timeout("openai", "m") == 5
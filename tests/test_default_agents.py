@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+from src.modules.ai_providers.service import _resolve_agent_id
+from src.modules.project_agent_assignments.routing import DefaultAgentTable, default_agents
+
+
+class FakeSession:
+    def __init__(self, agent_id: int) -> None:
+        self.agent_id = agent_id
+        self.queries = 0
+
+    def execute(self, statement, params=None):
+        self.queries += 1
+        return SimpleNamespace(scalar_one_or_none=lambda: self.agent_id)
+
+
+def test_resolve_agent_id_is_cached_until_invalidated() -> None:
+    default_agents.invalidate()
+    db = FakeSession(agent_id=4)
+    assert _resolve_agent_id(db, 11, None) == 4
+    assert _resolve_agent_id(db, 11, None) == 4
+    assert db.queries == 1
+    assert _resolve_agent_id(db, 11, 9) == 9
+    assert db.queries == 1
+
+    db.agent_id = 6
+    default_agents.invalidate(11)
+    assert _resolve_agent_id(db, 11, None) == 6
+    assert db.queries == 2
+
+
+def test_lookup_started_before_invalidation_is_not_stored() -> None:
+    table = DefaultAgentTable(max_entries=8, ttl_seconds=60)
+    generation = table.generation
+    table.invalidate(1)
+    table.set(1, 3, generation)
+    assert table.get(1) is None
+    table.set(1, 3, table.generation)
+    assert table.get(1) == 3
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from src.core.config import settings
+from src.modules.ai_providers import service
+from src.modules.ai_providers.schemas import AiTextGenerateRequest
+from src.modules.ai_providers.service import _Attempts, _execute_text_hedged, _hedge_delay_seconds
+
+REQ = AiTextGenerateRequest(project_id=9, prompt="hi", max_output_tokens=50)
+
+
+@pytest.fixture(autouse=True)
+def hedge(monkeypatch, providers) -> None:
+    monkeypatch.setattr(service, "auto_order", lambda kind, model_name=None: ["openai", "gemini"])
+    monkeypatch.setattr(settings, "ai_hedge_delay_ms", 50)
+
+
+def _run(attempts: _Attempts) -> tuple[dict | None, float]:
+    started = time.perf_counter()
+    result = asyncio.run(_execute_text_hedged(REQ, attempts))
+    return result, time.perf_counter() - started
+
+
+def test_fast_primary_does_not_fire_the_hedge(providers) -> None:
+    providers.reply("openai", "fast")
+    providers.reply("gemini", "unused")
+    attempts = _Attempts("ai_text", 9, 2)
+
+    result, _ = _run(attempts)
+
+    assert result["text"] == "fast"
+    assert providers.calls == ["openai"]
+    assert attempts.execution == {"hedge_fired": False, "hedge_delay_ms": 50, "winner": "openai"}
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled(providers) -> None:
+    providers.reply("openai", "slow", delay=5)
+    providers.reply("gemini", "hedged")
+    attempts = _Attempts("ai_text", 9, 2)
+
+    result, elapsed = _run(attempts)
+
+    assert result["provider"] == "gemini"
+    assert elapsed < 1
+    assert providers.calls == ["openai", "gemini"]
+    assert providers.cancelled == ["openai"]
+    assert attempts.execution["hedge_fired"] is True
+    assert attempts.execution["winner"] == "gemini"
+    assert attempts.errors == []
+
+
+def test_primary_failure_starts_the_secondary_without_waiting(providers, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "ai_hedge_delay_ms", 5000)
+    providers.fail("openai", 503)
+    providers.reply("gemini", "fallback")
+    attempts = _Attempts("ai_text", 9, 2)
+
+    result, elapsed = _run(attempts)
+
+    assert result["provider"] == "gemini"
+    assert elapsed < 1
+    assert attempts.execution["hedge_fired"] is False
+    assert attempts.statuses == [503]
+
+
+def test_both_attempts_failing_returns_none(providers) -> None:
+    providers.fail("openai", 503, delay=0.1)
+    providers.fail("gemini", 502)
+    attempts = _Attempts("ai_text", 9, 2)
+
+    result, _ = _run(attempts)
+
+    assert result is None
+    assert attempts.statuses == [503, 503]
+    assert [e.split(":")[0] for e in attempts.errors] == ["gemini", "openai"]
+    assert attempts.all_unavailable
+    assert "winner" not in attempts.execution
+
+
+def test_hedge_delay_uses_the_rolling_p95_once_warm(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "ai_hedge_min_samples", 3)
+    model = settings.openai_model_text
+    assert _hedge_delay_seconds("openai", model) == 0.05
+    for latency_ms in (100, 200, 300):
+        service.provider_metrics.record_success("openai", model, latency_ms)
+    assert 0.2 <= _hedge_delay_seconds("openai", model) <= 0.3
@@ -0,0 +1,33 @@
+import asyncio
+
+from src.core.jobs import JobQueue
+
+
+def test_job_queue_runs_jobs_and_drops_pending_on_stop() -> None:
+    async def scenario() -> tuple[list[int], list[int], bool]:
+        done: list[int] = []
+        dropped: list[int] = []
+        blocked = asyncio.Event()
+
+        async def handler(job: int) -> None:
+            if job > 1:
+                await blocked.wait()
+            done.append(job)
+
+        async def on_drop(job: int) -> None:
+            dropped.append(job)
+
+        queue: JobQueue[int] = JobQueue("test", handler, workers=1, max_size=2, on_drop=on_drop)
+        assert queue.submit(1)
+        assert queue.submit(2)
+        await asyncio.sleep(0)
+        assert queue.submit(3)
+        assert queue.submit(4)
+        accepted = queue.submit(5)
+        await queue.stop()
+        return done, dropped, accepted
+
+    done, dropped, accepted = asyncio.run(scenario())
+    assert accepted is False
+    assert done == [1]
+    assert dropped == [3, 4]
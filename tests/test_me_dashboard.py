@@ -0,0 +1,153 @@
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.core.security import User
+from src.modules.me_dashboard import cache as dashboard_cache
+from src.modules.me_dashboard import service
+from src.modules.me_dashboard.cache import DashboardCache
+from src.modules.me_dashboard.service import get_me_dashboard
+
+USER = User(id=5, email="dev@example.com", roles=set())
+
+
+def _row(project_id: int, day: int, failed: int, cost: str) -> dict:
+    return {
+        "project_id": project_id,
+        "project_key": f"p{project_id}",
+        "project_name": f"Project {project_id}",
+        "lifecycle_status": "active",
+        "updated_at": datetime(2026, 1, day),
+        "blocked_stages_count": 1,
+        "failed_runs_count_7d": Decimal(failed),
+        "queued_runs_count": Decimal(2),
+        "cost_usd_total_30d": Decimal(cost),
+        "published_artifacts_count": 3,
+    }
+
+
+class FakeResult:
+    def __init__(self, rows: list[dict]) -> None:
+        self.rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows: list[dict]) -> None:
+        self.rows = rows
+        self.statements: list[str] = []
+        self.fail = False
+        self.rollbacks = 0
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        if self.fail:
+            raise OperationalError("SELECT", {}, Exception("max execution time exceeded"))
+        return FakeResult(self.rows)
+
+    def rollback(self) -> None:
+        self.rollbacks += 1
+
+
+class FakeMemberships:
+    def projects_for_user(self, db, user_id: int) -> dict[int, str]:
+        return {1: "admin", 2: "viewer", 3: "operator"}
+
+
+@pytest.fixture
+def cache(monkeypatch) -> DashboardCache:
+    cache = DashboardCache(max_entries=16, ttl_seconds=60, stale_seconds=60, wait_seconds=5)
+    monkeypatch.setattr(service, "dashboards", cache)
+    monkeypatch.setattr(service, "memberships", FakeMemberships())
+    return cache
+
+
+def _expire(cache: DashboardCache, user_id: int) -> None:
+    entry = cache._cache.get(user_id)
+    cache._cache.set(user_id, dashboard_cache._Entry(0.0, entry.dashboard))
+
+
+def test_dashboard_is_one_query_and_cached(cache: DashboardCache) -> None:
+    db = FakeSession([_row(1, 3, 1, "0.5"), _row(2, 9, 0, "1.25"), _row(3, 5, 4, "0")])
+    out = get_me_dashboard(db, USER, limit=2)
+    assert len(db.statements) == 1
+    assert "MAX_EXECUTION_TIME" not in db.statements[0]
+    assert [(p.project_id, p.member_role) for p in out.projects] == [(2, "viewer"), (3, "operator")]
+    kpis = out.kpis
+    assert (kpis.projects_count, kpis.blocked_stages_count, kpis.failed_runs_count_7d) == (3, 3, 5)
+    assert (kpis.queued_runs_count, kpis.published_artifacts_count) == (6, 9)
+    assert kpis.cost_usd_total_30d == 1.75
+
+    # Every limit is served from the same cached dashboard.
+    assert len(get_me_dashboard(db, USER, limit=20).projects) == 3
+    assert len(db.statements) == 1
+
+
+def test_slow_refresh_serves_the_stale_copy(cache: DashboardCache) -> None:
+    db = FakeSession([_row(1, 3, 1, "0.5")])
+    first = get_me_dashboard(db, USER)
+    _expire(cache, USER.id)
+
+    db.fail = True
+    assert get_me_dashboard(db, USER) == first
+    assert "MAX_EXECUTION_TIME(" in db.statements[-1]
+    assert db.rollbacks == 1
+
+    # Without a stale copy the error reaches the caller.
+    cache.invalidate(USER.id)
+    with pytest.raises(OperationalError):
+        get_me_dashboard(db, USER)
+
+
+def test_concurrent_requests_share_one_refresh(cache: DashboardCache) -> None:
+    started = threading.Event()
+    release = threading.Event()
+    calls: list[bool] = []
+
+    def load(has_stale: bool):
+        calls.append(has_stale)
+        started.set()
+        release.wait(5)
+        return service._compute_dashboard(FakeSession([_row(1, 3, 1, "0.5")]), 7, None)
+
+    results: list = []
+    leader = threading.Thread(target=lambda: results.append(cache.get(7, load)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(cache.get(7, load)))
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert calls == [False]
+    assert len(results) == 2 and results[0] == results[1]
+
+
+def test_follower_stops_waiting_for_a_stuck_refresh(cache: DashboardCache) -> None:
+    cache.wait_seconds = 0.05
+    release = threading.Event()
+    started = threading.Event()
+
+    def stuck(has_stale: bool):
+        started.set()
+        release.wait(5)
+        return service._compute_dashboard(FakeSession([_row(1, 3, 1, "0.5")]), 7, None)
+
+    leader = threading.Thread(target=lambda: cache.get(7, stuck))
+    leader.start()
+    started.wait(5)
+    own = service._compute_dashboard(FakeSession([_row(2, 4, 0, "1")]), 7, None)
+
+    # No stale copy and the leader is still running: the follower computes its own.
+    assert cache.get(7, lambda has_stale: own) == own
+    release.set()
+    leader.join(5)
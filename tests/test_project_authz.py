@@ -0,0 +1,228 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from src.core import project_authz
+from src.core.memberships import MembershipCache
+from src.core.project_authz import (
+    PROJECT_ALL_ROLES,
+    PROJECT_RW_ROLES,
+    forget_project_access,
+    require_project_role,
+)
+from src.core.security import User, create_access_token, decode_access_token
+from src.modules.project_permissions.service import get_my_project_permissions
+
+USER = User(id=5, email="dev@example.com", roles=set())
+NOW = datetime(2026, 1, 1, 12, 0)
+
+
+class FakeResult:
+    def __init__(self, rows: list) -> None:
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def mappings(self):
+        return self
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar_one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeSession:
+    """Answers the version reads, the membership load and the project lookup."""
+
+    def __init__(self, members: dict[int, str], projects: set[int], version: int = 1) -> None:
+        self.members = members
+        self.projects = projects
+        self.version = version
+        # user_id -> membership_version, as stored in user_membership_versions.
+        self.user_versions: dict[int, int] = {}
+        self.info: dict = {}
+        self.queries: list[str] = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if "FROM membership_version" in sql:
+            self.queries.append("version")
+            return FakeResult([(self.version, NOW)])
+        if "FROM user_membership_versions" in sql:
+            self.queries.append("changes")
+            return FakeResult([(u, v, NOW) for u, v in self.user_versions.items()])
+        if "FROM project_members WHERE user_id" in sql:
+            self.queries.append("members")
+            return FakeResult(list(self.members.items()))
+        self.queries.append("project")
+        project_id = params["project_id"]
+        if project_id not in self.projects:
+            return FakeResult([])
+        return FakeResult([{"project_id": project_id, "member_role": self.members.get(project_id)}])
+
+
+@pytest.fixture
+def cache(monkeypatch) -> MembershipCache:
+    cache = MembershipCache(
+        max_entries=16, ttl_seconds=60, version_check_seconds=0, token_window=timedelta(hours=8)
+    )
+    monkeypatch.setattr(project_authz, "memberships", cache)
+    return cache
+
+
+def test_members_are_answered_from_the_cache(cache: MembershipCache) -> None:
+    db = FakeSession({9: "operator"}, {9})
+    assert require_project_role(db, 9, USER, PROJECT_RW_ROLES) == "operator"
+    assert require_project_role(db, 9, USER, PROJECT_ALL_ROLES) == "operator"
+    permissions = get_my_project_permissions(db, 9, USER)
+    assert permissions.can_edit_project and not permissions.can_manage_members
+    assert db.queries == ["version", "changes", "members"]
+
+    # A new request reuses the worker-wide entry; only the version is checked.
+    db.info.clear()
+    db.queries.clear()
+    assert require_project_role(db, 9, USER, PROJECT_RW_ROLES) == "operator"
+    assert db.queries == ["version"]
+
+
+def test_version_change_from_another_worker_drops_the_cache(cache: MembershipCache) -> None:
+    db = FakeSession({9: "operator"}, {9})
+    require_project_role(db, 9, USER, PROJECT_RW_ROLES)
+
+    db.members[9] = "viewer"
+    db.version = 2
+    db.user_versions[USER.id] = 1
+    db.info.clear()
+    with pytest.raises(HTTPException) as exc:
+        require_project_role(db, 9, USER, PROJECT_RW_ROLES)
+    assert exc.value.status_code == 403
+
+
+def test_local_invalidation_and_request_memo(cache: MembershipCache) -> None:
+    db = FakeSession({9: "operator"}, {9})
+    require_project_role(db, 9, USER, PROJECT_RW_ROLES)
+
+    db.members[9] = "viewer"
+    cache.invalidate(USER.id)
+    forget_project_access(db, 9)
+    assert require_project_role(db, 9, USER, PROJECT_ALL_ROLES) == "viewer"
+
+
+def test_missing_project_and_non_member(cache: MembershipCache) -> None:
+    db = FakeSession({}, {9})
+    with pytest.raises(HTTPException) as exc:
+        require_project_role(db, 10, USER, PROJECT_ALL_ROLES)
+    assert exc.value.status_code == 404
+
+    with pytest.raises(HTTPException) as exc:
+        require_project_role(db, 9, USER, PROJECT_ALL_ROLES)
+    assert exc.value.status_code == 403
+    assert db.queries == ["version", "changes", "members", "project", "version", "project"]
+
+
+def _claims_user(project_roles: dict[int, str], version: int) -> User:
+    token = create_access_token(
+        user_id=USER.id,
+        email=USER.email,
+        roles=["operator"],
+        project_roles=project_roles,
+        membership_version=version,
+    )
+    return decode_access_token(token)
+
+
+def test_project_claims_round_trip() -> None:
+    user = _claims_user({9: "operator", 12: "admin"}, 3)
+    assert user.project_roles == {9: "operator", 12: "admin"}
+    assert user.membership_version == 3
+
+    plain = decode_access_token(create_access_token(USER.id, USER.email, ["viewer"]))
+    assert (plain.project_roles, plain.membership_version) == (None, None)
+
+
+def test_current_claims_skip_the_membership_lookup(cache: MembershipCache) -> None:
+    db = FakeSession({9: "operator"}, {9})
+    db.user_versions = {USER.id: 2}
+    user = _claims_user({9: "operator"}, 2)
+    assert require_project_role(db, 9, user, PROJECT_RW_ROLES) == "operator"
+    assert db.queries == ["version", "changes"]
+
+    db.queries.clear()
+    db.info.clear()
+    assert require_project_role(db, 9, user, PROJECT_RW_ROLES) == "operator"
+    assert db.queries == ["version"]
+
+
+def test_stale_claims_fall_back_to_the_lookup(cache: MembershipCache) -> None:
+    db = FakeSession({9: "viewer"}, {9})
+    db.user_versions = {USER.id: 3}
+    user = _claims_user({9: "operator"}, 2)
+    with pytest.raises(HTTPException) as exc:
+        require_project_role(db, 9, user, PROJECT_RW_ROLES)
+    assert exc.value.status_code == 403
+    assert "members" in db.queries
+
+
+class ClockedSession(FakeSession):
+    """A session west of UTC: NOW() and changed_at are local, UTC_TIMESTAMP() is not."""
+
+    def __init__(self, members: dict[int, str], projects: set[int]) -> None:
+        super().__init__(members, projects)
+        self.local_now = NOW
+        self.utc_offset = timedelta(hours=-5)
+        # user_id -> (membership_version, changed_at in the session time zone).
+        self.changes: dict[int, tuple[int, datetime]] = {}
+
+    def change(self, user_id: int) -> None:
+        self.local_now += timedelta(seconds=1)
+        self.version += 1
+        version = self.changes.get(user_id, (0, NOW))[0] + 1
+        self.changes[user_id] = (version, self.local_now)
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if "FROM membership_version" in sql:
+            self.queries.append("version")
+            clock = self.local_now if "NOW()" in sql else self.local_now - self.utc_offset
+            return FakeResult([(self.version, clock)])
+        if "FROM user_membership_versions" in sql:
+            self.queries.append("changes")
+            return FakeResult(
+                [(u, v, at) for u, (v, at) in self.changes.items() if at >= params["since"]]
+            )
+        return super().execute(statement, params)
+
+
+def test_changes_are_seen_when_the_session_is_not_utc(cache: MembershipCache) -> None:
+    db = ClockedSession({9: "operator"}, {9})
+    assert require_project_role(db, 9, USER, PROJECT_RW_ROLES) == "operator"
+
+    db.members[9] = "viewer"
+    db.change(USER.id)
+    db.info.clear()
+    with pytest.raises(HTTPException) as exc:
+        require_project_role(db, 9, USER, PROJECT_RW_ROLES)
+    assert exc.value.status_code == 403
+
+
+def test_revoked_claims_are_rejected_when_the_session_is_not_utc(
+    cache: MembershipCache,
+) -> None:
+    db = ClockedSession({9: "operator"}, {9})
+    db.changes = {USER.id: (1, NOW - timedelta(hours=1))}
+    user = _claims_user({9: "operator"}, 1)
+    assert require_project_role(db, 9, user, PROJECT_RW_ROLES) == "operator"
+    assert "members" not in db.queries
+
+    # The role is revoked after the token was issued; its claim must stop counting.
+    del db.members[9]
+    db.change(USER.id)
+    db.info.clear()
+    assert not cache.token_is_current(db, USER.id, 1)
+    with pytest.raises(HTTPException) as exc:
+        require_project_role(db, 9, user, PROJECT_RW_ROLES)
+    assert exc.value.status_code == 403
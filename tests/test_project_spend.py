@@ -0,0 +1,90 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.exc import ProgrammingError
+
+from src.modules.project_budgets.service import _load_budgets
+from src.modules.project_budgets.spend import (
+    BUDGET_HARD_EXCEEDED,
+    BUDGET_OK,
+    BUDGET_SOFT_EXCEEDED,
+    Budget,
+    ProjectSpendTracker,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.period = date(2026, 1, 1)
+
+    def __call__(self) -> float:
+        return self.now
+
+    def current_period(self) -> date:
+        return self.period
+
+
+def _tracker() -> tuple[ProjectSpendTracker, FakeClock]:
+    clock = FakeClock()
+    return ProjectSpendTracker(clock=clock, period=clock.current_period), clock
+
+
+def test_records_spend_against_soft_and_hard_limits() -> None:
+    tracker, clock = _tracker()
+    tracker.load(clock.period, {1: 4.0}, {1: Budget(soft_limit_usd=5.0, hard_limit_usd=10.0)})
+
+    assert tracker.status(1) == BUDGET_OK
+    tracker.record(1, 1.5)
+    assert tracker.status(1) == BUDGET_SOFT_EXCEEDED
+    assert tracker.first_soft_warning(1) is True
+    assert tracker.first_soft_warning(1) is False
+    tracker.record(1, 4.5)
+    assert tracker.status(1) == BUDGET_HARD_EXCEEDED
+    assert tracker.status(2) == BUDGET_OK
+
+
+def test_reconcile_replaces_local_counts_and_month_rollover_resets() -> None:
+    tracker, clock = _tracker()
+    assert tracker.is_stale(60)
+    tracker.load(clock.period, {1: 2.0}, {1: Budget(hard_limit_usd=3.0)})
+    tracker.record(1, 0.5)
+    tracker.load(clock.period, {1: 3.5}, {1: Budget(hard_limit_usd=3.0)})
+    assert tracker.spent(1) == 3.5
+    assert tracker.status(1) == BUDGET_HARD_EXCEEDED
+
+    clock.now = 61
+    assert tracker.is_stale(60)
+    clock.period = date(2026, 2, 1)
+    assert tracker.spent(1) == 0.0
+    assert tracker.status(1) == BUDGET_OK
+
+
+def test_only_one_reconciliation_at_a_time() -> None:
+    tracker, _ = _tracker()
+    assert tracker.try_begin_reconcile() is True
+    assert tracker.try_begin_reconcile() is False
+    tracker.end_reconcile()
+    assert tracker.try_begin_reconcile() is True
+
+
+def test_pending_spend_counts_toward_the_limits() -> None:
+    tracker, clock = _tracker()
+    tracker.load(clock.period, {1: 4.0}, {1: Budget(hard_limit_usd=5.0)})
+    assert tracker.status(1, pending_usd=0.5) == BUDGET_OK
+    assert tracker.status(1, pending_usd=1.0) == BUDGET_HARD_EXCEEDED
+    assert tracker.spent(1) == 4.0
+
+
+class MissingTableSession:
+    def __init__(self, errno: int) -> None:
+        self.errno = errno
+
+    def execute(self, statement, params=None):
+        raise ProgrammingError(str(statement), params, Exception(self.errno, "mysql error"))
+
+
+def test_missing_budgets_table_means_no_budgets() -> None:
+    assert _load_budgets(MissingTableSession(1146)) == {}
+    with pytest.raises(ProgrammingError):
+        _load_budgets(MissingTableSession(1064))
@@ -0,0 +1,36 @@
+import asyncio
+
+from src.modules.ai_providers.clients import ProviderClientRegistry
+
+
+def test_clients_are_reused_per_provider_and_closed_on_shutdown() -> None:
+    registry = ProviderClientRegistry()
+
+    async def scenario():
+        openai = registry.get_async("openai")
+        assert registry.get_async("openai") is openai
+        gemini = registry.get_async("gemini")
+        assert gemini is not openai
+        assert sorted(item["provider"] for item in registry.stats()) == ["gemini", "openai"]
+
+        await registry.aclose()
+        assert openai.is_closed and gemini.is_closed
+        assert registry.stats() == []
+        # A call after shutdown gets a fresh pool instead of the closed one.
+        reopened = registry.get_async("openai")
+        assert reopened is not openai and not reopened.is_closed
+        await registry.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_clients_are_not_shared_across_event_loops() -> None:
+    registry = ProviderClientRegistry()
+
+    async def get():
+        return registry.get_async("openai")
+
+    first = asyncio.run(get())
+    second = asyncio.run(get())
+    assert first is not second
+    assert [item["provider"] for item in registry.stats()] == ["openai"]
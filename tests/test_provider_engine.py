@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+
+from src.core.config import settings
+from src.modules.ai_providers import service
+from src.modules.ai_providers.schemas import AiImageGenerateRequest, AiTextGenerateRequest
+from src.modules.ai_providers.service import _Attempts, _execute_image_async, _execute_text_async
+
+
+def _req(**overrides) -> AiTextGenerateRequest:
+    return AiTextGenerateRequest(
+        project_id=9, prompt="hi", provider_preference="openai", max_output_tokens=50, **overrides
+    )
+
+
+def test_unavailable_provider_falls_back_to_the_next(providers) -> None:
+    providers.fail("openai", 503)
+    providers.reply("gemini", "hola")
+    attempts = _Attempts("ai_text", 9, 2)
+
+    result = asyncio.run(_execute_text_async(_req(), attempts))
+
+    assert (result["provider"], result["text"]) == ("gemini", "hola")
+    assert (result["token_input_count"], result["token_output_count"]) == (3, 2)
+    assert providers.calls == ["openai", "gemini"]
+    assert attempts.statuses == [503]
+    assert attempts.errors[0].startswith("openai: OpenAI text call failed: 503")
+    assert service.circuit_breakers.get("openai").consecutive_failures == 1
+    metrics = service.provider_metrics.snapshot("openai", settings.openai_model_text)
+    assert metrics["error_rate"] == 1
+
+
+def test_open_circuit_skips_the_provider(providers, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "ai_circuit_failure_threshold", 1)
+    service.circuit_breakers.record_failure("openai")
+    providers.reply("gemini", "hola")
+    attempts = _Attempts("ai_text", 9, 2)
+
+    result = asyncio.run(_execute_text_async(_req(), attempts))
+
+    assert result["provider"] == "gemini"
+    assert providers.calls == ["gemini"]
+    assert attempts.execution["skipped"] == {"openai": "circuit_open"}
+
+
+def test_client_errors_are_not_reported_as_unavailable(providers) -> None:
+    providers.fail("openai", 400)
+    providers.fail("gemini", 400)
+    attempts = _Attempts("ai_text", 9, 2)
+
+    assert asyncio.run(_execute_text_async(_req(), attempts)) is None
+    assert attempts.statuses == [400, 400]
+    assert not attempts.all_unavailable
+    assert service.circuit_breakers.get("openai").consecutive_failures == 0
+
+
+def test_image_generation_uses_the_async_engine(providers) -> None:
+    async def image(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"data": [{"b64_json": "aGk="}]})
+
+    providers.handlers["openai"] = image
+    attempts = _Attempts("ai_image", 9, 2)
+    req = AiImageGenerateRequest(project_id=9, prompt="a cat", provider_preference="openai")
+
+    result = asyncio.run(_execute_image_async(req, attempts))
+
+    assert (result["provider"], result["image_base64"]) == ("openai", "aGk=")
+    assert providers.calls == ["openai"]
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from src.modules.ai_providers.rate_limiter import ProviderRateLimiter, parse_limit_overrides
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+        self.slept: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    """A clock that queued waiters advance: sleeping yields first, then moves time on."""
+    fake = FakeClock()
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds: float) -> None:
+        await real_sleep(0)
+        fake.slept.append(seconds)
+        fake.now += seconds
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    return fake
+
+
+def _limiter(
+    clock: FakeClock,
+    rpm: int = 2,
+    tpm: int = 0,
+    max_wait_seconds: float = 0,
+    max_queue: int = 4,
+) -> ProviderRateLimiter:
+    return ProviderRateLimiter(
+        "openai",
+        "gpt",
+        rpm=rpm,
+        tpm=tpm,
+        max_wait_seconds=max_wait_seconds,
+        max_queue=max_queue,
+        clock=clock,
+    )
+
+
+def test_rpm_bucket_rejects_burst_and_refills(clock: FakeClock) -> None:
+    limiter = _limiter(clock)
+    assert asyncio.run(limiter.acquire_async(0))
+    assert asyncio.run(limiter.acquire_async(0))
+    assert not asyncio.run(limiter.acquire_async(0))
+    assert limiter.snapshot()["rejected"] == 1
+    clock.now += 30
+    assert asyncio.run(limiter.acquire_async(0))
+
+
+def test_tpm_bucket_is_settled_with_real_usage(clock: FakeClock) -> None:
+    limiter = _limiter(clock, rpm=0, tpm=1000)
+    assert asyncio.run(limiter.acquire_async(800))
+    assert not asyncio.run(limiter.acquire_async(800))
+    limiter.settle(800, 100)
+    assert asyncio.run(limiter.acquire_async(800))
+
+
+def test_queued_caller_waits_for_capacity_then_is_admitted(clock: FakeClock) -> None:
+    limiter = _limiter(clock, max_wait_seconds=60)
+    assert asyncio.run(limiter.acquire_async(0))
+    assert asyncio.run(limiter.acquire_async(0))
+
+    # The bucket refills one request every 30s, well within the 60s wait.
+    assert asyncio.run(limiter.acquire_async(0))
+    assert clock.slept == [30.0]
+    stats = limiter.snapshot()
+    assert (stats["admitted"], stats["waited"], stats["waiting"]) == (3, 1, 0)
+
+
+def test_callers_beyond_max_queue_are_rejected(clock: FakeClock) -> None:
+    limiter = _limiter(clock, rpm=1, max_wait_seconds=120, max_queue=1)
+    assert asyncio.run(limiter.acquire_async(0))
+
+    async def both() -> list[bool]:
+        return list(await asyncio.gather(limiter.acquire_async(0), limiter.acquire_async(0)))
+
+    # The first caller takes the only queue slot; the second is turned away at once.
+    assert asyncio.run(both()) == [True, False]
+    assert clock.slept == [60.0]
+    stats = limiter.snapshot()
+    assert (stats["rejected"], stats["waiting"]) == (1, 0)
+
+
+def test_wait_past_the_deadline_is_rejected_without_sleeping(clock: FakeClock) -> None:
+    limiter = _limiter(clock, max_wait_seconds=60)
+    assert asyncio.run(limiter.acquire_async(0))
+    assert asyncio.run(limiter.acquire_async(0))
+
+    # The next slot is 30s away: too far for a request with 10s left.
+    assert not asyncio.run(limiter.acquire_async(0, max_wait=10))
+    assert clock.slept == []
+    assert limiter.snapshot()["rejected"] == 1
+    assert asyncio.run(limiter.acquire_async(0, max_wait=45))
+
+
+def test_parse_limit_overrides_skips_invalid_entries() -> None:
+    overrides = parse_limit_overrides("openai:gpt-5.2=500/200000, bad, gemini:flash=60/0")
+    assert overrides == {("openai", "gpt-5.2"): (500, 200000), ("gemini", "flash"): (60, 0)}
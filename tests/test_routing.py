@@ -0,0 +1,43 @@
+from src.core.config import settings
+from src.modules.ai_providers import routing
+from src.modules.ai_providers.metrics import ProviderMetrics
+
+
+def _metrics(monkeypatch) -> ProviderMetrics:
+    metrics = ProviderMetrics()
+    monkeypatch.setattr(routing, "provider_metrics", metrics)
+    monkeypatch.setattr(settings, "ai_routing_adaptive", True)
+    monkeypatch.setattr(settings, "ai_routing_min_samples", 3)
+    monkeypatch.setattr(settings, "ai_routing_max_text_cost_per_1k", 0.0)
+    return metrics
+
+
+def test_auto_order_keeps_static_order_until_warm(monkeypatch) -> None:
+    metrics = _metrics(monkeypatch)
+    for _ in range(3):
+        metrics.record_success("openai", settings.openai_model_text, 5000)
+    table = routing.routing_table("text")
+    assert table["reason"] == "cold_start"
+    assert table["order"] == ["openai", "gemini"]
+
+
+def test_auto_order_prefers_faster_and_healthier_provider(monkeypatch) -> None:
+    metrics = _metrics(monkeypatch)
+    for _ in range(3):
+        metrics.record_success("openai", settings.openai_model_text, 900)
+        metrics.record_success("gemini", settings.gemini_model_text, 400)
+    assert routing.auto_order("text") == ["gemini", "openai"]
+
+    for _ in range(3):
+        metrics.record_failure("gemini", settings.gemini_model_text)
+    assert routing.auto_order("text") == ["openai", "gemini"]
+
+
+def test_cost_ceiling_pushes_expensive_provider_last(monkeypatch) -> None:
+    metrics = _metrics(monkeypatch)
+    for _ in range(3):
+        metrics.record_success("openai", settings.openai_model_text, 100)
+        metrics.record_success("gemini", settings.gemini_model_text, 900)
+    monkeypatch.setattr(settings, "ai_routing_max_text_cost_per_1k", 0.01)
+    monkeypatch.setattr(settings, "openai_text_output_cost_per_1k", 0.05)
+    assert routing.auto_order("text") == ["gemini", "openai"]
@@ -0,0 +1,175 @@
+import asyncio
+from types import SimpleNamespace
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import OperationalError
+
+from src.core.config import settings
+from src.modules.agent_runs import writer as run_writer_module
+from src.modules.agent_runs.ids import RunIdAllocator
+from src.modules.agent_runs.schemas import AgentRunCreate
+from src.modules.agent_runs.writer import AgentRunWriter, record_agent_run
+
+
+class FakeAllocator:
+    running_low = False
+
+    def __init__(self) -> None:
+        self.next_id = 500
+
+    def reserve(self, count: int = 1) -> list[int]:
+        first, self.next_id = self.next_id, self.next_id + count
+        return list(range(first, first + count))
+
+
+class FakeDatabase:
+    def __init__(self) -> None:
+        self.available = True
+        self.inserts: list[dict] = []
+
+    def session(self) -> "FakeDatabase.Session":
+        return FakeDatabase.Session(self)
+
+    class Session:
+        def __init__(self, database: "FakeDatabase") -> None:
+            self.database = database
+
+        def execute(self, statement, params=None):
+            if not self.database.available:
+                raise OperationalError(str(statement), params, Exception("down"))
+            self.database.inserts.append(params)
+
+        def commit(self) -> None:
+            pass
+
+        def rollback(self) -> None:
+            pass
+
+        def close(self) -> None:
+            pass
+
+
+def _writer(database: FakeDatabase, tmp_path) -> AgentRunWriter:
+    return AgentRunWriter(
+        allocator=FakeAllocator(),
+        max_queue=10,
+        batch_size=3,
+        flush_seconds=60,
+        journal_path=str(tmp_path / "runs.jsonl"),
+        session_factory=database.session,
+    )
+
+
+def _run(index: int) -> AgentRunCreate:
+    return AgentRunCreate(
+        project_id=1,
+        agent_id=2,
+        run_status="success",
+        trigger_source="api",
+        output_payload={"text": f"t{index}"},
+    )
+
+
+def test_submit_returns_reserved_ids_and_stop_flushes_in_batches(tmp_path) -> None:
+    database = FakeDatabase()
+    writer = _writer(database, tmp_path)
+
+    async def scenario() -> list[int]:
+        assert writer.submit([_run(0)]) is None  # not started: caller inserts directly
+        writer.start()
+        ids = writer.submit([_run(i) for i in range(4)])
+        assert writer.submit([_run(i) for i in range(7)]) is None  # queue would overflow
+        await writer.stop()
+        return ids
+
+    assert asyncio.run(scenario()) == [500, 501, 502, 503]
+    assert len(database.inserts) == 2
+    assert database.inserts[0]["agent_run_id_2"] == 502
+    assert database.inserts[1]["agent_run_id_0"] == 503
+    assert writer.stats()["flushed"] == 4
+
+
+def test_batches_spill_to_the_journal_and_replay_when_the_db_is_back(tmp_path) -> None:
+    database = FakeDatabase()
+    writer = _writer(database, tmp_path)
+    database.available = False
+    assert writer.flush([(7, _run(0)), (8, _run(1))]) is False
+    assert (tmp_path / "runs.jsonl").read_text().count("\n") == 2
+
+    database.available = True
+    writer.replay_journal()
+    assert not (tmp_path / "runs.jsonl").exists()
+    assert [database.inserts[0]["agent_run_id_0"], database.inserts[0]["agent_run_id_1"]] == [7, 8]
+    assert database.inserts[0]["output_payload_1"] == '{"text": "t1"}'
+    assert writer.stats()["replayed"] == 2
+
+
+def test_waiting_submit_returns_once_the_row_is_written(tmp_path) -> None:
+    database = FakeDatabase()
+    writer = _writer(database, tmp_path)
+
+    async def scenario() -> list[int]:
+        writer.start()
+        ids = await run_in_threadpool(writer.submit, [_run(0)], True)
+        inserted = [params["agent_run_id_0"] for params in database.inserts]
+        # Waiting from the event loop itself would deadlock: the caller inserts instead.
+        assert writer.submit([_run(1)], wait=True) is None
+        await writer.stop()
+        return ids + inserted
+
+    assert asyncio.run(scenario()) == [500, 500]
+    assert writer.stats()["queued"] == 0
+
+
+def test_recorded_runs_return_their_id_before_the_flush(monkeypatch, tmp_path) -> None:
+    database = FakeDatabase()
+    writer = _writer(database, tmp_path)
+    monkeypatch.setattr(run_writer_module, "run_writer", writer)
+    monkeypatch.setattr(settings, "ai_run_write_behind_enabled", True)
+
+    async def scenario() -> tuple[int, int]:
+        writer.start()
+        run_id = await run_in_threadpool(record_agent_run, None, _run(0))
+        inserted_before_stop = len(database.inserts)
+        await writer.stop()
+        return run_id, inserted_before_stop
+
+    assert asyncio.run(scenario()) == (500, 0)
+    assert database.inserts[0]["agent_run_id_0"] == 500
+
+
+class FakeAllocatorSession:
+    def __init__(self, statements: list[str]) -> None:
+        self.statements = statements
+        self.last_insert_id = 0
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        if params:
+            self.last_insert_id = 100 * len(self.statements) + params["size"]
+        return SimpleNamespace(scalar_one=lambda: self.last_insert_id)
+
+    def commit(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def test_allocator_prefetches_the_next_block() -> None:
+    statements: list[str] = []
+    allocator = RunIdAllocator(4, session_factory=lambda: FakeAllocatorSession(statements))
+
+    assert allocator.running_low
+    allocator.prefetch()
+    assert not allocator.running_low
+    assert allocator.reserve(2) == [100, 101]
+    assert not allocator.running_low
+    assert allocator.reserve(1) == [102]
+    assert allocator.running_low
+    allocator.prefetch()
+    reserved = len(statements)
+    # The last id of the block cannot fit two; the block reserved ahead is used instead,
+    # without another trip to the DB.
+    assert allocator.reserve(2) == [300, 301]
+    assert len(statements) == reserved
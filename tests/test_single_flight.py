@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.core.config import settings
+from src.core.security import User
+from src.modules.ai_providers import service
+from src.modules.ai_providers.schemas import AiTextGenerateRequest
+from src.modules.ai_providers.service import generate_text_async
+
+USER = User(id=5, email="dev@example.com", roles=set())
+REQ = AiTextGenerateRequest(
+    project_id=9, prompt="hi", provider_preference="openai", max_output_tokens=50
+)
+
+
+@pytest.fixture(autouse=True)
+def single_flight(monkeypatch, providers, runs) -> None:
+    monkeypatch.setattr(settings, "ai_single_flight_enabled", True)
+    monkeypatch.setattr(settings, "ai_text_cache_enabled", False)
+    monkeypatch.setattr(service, "_text_inflight", {})
+
+
+def _generate_concurrently(count: int) -> list:
+    async def scenario() -> list:
+        calls = [generate_text_async(None, USER, REQ) for _ in range(count)]
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    return asyncio.run(scenario())
+
+
+def test_followers_share_the_leader_call(providers, runs) -> None:
+    providers.reply("openai", "shared", delay=0.1)
+
+    leader, *followers = _generate_concurrently(3)
+
+    assert providers.calls == ["openai"]
+    assert not leader.coalesced and leader.text == "shared"
+    for follower in followers:
+        assert (follower.coalesced, follower.text, follower.cost_usd) == (True, "shared", 0.0)
+    assert len({leader.run_id, *(f.run_id for f in followers)}) == 3
+    executions = [p.output_payload["execution"] for p in runs.payloads[1:]]
+    assert executions == [{"coalesced": True, "coalesced_from_run_id": leader.run_id}] * 2
+    # Nothing in these requests references the run ids, so none waits for its row.
+    assert runs.waits == [False] * 3
+
+
+def test_leader_failure_reaches_every_follower(providers, runs) -> None:
+    providers.fail("openai", 400, delay=0.1)
+    providers.fail("gemini", 400)
+
+    outcomes = _generate_concurrently(3)
+
+    assert providers.calls == ["openai", "gemini"]
+    assert all(isinstance(o, HTTPException) and o.status_code == 400 for o in outcomes)
+    assert [p.run_status for p in runs.payloads] == ["failed"] * 3
+    # Followers are released before the leader records its run, so match by payload.
+    payloads = sorted(runs.payloads, key=lambda p: p.output_payload is not None)
+    assert [p.output_payload for p in payloads] == [None, *[{"execution": {"coalesced": True}}] * 2]
+    assert len({p.error_message for p in payloads}) == 1
+
+
+def test_key_is_released_after_the_flight(providers) -> None:
+    providers.reply("openai", "first", delay=0.05)
+    _generate_concurrently(2)
+    assert service._text_inflight == {}
+
+    providers.fail("openai", 400)
+    providers.fail("gemini", 400)
+    _generate_concurrently(1)
+    assert service._text_inflight == {}
+
+    # A later identical request starts its own provider call.
+    providers.reply("openai", "second")
+    [later] = _generate_concurrently(1)
+    assert (later.text, later.coalesced) == ("second", False)
+    assert providers.calls == ["openai", "openai", "gemini", "openai"]
@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.core.config import settings
+from src.core.security import User
+from src.modules.ai_providers import service
+from src.modules.ai_providers.schemas import AiTextGenerateRequest
+from src.modules.ai_providers.service import _iter_sse_data, stream_text_async
+
+USER = User(id=5, email="dev@example.com", roles=set())
+REQ = AiTextGenerateRequest(
+    project_id=9, prompt="hi", provider_preference="openai", max_output_tokens=50
+)
+
+
+@pytest.fixture(autouse=True)
+def prices(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "openai_text_input_cost_per_1k", 1.0)
+    monkeypatch.setattr(settings, "openai_text_output_cost_per_1k", 2.0)
+
+
+def _parse(frames: list[str]) -> list[tuple[str, dict]]:
+    events = []
+    for frame in frames:
+        event_line, data_line = frame.strip().split("\n")
+        events.append((event_line.removeprefix("event: "), json.loads(data_line[6:])))
+    return events
+
+
+def _stream(req: AiTextGenerateRequest = REQ) -> list[tuple[str, dict]]:
+    async def collect() -> list[str]:
+        return [frame async for frame in await stream_text_async(None, USER, req)]
+
+    return _parse(asyncio.run(collect()))
+
+
+def test_sse_frames_join_data_lines_and_skip_keep_alives() -> None:
+    body = (
+        b": keep-alive\n\n"
+        b'data: {"a":\ndata: 1}\n\n'
+        b"event: ping\n\n\n"
+        b"data: [DONE]\n\n"
+        b"data: tail"
+    )
+    res = httpx.Response(200, content=body)
+
+    async def frames() -> list[str]:
+        return [data async for data in _iter_sse_data(res)]
+
+    assert asyncio.run(frames()) == ['{"a":\n1}', "[DONE]", "tail"]
+
+
+def test_stream_yields_deltas_and_records_the_run(providers, runs) -> None:
+    providers.stream("openai", ["Hel", "lo"])
+
+    events = _stream()
+
+    assert [name for name, _ in events] == ["start", "delta", "delta", "done"]
+    assert events[0][1] == {"provider": "openai", "model_name": events[0][1]["model_name"]}
+    assert events[-1][1]["text"] == "Hello"
+    assert events[-1][1]["run_id"] == 101
+    assert (runs.payloads[0].run_status, runs.payloads[0].token_output_count) == ("success", 2)
+
+
+def test_stream_stops_at_done_marker(providers, runs) -> None:
+    delta = {"type": "response.output_text.delta", "delta": "only"}
+    providers.stream("openai", [], raw=f"data: {json.dumps(delta)}\n\ndata: [DONE]\n\n".encode())
+
+    events = _stream()
+
+    assert [name for name, _ in events] == ["start", "delta", "done"]
+    assert events[-1][1]["text"] == "only"
+
+
+def test_stream_falls_back_before_the_first_delta(providers, runs) -> None:
+    providers.fail("openai", 503)
+    providers.stream("gemini", ["hola"])
+
+    events = _stream()
+
+    assert events[0] == ("start", {"provider": "gemini", "model_name": events[0][1]["model_name"]})
+    assert events[-1][1]["provider"] == "gemini"
+    assert providers.calls == ["openai", "gemini"]
+    assert runs.payloads[0].output_payload["execution"] == {"stream": True}
+
+
+def test_stream_reports_an_error_when_every_provider_fails(providers, runs) -> None:
+    providers.fail("openai", 503)
+    providers.fail("gemini", 503)
+
+    events = _stream()
+
+    assert [name for name, _ in events] == ["error"]
+    assert events[0][1]["status_code"] == 503
+    assert runs.payloads[0].run_status == "failed"
+
+
+def test_client_disconnect_records_a_cancelled_run(providers, runs) -> None:
+    providers.stream("openai", ["Hel", "lo", " world"], then=lambda: asyncio.sleep(5))
+
+    async def scenario() -> list[str]:
+        iterator = await stream_text_async(None, USER, REQ)
+        frames = [await anext(iterator), await anext(iterator)]
+        await iterator.aclose()
+        return frames
+
+    events = _parse(asyncio.run(scenario()))
+
+    assert [name for name, _ in events] == ["start", "delta"]
+    [run] = runs.payloads
+    assert (run.run_status, run.provider) == ("cancelled", "openai")
+    assert run.output_payload["text"] == "Hel"
+    assert run.token_output_count == 1 and run.cost_usd > 0
+
+
+def test_mid_stream_failure_keeps_the_partial_text_and_cost(providers, runs) -> None:
+    async def drop() -> None:
+        raise httpx.RemoteProtocolError("peer closed connection")
+
+    deltas = [{"type": "response.output_text.delta", "delta": d} for d in ("Hel", "lo")]
+    raw = "".join(f"data: {json.dumps(delta)}\n\n" for delta in deltas).encode()
+    providers.stream("openai", [], raw=raw, then=drop)
+    providers.stream("gemini", ["unused"])
+
+    events = _stream()
+
+    # No fallback once text has gone out: the client gets an error after the deltas.
+    assert [name for name, _ in events] == ["start", "delta", "delta", "error"]
+    assert events[-1][1]["status_code"] == 503
+    assert providers.calls == ["openai"]
+    [run] = runs.payloads
+    assert (run.run_status, run.provider) == ("failed", "openai")
+    assert run.output_payload["text"] == "Hello"
+    assert run.output_payload["execution"]["usage_estimated"] is True
+    assert run.token_input_count > 0 and run.cost_usd > 0
+    assert "run_id=101" in events[-1][1]["detail"]
+
+
+def test_streamed_calls_feed_the_provider_metrics(providers, runs) -> None:
+    failed = {"type": "response.failed", "response": {"error": "overloaded"}}
+    providers.stream("openai", [], raw=f"data: {json.dumps(failed)}\n\n".encode())
+    providers.stream("gemini", ["hola"])
+
+    _stream()
+
+    openai = service.provider_metrics.snapshot("openai", settings.openai_model_text)
+    gemini = service.provider_metrics.snapshot("gemini", settings.gemini_model_text)
+    assert (openai["samples"], openai["error_rate"]) == (1, 1)
+    assert (gemini["samples"], gemini["error_rate"]) == (1, 0)
+    assert gemini["p95_ms"] is not None
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from src.core.config import settings
+from src.core.security import User
+from src.modules.ai_providers import service
+from src.modules.ai_providers.schemas import AiTextBatchRequest
+from src.modules.ai_providers.service import generate_text_batch_async
+from src.modules.project_budgets import service as budgets
+from src.modules.project_budgets.spend import Budget, ProjectSpendTracker, current_period
+
+USER = User(id=5, email="dev@example.com", roles=set())
+
+
+@pytest.fixture(autouse=True)
+def batch(monkeypatch, providers, runs) -> None:
+    monkeypatch.setattr(settings, "ai_text_cache_enabled", False)
+    monkeypatch.setattr(settings, "ai_batch_max_concurrency", 1)
+    monkeypatch.setattr(settings, "openai_text_input_cost_per_1k", 1.0)
+    monkeypatch.setattr(settings, "openai_text_output_cost_per_1k", 2.0)
+    monkeypatch.setattr(
+        service, "record_agent_runs", lambda db, payloads: [runs.record(db, p) for p in payloads]
+    )
+
+
+def test_budget_is_checked_before_each_item(monkeypatch, providers, runs) -> None:
+    # Each reply costs 3 input + 2 output tokens = 0.007 USD; the limit fits two of them.
+    spend = ProjectSpendTracker()
+    spend.load(current_period(), {}, {9: Budget(hard_limit_usd=0.01)})
+    monkeypatch.setattr(budgets, "project_spend", spend)
+    monkeypatch.setattr(settings, "ai_budgets_enabled", True)
+    providers.reply("openai", "ok")
+    req = AiTextBatchRequest(
+        project_id=9,
+        provider_preference="openai",
+        items=[{"prompt": f"item {i}"} for i in range(3)],
+    )
+
+    out = asyncio.run(generate_text_batch_async(None, USER, req))
+
+    assert [item.status for item in out.items] == ["success", "success", "failed"]
+    assert out.items[2].status_code == 402
+    assert providers.calls == ["openai", "openai"]
+    assert [p.run_status for p in runs.payloads] == ["success", "success", "failed"]
+
+
+def test_running_items_hold_an_estimated_cost_against_the_budget(
+    monkeypatch, providers, runs
+) -> None:
+    # Each running item reserves ~2 USD (1000 output tokens at 2 USD/1k); the third
+    # starts while two are in flight and nothing has been spent yet.
+    spend = ProjectSpendTracker()
+    spend.load(current_period(), {}, {9: Budget(hard_limit_usd=3.0)})
+    monkeypatch.setattr(budgets, "project_spend", spend)
+    monkeypatch.setattr(settings, "ai_budgets_enabled", True)
+    monkeypatch.setattr(settings, "ai_batch_max_concurrency", 3)
+    providers.reply("openai", "ok", delay=0.05)
+    req = AiTextBatchRequest(
+        project_id=9,
+        provider_preference="openai",
+        max_output_tokens=1000,
+        items=[{"prompt": f"item {i}"} for i in range(3)],
+    )
+
+    out = asyncio.run(generate_text_batch_async(None, USER, req))
+
+    assert [item.status for item in out.items] == ["success", "success", "failed"]
+    assert out.items[2].status_code == 402
+    assert providers.calls == ["openai", "openai"]
+
+
+def test_each_item_gets_its_own_deadline(monkeypatch, providers, runs) -> None:
+    # Three sequential 60ms calls outlast one 100ms request deadline, but not three.
+    monkeypatch.setattr(settings, "ai_request_deadline_ms", 100)
+    monkeypatch.setattr(settings, "ai_deadline_min_attempt_ms", 10)
+    providers.reply("openai", "ok", delay=0.06)
+    req = AiTextBatchRequest(
+        project_id=9,
+        provider_preference="openai",
+        items=[{"prompt": f"item {i}"} for i in range(3)],
+    )
+
+    out = asyncio.run(generate_text_batch_async(None, USER, req, deadline_ms=100))
+
+    assert [item.status for item in out.items] == ["success", "success", "success"]
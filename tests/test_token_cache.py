@@ -0,0 +1,63 @@
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from src.core import security
+from src.core.config import settings
+from src.core.security import (
+    clear_token_cache,
+    create_access_token,
+    decode_access_token,
+    token_cache_stats,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_token_cache()
+    yield
+    clear_token_cache()
+
+
+def _counts() -> tuple[int, int, int]:
+    stats = token_cache_stats()
+    return stats["entries"], stats["hits"], stats["misses"]
+
+
+def test_repeated_token_is_verified_once(monkeypatch) -> None:
+    token = create_access_token(5, "dev@example.com", ["operator"], {9: "admin"}, 2)
+    _, hits, misses = _counts()
+    first = decode_access_token(token)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("token verified again")
+
+    monkeypatch.setattr(security.jwt, "decode", fail)
+    assert decode_access_token(token) is first
+    assert first.project_roles == {9: "admin"}
+    assert _counts() == (1, hits + 1, misses + 1)
+
+
+def test_invalid_tokens_are_not_cached() -> None:
+    token = create_access_token(5, "dev@example.com", ["operator"])
+    tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc:
+            decode_access_token(tampered)
+        assert exc.value.status_code == 401
+    assert _counts()[0] == 0
+
+
+def test_token_without_exp_is_not_cached() -> None:
+    payload = {"sub": "5", "roles": [], "iss": settings.jwt_issuer, "aud": settings.jwt_audience}
+    token = jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
+    assert decode_access_token(token).id == 5
+    assert _counts()[0] == 0
+
+
+def test_cache_can_be_disabled(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "auth_token_cache_max_entries", 0)
+    token = create_access_token(5, "dev@example.com", ["viewer"])
+    before = _counts()
+    assert decode_access_token(token).roles == {"viewer"}
+    assert _counts() == before
@@ -0,0 +1,48 @@
+import pytest
+from fastapi import HTTPException
+
+from src.core.config import settings
+from src.modules.ai_providers import tokens
+from src.modules.ai_providers.schemas import AiTextGenerateRequest
+from src.modules.ai_providers.service import _prepare_text_request
+from src.modules.ai_providers.tokens import context_window, count_tokens, estimate_input_tokens
+
+
+def _windows(monkeypatch, raw: str) -> None:
+    monkeypatch.setattr(settings, "ai_context_window_overrides", raw)
+    tokens._context_window_overrides.cache_clear()
+
+
+def test_count_tokens_is_close_to_bpe_counts() -> None:
+    assert count_tokens("") == 0
+    # cl100k_base: 11 tokens.
+    assert 10 <= count_tokens("Hello world, this is a test of the tokenizer.") <= 14
+    assert count_tokens("word " * 100) == 100
+    assert estimate_input_tokens("hi", "be brief") > count_tokens("hi") + count_tokens("be brief")
+
+
+def test_context_window_uses_overrides_then_longest_prefix(monkeypatch) -> None:
+    _windows(monkeypatch, "gpt-5.2=1000, broken")
+    assert context_window("gpt-5.2") == 1000
+    assert context_window("gpt-5-mini") == 400_000
+    assert context_window("gpt-4.1-mini") == 1_047_576
+    assert context_window("unknown-model") == settings.ai_default_context_window_tokens
+
+
+def test_prepare_text_request_clamps_output_to_context_window(monkeypatch) -> None:
+    _windows(monkeypatch, "tiny=100")
+    monkeypatch.setattr(settings, "ai_token_estimate_margin", 1.0)
+    req = AiTextGenerateRequest(
+        project_id=1,
+        prompt="word " * 40,
+        provider_preference="openai",
+        model_name="tiny",
+        max_output_tokens=500,
+    )
+    input_tokens = estimate_input_tokens("word " * 40)
+    assert _prepare_text_request(req).max_output_tokens == 100 - input_tokens
+
+    too_long = req.model_copy(update={"prompt": "word " * 200})
+    with pytest.raises(HTTPException) as exc:
+        _prepare_text_request(too_long)
+    assert exc.value.status_code == 400
@@ -0,0 +1,266 @@
+from datetime import UTC, datetime, timedelta
+
+from src.core import writes
+from src.core.db import _read_session_time_zone
+from src.modules.agent_catalog.schemas import AgentCreate, AgentUpdate
+from src.modules.agent_catalog.service import create_agent, update_agent
+from src.modules.agent_runs.schemas import AgentRunCreate
+from src.modules.agent_runs.service import create_agent_run
+from src.modules.ia_generator.schemas import IaConversationCreate, IaMessageCreate
+from src.modules.ia_generator.service import (
+    create_conversation,
+    create_message_for_conversation,
+    save_message_output,
+)
+from src.modules.project_agent_assignments.schemas import (
+    ProjectAgentAssignmentCreate,
+    ProjectAgentAssignmentUpdate,
+)
+from src.modules.project_agent_assignments.service import create_assignment, update_assignment
+from src.modules.project_budgets.schemas import ProjectBudgetUpdate
+from src.modules.project_budgets.service import upsert_project_budget
+from src.modules.project_budgets.spend import BUDGET_SOFT_EXCEEDED, project_spend
+from src.modules.project_members.schemas import ProjectMemberCreate, ProjectMemberUpdate
+from src.modules.project_members.service import create_member, update_member
+from src.modules.project_stage_status.catalog import clear_stage_catalog
+from src.modules.project_stage_status.schemas import ProjectStageStatusUpdate
+from src.modules.project_stage_status.service import update_project_stage_status
+from src.modules.projects.schemas import ProjectCreate, ProjectUpdate
+from src.modules.projects.service import create_project, update_project
+
+EARLIER = datetime(2026, 1, 1)
+STAGE = {"stage_id": 3, "stage_code": "design", "stage_name": "Design", "stage_order": 2}
+
+
+class FakeResult:
+    def __init__(self, rows: list[dict] | None = None, lastrowid: int = 0) -> None:
+        self.rows = rows or []
+        self.lastrowid = lastrowid
+        self.rowcount = 1
+
+    def mappings(self):
+        return self
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+    def scalar_one(self):
+        return next(iter(self.rows[0].values())) if self.rows else 0
+
+
+class FakeSession:
+    """Records every statement; SELECTs answer from `rows`, keyed by a SQL fragment."""
+
+    def __init__(self, rows: dict[str, list[dict]] | None = None) -> None:
+        self.rows = rows or {}
+        self.info: dict = {}
+        self.statements: list[str] = []
+        self.commits = 0
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        for fragment, rows in self.rows.items():
+            if fragment in sql:
+                return FakeResult(rows)
+        return FakeResult(lastrowid=42)
+
+    def commit(self) -> None:
+        self.commits += 1
+
+    def rollback(self) -> None:
+        pass
+
+    @property
+    def kinds(self) -> list[str]:
+        return [sql.split()[0] for sql in self.statements]
+
+
+def test_create_project_does_not_read_back() -> None:
+    db = FakeSession()
+    out = create_project(
+        db, ProjectCreate(project_key="pk", project_name="Project", owner_user_id=5)
+    )
+    # The trailing UPDATE/INSERT bump the global and the owner's membership version.
+    assert db.kinds == ["INSERT", "INSERT", "INSERT", "UPDATE", "INSERT"]
+    assert db.commits == 1
+    assert (out.project_id, out.owner_user_id, out.lifecycle_status) == (42, 5, "draft")
+    assert out.created_at == out.updated_at
+
+
+def test_update_project_reads_once() -> None:
+    current = {
+        "project_id": 9,
+        "project_key": "pk",
+        "project_name": "Old",
+        "description": None,
+        "lifecycle_status": "draft",
+        "owner_user_id": 5,
+        "created_at": EARLIER,
+        "updated_at": EARLIER,
+    }
+    db = FakeSession({"FROM projects": [current]})
+    out = update_project(db, 9, ProjectUpdate(project_name="New"))
+    assert db.kinds == ["SELECT", "UPDATE"]
+    assert out.project_name == "New"
+    assert out.updated_at > EARLIER
+
+
+def test_member_writes() -> None:
+    db = FakeSession()
+    out = create_member(db, 9, ProjectMemberCreate(user_id=6, member_role="viewer"))
+    assert db.kinds == ["INSERT", "UPDATE", "INSERT"]
+    assert (out.project_member_id, out.member_role) == (42, "viewer")
+
+    member = {
+        "project_member_id": 42,
+        "project_id": 9,
+        "user_id": 6,
+        "member_role": "viewer",
+        "created_at": EARLIER,
+        "owner_user_id": 5,
+    }
+    db = FakeSession({"FROM project_members": [member]})
+    out = update_member(db, 9, 6, ProjectMemberUpdate(member_role="operator"))
+    assert db.kinds == ["SELECT", "UPDATE", "UPDATE", "INSERT"]
+    assert out.member_role == "operator"
+
+
+def test_agent_writes() -> None:
+    db = FakeSession()
+    out = create_agent(
+        db,
+        AgentCreate(
+            agent_code="writer",
+            agent_name="Writer",
+            module_name="texts",
+            owner_team="ia",
+            metadata_json={"tier": 1},
+        ),
+    )
+    assert db.kinds == ["INSERT"]
+    assert (out.agent_id, out.metadata_json) == (42, {"tier": 1})
+
+    current = {**out.model_dump(), "metadata_json": '{"tier": 1}'}
+    db = FakeSession({"FROM agent_catalog": [current]})
+    out = update_agent(db, 42, AgentUpdate(agent_name="Editor"))
+    assert db.kinds == ["SELECT", "UPDATE"]
+    assert (out.agent_name, out.metadata_json) == ("Editor", {"tier": 1})
+
+
+def test_assignment_writes() -> None:
+    clear_stage_catalog()
+    db = FakeSession({"FROM stage_catalog": [STAGE]})
+    payload = ProjectAgentAssignmentCreate(project_id=9, agent_id=2, stage_id=3)
+    out = create_assignment(db, payload)
+    assert db.kinds == ["INSERT", "SELECT"]
+    assert (out.project_agent_assignment_id, out.stage_code) == (42, "design")
+    # The stage catalog is cached after the first lookup.
+    create_assignment(db, payload)
+    assert db.kinds == ["INSERT", "SELECT", "INSERT"]
+
+    current = {**out.model_dump()}
+    db = FakeSession({"FROM project_agent_assignments": [current]})
+    out = update_assignment(db, 42, ProjectAgentAssignmentUpdate(assignment_status="paused"))
+    assert db.kinds == ["SELECT", "UPDATE"]
+    assert (out.assignment_status, out.stage_name) == ("paused", "Design")
+
+
+def test_stage_status_update_with_warm_catalog() -> None:
+    clear_stage_catalog()
+    db = FakeSession(
+        {
+            "FROM stage_catalog": [STAGE],
+            "FROM projects": [{"project_id": 9, "started_at": EARLIER}],
+        }
+    )
+    payload = ProjectStageStatusUpdate(stage_status="in_progress", progress_percent=10)
+    update_project_stage_status(db, 9, "design", payload)
+    db.statements.clear()
+
+    out = update_project_stage_status(db, 9, "design", payload)
+    assert db.kinds == ["SELECT", "INSERT", "INSERT"]
+    assert db.commits == 2
+    assert (out.project_stage_status_id, out.stage_order) == (42, 2)
+    # started_at is kept from the stored row, as the upsert's COALESCE does.
+    assert out.started_at == EARLIER
+    assert out.completed_at is None
+
+
+def test_create_agent_run_does_not_read_back() -> None:
+    db = FakeSession()
+    out = create_agent_run(
+        db, AgentRunCreate(project_id=9, agent_id=2, input_payload={"prompt": "hi"})
+    )
+    assert db.kinds == ["INSERT"]
+    assert (out.agent_run_id, out.input_payload, out.started_at) == (42, {"prompt": "hi"}, None)
+
+
+def test_conversation_writes() -> None:
+    db = FakeSession()
+    out = create_conversation(db, IaConversationCreate(project_id=9, agent_id=2), user_id=5)
+    assert db.kinds == ["INSERT"]
+    assert (out.conversation_id, out.status, out.created_by_user_id) == (42, "draft", 5)
+
+    conversation = {**out.model_dump(), "member_role": "admin"}
+    db = FakeSession({"FROM ia_conversations": [conversation]})
+    message = create_message_for_conversation(
+        db, 42, IaMessageCreate(role="user", content="hello"), user_id=5
+    )
+    assert db.kinds == ["SELECT", "INSERT", "UPDATE"]
+    assert (message.message_id, message.is_saved, message.content) == (42, False, "hello")
+
+
+def test_save_message_output_does_not_read_back() -> None:
+    source = {
+        "message_id": 7,
+        "conversation_id": 3,
+        "role": "assistant",
+        "run_id": 11,
+        "provider": "openai",
+        "model_name": "gpt",
+        "content": "answer",
+        "project_id": 9,
+        "agent_id": 2,
+    }
+    db = FakeSession({"FROM ia_messages": [source]})
+    out = save_message_output(db, 7, "keep", None, user_id=5)
+    assert db.kinds == ["SELECT", "INSERT", "UPDATE", "UPDATE"]
+    assert (out.saved_output_id, out.run_id, out.content) == (42, 11, "answer")
+
+
+def test_upsert_project_budget_reads_only_spend(monkeypatch) -> None:
+    monkeypatch.setattr(project_spend, "set_budget", lambda project_id, budget: None)
+    db = FakeSession({"FROM agent_runs": [{"spent": 3.5}]})
+    out = upsert_project_budget(db, 9, ProjectBudgetUpdate(soft_limit_usd=2), user_id=5)
+    assert db.kinds == ["INSERT", "SELECT"]
+    assert (out.spent_usd, out.budget_status) == (3.5, BUDGET_SOFT_EXCEEDED)
+    assert out.updated_by_user_id == 5
+
+
+class FakeCursor:
+    def execute(self, statement: str) -> None:
+        assert "UTC_TIMESTAMP()" in statement
+
+    def fetchone(self) -> tuple[int]:
+        return (-5 * 3600,)
+
+    def close(self) -> None:
+        pass
+
+
+class FakeConnection:
+    def cursor(self) -> FakeCursor:
+        return FakeCursor()
+
+
+def test_db_now_follows_the_session_time_zone(monkeypatch) -> None:
+    monkeypatch.setattr(writes, "_db_utc_offset", timedelta(0))
+    _read_session_time_zone(FakeConnection(), None)
+
+    expected = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=5)
+    assert abs(writes.db_now() - expected) < timedelta(seconds=2)
+    assert writes.db_now().microsecond == 0